@@ -1,16 +1,19 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright © 2025 Rejeb Ben Rejeb
+from typing import Optional, Tuple
+
 from .display.device_loader import DeviceLoader
 from ..common.logging_config import get_service_logger
 
 
-def run_service(config_dir: str):
+def run_service(config_dir: str, virtual: Optional[str] = None,
+                virtual_size: Optional[Tuple[int, int]] = None, virtual_bandwidth: Optional[float] = None):
     logger = get_service_logger()
     logger.info("Device controller service started")
 
     try:
         loader = DeviceLoader(config_dir)
-        device = loader.load_device()
+        device = loader.load_device(virtual, virtual_size, virtual_bandwidth)
         if device is None:
             logger.error(f"No device found", exc_info=True)
             exit(1)
@@ -0,0 +1,153 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# (left, top, right, bottom), right and bottom excluded
+Rect = Tuple[int, int, int, int]
+
+
+def union_rect(first: Rect, second: Rect) -> Rect:
+    return (min(first[0], second[0]), min(first[1], second[1]),
+            max(first[2], second[2]), max(first[3], second[3]))
+
+
+def rects_intersect(first: Rect, second: Rect) -> bool:
+    return first[0] < second[2] and second[0] < first[2] and first[1] < second[3] and second[1] < first[3]
+
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """Merge overlapping rectangles until none overlap"""
+    merged: List[Rect] = []
+    for rect in rects:
+        while True:
+            for i, other in enumerate(merged):
+                if rects_intersect(rect, other):
+                    rect = union_rect(rect, merged.pop(i))
+                    break
+            else:
+                break
+        merged.append(rect)
+    return merged
+
+
+class ComposedFrame:
+    """
+    A frame from the NumPy compositor, with the rectangles that changed
+    since the previous frame (None when the whole frame must be encoded)
+    and the rotation the encoder turns it by.
+    """
+
+    __slots__ = ("pixels", "dirty", "rotation")
+
+    def __init__(self, pixels: np.ndarray, dirty: Optional[List[Rect]] = None, rotation: int = 0):
+        self.pixels = pixels
+        self.dirty = dirty
+        self.rotation = rotation
+
+    def coalesce(self, older: "ComposedFrame") -> "ComposedFrame":
+        """Account for an older frame that is dropped before being encoded"""
+        if self.dirty is not None:
+            self.dirty = None if older.dirty is None else merge_rects(older.dirty + self.dirty)
+        return self
+
+
+class Layer:
+    """
+    Premultiplied RGBA pixels, ready to be blended over a frame.
+
+    Holds the premultiplied colour and the inverse alpha, both (H, W, 3), so
+    blending is `frame * inverse_alpha / 255 + premultiplied`. The alpha is
+    repeated per channel because broadcasting it makes NumPy take a much
+    slower path than same-shape arithmetic.
+    """
+
+    __slots__ = ("premultiplied", "inverse_alpha")
+
+    def __init__(self, premultiplied: np.ndarray, inverse_alpha: np.ndarray):
+        self.premultiplied = premultiplied
+        self.inverse_alpha = inverse_alpha
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "Layer":
+        rgba = np.asarray(image if image.mode == 'RGBA' else image.convert('RGBA'))
+        alpha = rgba[..., 3:].astype(np.uint16)
+        premultiplied = ((rgba[..., :3] * alpha + 127) // 255).astype(np.uint8)
+        inverse_alpha = np.ascontiguousarray(np.broadcast_to(255 - alpha, premultiplied.shape))
+        return cls(premultiplied, inverse_alpha)
+
+    @property
+    def width(self) -> int:
+        return self.premultiplied.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.premultiplied.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.premultiplied.nbytes + self.inverse_alpha.nbytes
+
+    def crop(self, left: int, top: int, right: int, bottom: int) -> "Layer":
+        """Return a view of a region of the layer"""
+        return Layer(self.premultiplied[top:bottom, left:right], self.inverse_alpha[top:bottom, left:right])
+
+
+class Compositor:
+    """
+    NumPy frame compositor.
+
+    The working frame is a preallocated (H, W, 3) uint8 array. Layers are
+    blended into it with integer vectorized math, using a preallocated
+    scratch array, and the frame is handed to the RGB565 encoder as is.
+    PIL is only used to rasterize the layers and sprites.
+
+    Blending is limited to `clip` when it is set, so a region restored from
+    the base image can be redrawn without touching the rest of the frame.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self._scratch = np.empty((height, width, 3), dtype=np.uint16)
+        self._carry = np.empty((height, width, 3), dtype=np.uint16)
+        self.clip: Optional[Rect] = None
+
+    def load(self, source):
+        """Start a frame from an (H, W, 3) array or an image of the frame size"""
+        if isinstance(source, Image.Image):
+            source = np.asarray(source if source.mode == 'RGB' else source.convert('RGB'))
+        np.copyto(self.frame, source)
+
+    def restore(self, source: np.ndarray, rect: Rect):
+        """Copy a region of an (H, W, 3) array into the frame"""
+        left, top, right, bottom = rect
+        np.copyto(self.frame[top:bottom, left:right], source[top:bottom, left:right])
+
+    def blend(self, layer: Layer, position: Tuple[int, int] = (0, 0)):
+        """Blend a layer over the frame with its top-left corner at position, clipped to the frame"""
+        x, y = position
+        clip = self.clip or (0, 0, self.width, self.height)
+        left, top = max(0, clip[0] - x), max(0, clip[1] - y)
+        right = min(layer.width, clip[2] - x)
+        bottom = min(layer.height, clip[3] - y)
+        if right <= left or bottom <= top:
+            return
+
+        frame = self.frame[y + top:y + bottom, x + left:x + right]
+        scratch = self._scratch[:bottom - top, :right - left]
+        carry = self._carry[:bottom - top, :right - left]
+        np.copyto(scratch, frame)
+        scratch *= layer.inverse_alpha[top:bottom, left:right]
+        # Exact round(t / 255) for t <= 255 * 255: (t + 128 + ((t + 128) >> 8)) >> 8
+        scratch += 128
+        np.right_shift(scratch, 8, out=carry)
+        scratch += carry
+        scratch >>= 8
+        # Both terms are rounded from a sum of at most 255, so this cannot overflow
+        scratch += layer.premultiplied[top:bottom, left:right]
+        np.copyto(frame, scratch, casting='unsafe')
@@ -2,7 +2,7 @@ from typing import Dict, Optional
 # SPDX-License-Identifier: Apache-2.0
 # Copyright © 2025 Rejeb Ben Rejeb
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 from typing import Optional, List, Tuple
 
@@ -66,9 +66,18 @@ class DisplayConfig:
     foreground_position: Tuple[int, int] = (0, 0)
     foreground_alpha: float = 1.0  # 0.0 = transparent, 1.0 = opaque
 
-    # Display rotation (degrees: 0, 90, 180, 270)
+    # Display rotation (degrees clockwise: 0, 90, 180, 270), applied by the encoder
     rotation: int = 0
 
+    # Target frame rate (None = device default)
+    target_fps: Optional[float] = None
+
+    # Fill levels of pre-rendered gauge sprites (0 = draw gauges every frame)
+    gauge_levels: int = 0
+
+    # Frame compositor: "pil" (ImageDraw on RGBA images) or "numpy" (premultiplied arrays)
+    compositor: str = "pil"
+
     # Metrics configuration
     metrics_configs: List[MetricConfig] = None
 
@@ -99,3 +108,18 @@ class DisplayConfig:
             self.circular_configs = []
         if self.shape_configs is None:
             self.shape_configs = []
+
+    def startup_config(self) -> "DisplayConfig":
+        """
+        Same widgets on a plain colour background, with gauges drawn directly:
+        a configuration that renders within milliseconds while the real one loads
+        """
+        return replace(self, background_type=BackgroundType.COLOR, background_path="",
+                       gauge_levels=0, compositor="pil")
+
+    @property
+    def canvas_size(self) -> Tuple[int, int]:
+        """(width, height) the theme is drawn at: the output size, swapped for quarter turns"""
+        if self.rotation % 180 == 90:
+            return self.output_height, self.output_width
+        return self.output_width, self.output_height
@@ -198,8 +198,43 @@ class ConfigLoader:
         # Resolve background path
         background_path = path_resolver.resolve_background_path(display_data["background"]["path"])
 
-        # Get rotation
+        # Get rotation (quarter turns only, the encoder applies it)
         rotation = display_data.get("rotation", 0)
+        try:
+            rotation = int(rotation or 0)
+            if rotation % 90:
+                raise ValueError("must be 0, 90, 180 or 270")
+            rotation %= 360
+        except (TypeError, ValueError) as e:
+            self.logger.warning(f"Ignoring invalid rotation {display_data.get('rotation')!r}: {e}")
+            rotation = 0
+
+        # Get target frame rate (optional, device default when missing)
+        target_fps = display_data.get("target_fps")
+        if target_fps is not None:
+            try:
+                target_fps = float(target_fps)
+                if target_fps <= 0:
+                    raise ValueError("must be positive")
+            except (TypeError, ValueError) as e:
+                self.logger.warning(f"Ignoring invalid target_fps {display_data.get('target_fps')!r}: {e}")
+                target_fps = None
+
+        # Get gauge sprite levels (optional, gauges drawn every frame when missing)
+        gauge_levels = display_data.get("gauge_levels", 0)
+        try:
+            gauge_levels = int(gauge_levels or 0)
+            if gauge_levels == 1 or gauge_levels < 0:
+                raise ValueError("must be 0 or at least 2")
+        except (TypeError, ValueError) as e:
+            self.logger.warning(f"Ignoring invalid gauge_levels {display_data.get('gauge_levels')!r}: {e}")
+            gauge_levels = 0
+
+        # Get frame compositor (optional, PIL when missing)
+        compositor = display_data.get("compositor", "pil")
+        if compositor not in ("pil", "numpy"):
+            self.logger.warning(f"Ignoring unknown compositor {compositor!r}, using pil")
+            compositor = "pil"
 
         config = DisplayConfig(
             output_width=width,
@@ -217,7 +252,10 @@ class ConfigLoader:
             time_config=time_config,
             circular_configs=circular_configs,
             bar_configs=bar_configs,
-            rotation=rotation
+            rotation=rotation,
+            target_fps=target_fps,
+            gauge_levels=gauge_levels,
+            compositor=compositor
         )
 
         return config
@@ -1,10 +1,11 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 import usb.core
 
 from .display_device import DisplayDevice
 from .hid_devices import DisplayDevice04185304, DisplayDevice04165302
 from .usb_devices import DisplayDevice87AD70DB
+from .virtual_device import VirtualDisplayDevice
 
 SUPPORTED_DEVICES = [
     (0x0418, 0x5304, DisplayDevice04185304),
@@ -18,7 +19,11 @@ class DeviceLoader:
     def __init__(self, config_dir: str):
         self.config_dir = config_dir
 
-    def load_device(self) -> Optional[DisplayDevice]:
+    def load_device(self, virtual: Optional[str] = None, virtual_size: Optional[Tuple[int, int]] = None,
+                    virtual_bandwidth: Optional[float] = None) -> Optional[DisplayDevice]:
+        if virtual:
+            width, height = virtual_size or (None, None)
+            return VirtualDisplayDevice(self.config_dir, virtual, width, height, virtual_bandwidth)
         for vid, pid, class_name in SUPPORTED_DEVICES:
             device = usb.core.find(idVendor=vid, idProduct=pid)
             if device is not None:
@@ -1,41 +1,91 @@
 # SPDX-License-Identifier: Apache-2.0
 # Copyright © 2025 Rejeb Ben Rejeb
 import pathlib
+import threading
 import time
 from abc import abstractmethod, ABC
+from typing import Optional, Tuple, Union
 
+import numpy as np
 import usb
 from PIL import Image
 
+from .compositor import ComposedFrame
+from .config import DisplayConfig
 from .config_loader import ConfigLoader
+from .encoder import PixelLayout, Rgb565Encoder
+from .frame_buffer import FrameBuffer
+from .frame_pipeline import Frame, FramePipeline
+from .frame_scheduler import FrameScheduler
+from .frame_stats import FrameStats, StatsFileWriter
 from .generator import DisplayGenerator
 from ...common.logging_config import LoggerConfig
 
 
 class DisplayDevice(ABC):
     _generator: DisplayGenerator = None
+    _frame_buffer: FrameBuffer = None
+    # Encoding of the last frame, updated in place from the dirty rectangles of composed frames
+    _encoded: Optional[np.ndarray] = None
+    scheduler: FrameScheduler = None
+    stats: FrameStats = None
+    _last_render_time = float("-inf")
     dev = None
     report_id = bytes([0x00])
+    # RGB565 pixel order expected by the panel
+    pixel_layout = PixelLayout.COLUMNS_BOTTOM_UP
+    pixel_big_endian = False
+    # Whether _encode_image turns frames onto the panel by its `rotation` argument;
+    # devices whose override ignores it set False and are given frames already rotated
+    encoder_rotates = True
+    # Frame buffers shared by the render/encode/write stages (2 = double buffering)
+    pipeline_depth = 3
+    # Frame rate used when the theme does not set its own target_fps
+    target_fps = 15.0
+    # Only render/encode/send when something visible changed...
+    change_tracking = True
+    # ...but resend at least this often (seconds) so the panel keeps its image
+    keepalive_interval = 2.0
+    # On start and reload, show a startup frame (colour background, static layers,
+    # pending metrics) while the generator is built on a worker thread
+    progressive_startup = True
+    # Seconds before retrying a generator build that failed
+    build_retry_delay = 5.0
+    # Generator built by the worker thread, waiting to be swapped in, and when its build started
+    _next_generator: Optional[Tuple[DisplayGenerator, float]] = None
+    _build_id = 0
+    _build_failed_at: Optional[float] = None
+    _build_thread: Optional[threading.Thread] = None
+    # When the current (re)load started, until its first frame is sent
+    _load_started: Optional[float] = None
+    time_to_first_frame: Optional[float] = None
 
     def __init__(self, vid, pid, chunk_size, width, height, config_dir: str, *args, **kwargs):
+        self._load_started = time.monotonic()
         self.vid = vid
         self.pid = pid
         self.chunk_size = chunk_size
         self.height = height
         self.width = width
         self.header = self.get_header()
+        self._encoder = Rgb565Encoder(width, height, self.pixel_layout, self.pixel_big_endian)
         self.config_file = f"{config_dir}/config_{width}{height}.yaml"
         self.last_modified = pathlib.Path(self.config_file).stat().st_mtime_ns
         self.logger = self.logger = LoggerConfig.setup_service_logger()
-        self._build_generator()
+        self._build_lock = threading.Lock()
+        self._get_generator()
         self.logger.debug(f"DisplayDevice initialized with header: {self.header}")
 
-    def _build_generator(self) -> DisplayGenerator:
+    def _load_config(self) -> DisplayConfig:
         config_loader = ConfigLoader()
-        config = config_loader.load_config(self.config_file, self.width, self.height)
-        return DisplayGenerator(config)
+        return config_loader.load_config(self.config_file, self.width, self.height)
+
+    def _build_generator(self, config: Optional[DisplayConfig] = None) -> DisplayGenerator:
+        return DisplayGenerator(config or self._load_config())
 
     def _get_generator(self) -> DisplayGenerator:
+        if self.progressive_startup:
+            return self._get_generator_progressive()
         if self._generator is None:
             self.logger.info(f"No generator found, reloading from {self.config_file}")
             self._generator = self._build_generator()
@@ -43,23 +93,188 @@ class DisplayDevice(ABC):
         elif pathlib.Path(self.config_file).stat().st_mtime_ns > self.last_modified:
             self.logger.info(f"Config file updated: {self.config_file}")
             self.last_modified = pathlib.Path(self.config_file).stat().st_mtime_ns
+            self._load_started = time.monotonic()
             self._generator = self._build_generator()
             self.logger.info(f"Display device generator reloaded from {self.config_file}")
             return self._generator
         else:
             return self._generator
 
-    def _encode_image(self, img: Image) -> bytearray:
-        width, height = img.size
-        out = bytearray()
-        for x in range(width):
-            for y in range(height-1, -1, -1):
-                r, g, b = img.getpixel((x, y))
-                val565 = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
-                hi = (val565 >> 8) & 0xFF
-                lo = val565 & 0xFF
-                out.extend((lo, hi))
-        return out
+    def _config_changed(self) -> bool:
+        modified = pathlib.Path(self.config_file).stat().st_mtime_ns
+        if modified > self.last_modified:
+            self.last_modified = modified
+            return True
+        return False
+
+    def _swap_generator(self, generator: DisplayGenerator):
+        previous, self._generator = self._generator, generator
+        if previous is not None:
+            previous.cleanup()
+
+    def _get_generator_progressive(self) -> DisplayGenerator:
+        """
+        Current generator, never blocking on a build: a new configuration is
+        shown at once with a startup generator, and its full generator is
+        swapped in when the worker thread has built it.
+        """
+        with self._build_lock:
+            ready, self._next_generator = self._next_generator, None
+        if ready is not None:
+            generator, started = ready
+            self._swap_generator(generator)
+            self.logger.info(f"Display generator ready after {time.monotonic() - started:.2f}s")
+
+        if self._generator is None:
+            self.logger.info(f"No generator found, loading from {self.config_file}")
+            self._start_build()
+        elif self._config_changed():
+            self.logger.info(f"Config file updated: {self.config_file}")
+            self._start_build()
+        elif (self._build_failed_at is not None
+              and time.monotonic() - self._build_failed_at >= self.build_retry_delay):
+            self._build_failed_at = None
+            self._start_build(startup=False)
+        return self._generator
+
+    def _start_build(self, startup: bool = True):
+        """Show the startup frame of the current config, and build its generator on a worker thread"""
+        started = time.monotonic()
+        config = self._load_config()
+        if startup:
+            if self._load_started is None:
+                self._load_started = started
+            self._swap_generator(DisplayGenerator(config.startup_config(), collect_metrics=False))
+            self.logger.info(f"Startup generator built in {(time.monotonic() - started) * 1000:.0f} ms")
+
+        with self._build_lock:
+            self._build_id += 1
+            build_id = self._build_id
+            self._build_failed_at = None
+            # A build of the previous config may have finished meanwhile
+            stale, self._next_generator = self._next_generator, None
+        if stale is not None:
+            stale[0].cleanup()
+        self._build_thread = threading.Thread(target=self._build_in_background,
+                                              args=(config, build_id, started),
+                                              name="generator-build", daemon=True)
+        self._build_thread.start()
+
+    def _build_in_background(self, config: DisplayConfig, build_id: int, started: float):
+        try:
+            generator = self._build_generator(config)
+        except Exception as e:
+            self.logger.error(f"Error building display generator: {e}")
+            with self._build_lock:
+                if build_id == self._build_id:
+                    self._build_failed_at = time.monotonic()
+            return
+
+        with self._build_lock:
+            if build_id == self._build_id:
+                self._next_generator, generator = (generator, started), None
+        if generator is not None:
+            # Superseded by a newer config
+            generator.cleanup()
+
+    def close(self, timeout: float = 5.0):
+        """
+        Cancel a pending generator build and clean up the generators, stopping
+        their metrics and video threads. A build still running after `timeout`
+        seconds cleans up its own generator when it finishes.
+        """
+        with self._build_lock:
+            self._build_id += 1
+            pending, self._next_generator = self._next_generator, None
+        if self._build_thread is not None:
+            self._build_thread.join(timeout)
+            self._build_thread = None
+        if pending is not None:
+            pending[0].cleanup()
+        if self._generator is not None:
+            self._generator.cleanup()
+            self._generator = None
+
+    def _encode_image(self, img: Image, out: Optional[np.ndarray] = None, rotation: int = 0):
+        """
+        Encode a canvas frame turned `rotation` degrees clockwise onto the panel,
+        writing into `out` when given (and returning it)
+        """
+        self._encoder.rotation = rotation
+        if out is not None:
+            return self._encoder.encode(img, out=out)
+        return self._encoder.encode(img).tobytes()
+
+    def _build_frame_buffer(self) -> FrameBuffer:
+        return FrameBuffer(self.header, self._encoder.payload_size, self.chunk_size, self.report_id)
+
+    def _get_frame_buffer(self) -> FrameBuffer:
+        # Built lazily so subclasses may still adjust report_id/header after __init__
+        if self._frame_buffer is None:
+            self._frame_buffer = self._build_frame_buffer()
+        return self._frame_buffer
+
+    def _encode_rotated(self, img: Union[Image.Image, np.ndarray], out: np.ndarray, rotation: int):
+        """Encode through _encode_image, rotating the frame first for overrides that cannot"""
+        if self.encoder_rotates:
+            return self._encode_image(img, out=out, rotation=rotation)
+        if rotation:
+            if isinstance(img, Image.Image):
+                img = img.rotate(-rotation, expand=True)
+            else:
+                img = np.ascontiguousarray(np.rot90(img, -rotation // 90))
+        return self._encode_image(img, out=out)
+
+    def _encode_composed(self, img: ComposedFrame) -> np.ndarray:
+        """Bring the encoding of the last frame up to date, re-encoding only the dirty rectangles"""
+        try:
+            if img.dirty is not None and self._encoded is not None and self.encoder_rotates:
+                self._encoder.encode(img.pixels, out=self._encoded, rects=img.dirty)
+            else:
+                if self._encoded is None:
+                    self._encoded = np.empty(self._encoder.payload_size, dtype=np.uint8)
+                encoded = self._encode_rotated(img.pixels, self._encoded, img.rotation)
+                if encoded is not self._encoded:
+                    self._encoded[:] = np.frombuffer(encoded, dtype=np.uint8)
+        except Exception:
+            # Partly updated: the next frame must be encoded in full
+            self._encoded = None
+            raise
+        return self._encoded
+
+    @staticmethod
+    def _coalesce_frames(newer: Frame, older: Frame) -> Frame:
+        """Frame to encode when older is replaced before being encoded"""
+        if isinstance(newer, ComposedFrame) and isinstance(older, ComposedFrame):
+            return newer.coalesce(older)
+        return newer
+
+    @staticmethod
+    def _frame_rotation(img: Frame) -> int:
+        """Clockwise rotation the generator asked for when rendering img"""
+        if isinstance(img, ComposedFrame):
+            return img.rotation
+        if isinstance(img, Image.Image):
+            return img.info.get("rotation", 0)
+        return 0
+
+    def _encode_frame(self, img: Frame, frame: Optional[FrameBuffer] = None) -> FrameBuffer:
+        """Encode an image straight into a persistent frame buffer"""
+        if frame is None:
+            frame = self._get_frame_buffer()
+        # Rotation is a strided view in the encoder, so the frame needs no rotated copy
+        rotation = self._frame_rotation(img)
+        self._encoder.rotation = rotation
+        if isinstance(img, ComposedFrame):
+            np.copyto(frame.payload, self._encode_composed(img))
+            frame.commit()
+            return frame
+        encoded = self._encode_rotated(img, frame.payload, rotation)
+        if encoded is not frame.payload:
+            # Subclass encoders that return their own bytes
+            frame.payload[:] = np.frombuffer(encoded, dtype=np.uint8)
+        frame.commit()
+        return frame
 
     @abstractmethod
     def get_header(self, *args, **kwargs):
@@ -75,29 +290,78 @@ class DisplayDevice(ABC):
         dev.reset()
         self.logger.info("Display device reinitialised via USB reset")
 
-    def _prepare_frame_packets(self, img_bytes: bytes):
-        frame_packets = []
-        for i in range(0, len(img_bytes), self.chunk_size):
-            chunk = img_bytes[i:i + self.chunk_size]
-            if len(chunk) < self.chunk_size:
-                chunk += b"\x00" * (self.chunk_size - len(chunk))
-            frame_packets.append(self.report_id + chunk)
-        return frame_packets
+    def _render_frame(self) -> Optional[Frame]:
+        generator = self._get_generator()
+        generator.stats = self.stats
+        if self.scheduler is not None:
+            self.scheduler.set_target_fps(generator.config.target_fps or self.target_fps)
+        if not self.change_tracking:
+            return generator.generate_frame()
+
+        now = time.monotonic()
+        if now - self._last_render_time >= self.keepalive_interval:
+            generator.invalidate()
+        frame = generator.get_frame_if_changed()
+        if frame is not None:
+            self._last_render_time = now
+        return frame
+
+    def _send_frame(self, frame: FrameBuffer):
+        for packet in frame.packets:
+            self.send_packet(packet)
+
+    def _send_and_track(self, frame: FrameBuffer):
+        """Send a frame, logging the time to first frame of a (re)load"""
+        self._send_frame(frame)
+        started, self._load_started = self._load_started, None
+        if started is not None:
+            self.time_to_first_frame = time.monotonic() - started
+            self.logger.info(f"Time to first frame: {self.time_to_first_frame * 1000:.0f} ms")
+
+    def _collect_stats(self, pipeline: FramePipeline) -> dict:
+        now = time.monotonic()
+        last_time, last_sent = self._last_stats_sample
+        sent_fps = (pipeline.frames_sent - last_sent) / (now - last_time) if now > last_time else 0.0
+        self._last_stats_sample = (now, pipeline.frames_sent)
+        return {
+            "device": f"{self.vid:04x}:{self.pid:04x}",
+            "resolution": f"{self.width}x{self.height}",
+            "uptime": round(time.time() - self.stats.started, 1),
+            "target_fps": self.scheduler.target_fps,
+            "render_fps": round(self.scheduler.achieved_fps, 2),
+            "sent_fps": round(sent_fps, 2),
+            "deadline_misses": self.scheduler.deadline_misses,
+            "skipped_frames": self.scheduler.skipped_frames,
+            "frames_sent": pipeline.frames_sent,
+            "dropped_frames": pipeline.dropped_frames,
+            "usb_errors": self.stats.usb_errors,
+            "time_to_first_frame_ms": round(self.time_to_first_frame * 1000) if self.time_to_first_frame else None,
+            "stages": self.stats.snapshot(),
+            "text_sprites": self._generator.text_renderer.sprites.stats() if self._generator else {},
+        }
 
     def run(self):
         self.logger.info("Display device running")
-        while True:
-            try:
-                img, delay_time = self._get_generator().get_frame_with_duration()
-                header = self.get_header()
-                img_bytes = header + self._encode_image(img)
-                frame_packets = self._prepare_frame_packets(img_bytes)
-                for packet in frame_packets:
-                    self.send_packet(packet)
-                time.sleep(max(delay_time, 0.2))
-            except Exception as e:
-                self.logger.error(f"Error in display device run loop: {e}")
-                time.sleep(1.0)  # Wait before retrying
+        self.scheduler = FrameScheduler(self.target_fps, logger=self.logger)
+        self.stats = FrameStats()
+        self._last_stats_sample = (time.monotonic(), 0)
+        pipeline = FramePipeline(
+            render=self._render_frame,
+            encode=self._encode_frame,
+            send=self._send_and_track,
+            buffers=[self._build_frame_buffer() for _ in range(self.pipeline_depth)],
+            scheduler=self.scheduler,
+            logger=self.logger,
+            stats=self.stats,
+            coalesce=self._coalesce_frames
+        )
+        stats_writer = StatsFileWriter(lambda: self._collect_stats(pipeline))
+        stats_writer.start()
+        try:
+            pipeline.run()
+        finally:
+            stats_writer.stop()
+            self.close()
 
     @abstractmethod
     def send_packet(self, packet: bytes):
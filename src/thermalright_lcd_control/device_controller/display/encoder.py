@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from enum import Enum
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+
+class PixelLayout(Enum):
+    """Order in which a panel expects its pixels"""
+    COLUMNS_BOTTOM_UP = "columns_bottom_up"  # x outer, y from bottom to top (HID panels)
+    ROWS = "rows"  # row-major, top to bottom (bulk panels)
+
+
+class Rgb565Encoder:
+    """
+    Array based RGB565 encoder.
+
+    The device pixel order is obtained with strided transpose/flip views of the
+    RGB array, so a frame is packed without any per-pixel Python work. Scratch
+    arrays are allocated once and reused for every frame.
+
+    The display rotation (0, 90, 180 or 270 degrees clockwise) is one more
+    view in that chain: frames are drawn on a canvas of `canvas_size`, which
+    has the panel's width and height swapped for quarter turns, and come out
+    turned onto the panel.
+    """
+
+    def __init__(self, width: int, height: int,
+                 layout: PixelLayout = PixelLayout.COLUMNS_BOTTOM_UP,
+                 big_endian: bool = False):
+        self.width = width
+        self.height = height
+        self.layout = layout
+        self.rotation = 0
+        self._dtype = np.dtype('>u2' if big_endian else '<u2')
+
+        shape = self._device_view(np.empty((height, width), dtype=np.uint8)).shape
+        self._acc = np.empty(shape, dtype=np.uint16)
+        self._tmp = np.empty(shape, dtype=np.uint16)
+
+    @property
+    def payload_size(self) -> int:
+        """Number of bytes produced for one frame"""
+        return self.width * self.height * 2
+
+    @property
+    def rotation(self) -> int:
+        """Clockwise rotation applied to the frames, in degrees"""
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, degrees: int):
+        if degrees % 90:
+            raise ValueError(f"Rotation must be a multiple of 90 degrees, got {degrees}")
+        self._rotation = degrees % 360
+
+    @property
+    def canvas_size(self) -> Tuple[int, int]:
+        """(width, height) of the frames to encode at the current rotation"""
+        if self._rotation in (90, 270):
+            return self.height, self.width
+        return self.width, self.height
+
+    def _rotated_view(self, arr: np.ndarray) -> np.ndarray:
+        """Return a view of a canvas array turned clockwise onto the panel"""
+        return np.rot90(arr, -self._rotation // 90) if self._rotation else arr
+
+    def _rotate_rect(self, rect: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """Map a (left, top, right, bottom) canvas rectangle onto the panel"""
+        left, top, right, bottom = rect
+        canvas_width, canvas_height = self.canvas_size
+        if self._rotation == 90:
+            return canvas_height - bottom, left, canvas_height - top, right
+        if self._rotation == 180:
+            return canvas_width - right, canvas_height - bottom, canvas_width - left, canvas_height - top
+        if self._rotation == 270:
+            return top, canvas_width - right, bottom, canvas_width - left
+        return rect
+
+    def _device_view(self, arr: np.ndarray) -> np.ndarray:
+        """Return a view of an (H, W, ...) panel array in device pixel order"""
+        if self.layout == PixelLayout.COLUMNS_BOTTOM_UP:
+            return arr[::-1].swapaxes(0, 1)
+        return arr
+
+    def _as_rgb_array(self, img: Union[Image.Image, np.ndarray]) -> np.ndarray:
+        if isinstance(img, np.ndarray):
+            arr = img
+        else:
+            arr = np.asarray(img if img.mode == 'RGB' else img.convert('RGB'))
+        if arr.shape[1::-1] != self.canvas_size:
+            raise ValueError(f"Image size {arr.shape[1::-1]} does not match encoder size {self.canvas_size}"
+                             f" at rotation {self._rotation}")
+        return self._rotated_view(arr)
+
+    def encode(self, img: Union[Image.Image, np.ndarray], out: Optional[np.ndarray] = None,
+               rects: Optional[List[Tuple[int, int, int, int]]] = None) -> np.ndarray:
+        """
+        Encode an image to RGB565 in device order.
+
+        Args:
+            img: Image, or (height, width, 3) uint8 RGB array, of exactly canvas_size pixels
+            out: Optional contiguous uint8 array of payload_size bytes to write into
+            rects: Only re-encode these (left, top, right, bottom) regions of the image;
+                `out` must then hold the encoding of the previous frame
+
+        Returns:
+            np.ndarray: uint8 array holding the encoded frame (``out`` when given)
+        """
+        arr = self._as_rgb_array(img)
+        if rects is not None:
+            if out is None:
+                raise ValueError("Partial encoding needs the previous frame in out")
+            encoded = out.view(self._dtype).reshape(self._acc.shape)
+            for rect in rects:
+                self._encode_region(arr, encoded, self._rotate_rect(rect))
+            return out
+
+        if out is None:
+            out = np.empty(self.payload_size, dtype=np.uint8)
+        self._pack(self._device_view(arr), self._acc, self._tmp)
+        np.copyto(out.view(self._dtype).reshape(self._acc.shape), self._acc)
+        return out
+
+    def _encode_region(self, arr: np.ndarray, encoded: np.ndarray, rect: Tuple[int, int, int, int]):
+        """Encode one region of a panel array into its place in an encoded frame (in device order)"""
+        left, top, right, bottom = rect
+        view = self._device_view(arr[top:bottom, left:right])
+        if self.layout == PixelLayout.COLUMNS_BOTTOM_UP:
+            target = encoded[left:right, self.height - bottom:self.height - top]
+        else:
+            target = encoded[top:bottom, left:right]
+        rows, columns = view.shape[:2]
+        acc, tmp = self._acc[:rows, :columns], self._tmp[:rows, :columns]
+        self._pack(view, acc, tmp)
+        np.copyto(target, acc)
+
+    @staticmethod
+    def _pack(view: np.ndarray, acc: np.ndarray, tmp: np.ndarray):
+        """Pack an RGB view into RGB565 values in acc"""
+        # ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+        np.copyto(acc, view[..., 0])
+        np.bitwise_and(acc, 0xF8, out=acc)
+        np.left_shift(acc, 8, out=acc)
+        np.copyto(tmp, view[..., 1])
+        np.bitwise_and(tmp, 0xFC, out=tmp)
+        np.left_shift(tmp, 3, out=tmp)
+        np.bitwise_or(acc, tmp, out=acc)
+        np.copyto(tmp, view[..., 2])
+        np.right_shift(tmp, 3, out=tmp)
+        np.bitwise_or(acc, tmp, out=acc)
+
+    def decode(self, data) -> Image.Image:
+        """
+        Decode an RGB565 payload in device order back into an RGB image, as
+        shown on the panel (after rotation).
+
+        Low bits are left at zero, so decoding then re-encoding (at rotation 0)
+        gives back the exact same payload.
+        """
+        values = np.frombuffer(data, dtype=self._dtype, count=self.width * self.height)
+        values = values.astype(np.uint16).reshape(self._acc.shape)
+
+        rgb = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        view = self._device_view(rgb)
+        view[..., 0] = (values >> 8) & 0xF8
+        view[..., 1] = (values >> 3) & 0xFC
+        view[..., 2] = (values << 3) & 0xF8
+        return Image.fromarray(rgb, 'RGB')
@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .compositor import Compositor, Layer
+
+
+class ForegroundOverlay:
+    """
+    Foreground image prepared once for compositing.
+
+    The image is decoded, its alpha scaled by the configured transparency and
+    placed at its position on a canvas-sized layer. The premultiplied layer
+    is kept too, so compositing onto a frame is one multiply-add over the
+    covered area, in a compositor kept for each background size.
+    """
+
+    def __init__(self, path: str, alpha: float, position: Tuple[int, int], size: Tuple[int, int]):
+        foreground = Image.open(path)
+        if foreground.mode != 'RGBA':
+            foreground = foreground.convert('RGBA')
+        source = np.asarray(foreground)
+
+        width, height = size
+        x, y = position
+        left, top = max(0, -x), max(0, -y)
+        right = min(source.shape[1], width - x)
+        bottom = min(source.shape[0], height - y)
+
+        layer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.bbox = None
+        if right > left and bottom > top:
+            self.bbox = (x + left, y + top, x + right, y + bottom)
+            layer[y + top:y + bottom, x + left:x + right] = source[top:bottom, left:right]
+
+        # Apply transparency
+        if alpha < 1.0:
+            layer[..., 3] = (layer[..., 3] * max(alpha, 0.0)).astype(np.uint8)
+
+        self.image = Image.fromarray(layer, 'RGBA')
+        self.layer = Layer.from_image(self.image)
+        self._covered = self.layer.crop(*self.bbox) if self.bbox is not None else None
+        # Overlays are shared between generators, which may composite from different threads
+        self._compositors: Dict[Tuple[int, int], Compositor] = {}
+        self._lock = threading.Lock()
+
+    def composite(self, background: Image.Image) -> Image.Image:
+        """Return an RGB copy of background with the foreground composited over it"""
+        with self._lock:
+            compositor = self._compositors.get(background.size)
+            if compositor is None:
+                compositor = self._compositors[background.size] = Compositor(*background.size)
+            compositor.load(background)
+            if self._covered is not None:
+                compositor.blend(self._covered, self.bbox[:2])
+            return Image.fromarray(compositor.frame, 'RGB')
+
+
+@lru_cache(maxsize=4)
+def _prepare(path: str, mtime_ns: int, alpha: float, position: Tuple[int, int],
+             size: Tuple[int, int]) -> ForegroundOverlay:
+    return ForegroundOverlay(path, alpha, position, size)
+
+
+def get_foreground_overlay(path: str, alpha: float, position: Tuple[int, int],
+                           size: Tuple[int, int]) -> ForegroundOverlay:
+    """
+    Return the prepared overlay for a foreground image.
+
+    Overlays are shared between generators, so config reloads and preview
+    rebuilds only prepare it again when the file, alpha, position or canvas
+    size changed.
+    """
+    return _prepare(path, os.stat(path).st_mtime_ns, float(alpha), tuple(position), tuple(size))
@@ -0,0 +1,60 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import array
+from typing import List
+
+import numpy as np
+
+
+class FrameBuffer:
+    """
+    Persistent, preallocated frame buffer laid out as device packets.
+
+    The transfer stream (header + payload, zero padded to a whole number of
+    chunks) is split into packets of ``report_id + chunk``. The header and the
+    report-ID bytes are written once as a template; per frame the encoder only
+    writes pixels into ``payload`` and ``packets`` are memoryview slices of the
+    same buffer, so nothing is allocated on the transfer path.
+    """
+
+    def __init__(self, header: bytes, payload_size: int, chunk_size: int, report_id: bytes = b""):
+        self.header_size = len(header)
+        self.payload_size = payload_size
+        self.chunk_size = chunk_size
+        self.report_id = bytes(report_id)
+
+        stream_size = self.header_size + payload_size
+        self.packet_count = -(-stream_size // chunk_size)
+        self.packet_size = len(self.report_id) + chunk_size
+
+        # array('B') so the whole buffer can be handed to pyusb without a copy
+        self.buffer = array.array('B', bytes(self.packet_count * self.packet_size))
+        packets = np.frombuffer(self.buffer, dtype=np.uint8).reshape(self.packet_count, self.packet_size)
+        packets[:, :len(self.report_id)] = np.frombuffer(self.report_id, dtype=np.uint8)
+
+        if self.report_id:
+            # Report IDs interleave the stream: keep a contiguous stream and
+            # scatter it into the packets with one vectorized copy on commit()
+            self._stream = np.zeros(self.packet_count * chunk_size, dtype=np.uint8)
+            self._packet_stream = packets[:, len(self.report_id):]
+        else:
+            self._stream = packets.reshape(-1)
+            self._packet_stream = None
+
+        self._stream[:self.header_size] = np.frombuffer(header, dtype=np.uint8)
+        self.payload = self._stream[self.header_size:stream_size]
+
+        view = memoryview(self.buffer)
+        self.packets: List[memoryview] = [
+            view[i * self.packet_size:(i + 1) * self.packet_size] for i in range(self.packet_count)
+        ]
+
+    def commit(self):
+        """Make the payload written by the encoder visible in the packets"""
+        if self._packet_stream is not None:
+            np.copyto(self._packet_stream, self._stream.reshape(self.packet_count, self.chunk_size))
+
+    def tobytes(self) -> bytes:
+        """Return the header + payload stream (for debugging and tests)"""
+        return self._stream[:self.header_size + self.payload_size].tobytes()
@@ -0,0 +1,201 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import errno
+import hashlib
+import mmap
+import os
+import struct
+from typing import List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+
+from .encoder import PixelLayout, Rgb565Encoder
+from ...common.logging_config import get_service_logger
+
+# magic, version, reserved, width, height, frame count
+_HEADER = struct.Struct("<4sHHIII")
+_MAGIC = b"TRFC"
+_VERSION = 1
+
+
+def cache_entry_size(width: int, height: int, frame_count: int) -> int:
+    """Size in bytes of a cache file holding frame_count frames"""
+    return _HEADER.size + frame_count * (width * height * 2 + 8)
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "thermalright-lcd-control", "frames")
+
+
+class CachedFrames(Sequence):
+    """
+    Pre-decoded background frames read back from a cache file through mmap.
+
+    Frames are stored as row-major little-endian RGB565 at device resolution,
+    followed by one float64 display duration per frame. Indexing decodes a
+    frame into a new RGB image; the frame data itself stays in the page cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, width, height, count = _HEADER.unpack_from(self._mmap)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"not a frame cache file (version {version})")
+            self.width = width
+            self.height = height
+            self._encoder = Rgb565Encoder(width, height, PixelLayout.ROWS)
+            self._frame_size = self._encoder.payload_size
+            durations_offset = _HEADER.size + count * self._frame_size
+            if count == 0 or len(self._mmap) != durations_offset + count * 8:
+                raise ValueError(f"truncated frame cache file ({len(self._mmap)} bytes)")
+            self.durations = np.frombuffer(self._mmap, dtype='<f8', count=count,
+                                           offset=durations_offset).tolist()
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def __len__(self) -> int:
+        return len(self.durations)
+
+    def __getitem__(self, index: int) -> Image.Image:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        offset = _HEADER.size + index * self._frame_size
+        return self._encoder.decode(memoryview(self._mmap)[offset:offset + self._frame_size])
+
+    def close(self):
+        self._mmap.close()
+
+
+class FrameCacheWriter:
+    """
+    Append frames to a new cache file; it only becomes visible on commit().
+
+    Appending past max_bytes (the size reserved for the entry) raises
+    OSError, for sources that turn out longer than their reported frame count.
+    """
+
+    def __init__(self, path: str, width: int, height: int, max_bytes: Optional[int] = None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.max_bytes = max_bytes
+        self._encoder = Rgb565Encoder(width, height, PixelLayout.ROWS)
+        self._durations = []
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, 0, width, height, 0))
+
+    def append(self, image: Image.Image, duration: float):
+        if self.max_bytes is not None and \
+                cache_entry_size(self.width, self.height, len(self._durations) + 1) > self.max_bytes:
+            raise OSError(errno.EFBIG, f"frame cache entry over {self.max_bytes} bytes")
+        self._file.write(self._encoder.encode(image).data)
+        self._durations.append(duration)
+
+    def commit(self) -> str:
+        self._file.write(np.asarray(self._durations, dtype='<f8').tobytes())
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION, 0, self.width, self.height, len(self._durations)))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class FrameCache:
+    """
+    Persistent cache of resized background frames.
+
+    Entries are keyed by the source files (path, mtime and size), the device
+    resolution and the rotation, so any change to the sources gives a new key.
+    The directory comes from THERMALRIGHT_FRAME_CACHE_DIR (an empty value
+    disables the cache), then $XDG_CACHE_HOME. Only the most recently used
+    entries are kept, up to MAX_ENTRIES files and max_bytes on disk; a source
+    too large for the whole budget is not cached at all.
+
+    Each new entry reserves room for its reported frame count plus
+    FRAME_COUNT_SLACK (video containers only estimate it), and is not
+    written past that reservation.
+    """
+
+    MAX_ENTRIES = 16
+    MAX_BYTES = 1 << 30
+    FRAME_COUNT_SLACK = 0.05
+    SUFFIX = ".frames"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.logger = get_service_logger()
+        if cache_dir is None:
+            cache_dir = os.environ.get("THERMALRIGHT_FRAME_CACHE_DIR", default_cache_dir())
+        self.cache_dir = cache_dir
+        self.max_bytes = self.MAX_BYTES if max_bytes is None else max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.cache_dir)
+
+    def path_for(self, sources: List[str], width: int, height: int, rotation: int = 0) -> str:
+        key = hashlib.sha1(f"v{_VERSION}|{width}x{height}|{rotation}".encode())
+        for source in sources:
+            st = os.stat(source)
+            key.update(f"|{os.path.abspath(source)}|{st.st_mtime_ns}|{st.st_size}".encode())
+        return os.path.join(self.cache_dir, key.hexdigest() + self.SUFFIX)
+
+    def load(self, path: str) -> Optional[CachedFrames]:
+        """Open a cache entry, or return None on a miss or an unusable file"""
+        if not os.path.exists(path):
+            return None
+        try:
+            frames = CachedFrames(path)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring frame cache file {path}: {e}")
+            return None
+        # Mark as recently used for pruning
+        os.utime(path)
+        return frames
+
+    def writer(self, path: str, width: int, height: int, frame_count: int) -> Optional[FrameCacheWriter]:
+        """Start a cache entry for frame_count frames, or return None when it cannot be cached"""
+        size = cache_entry_size(width, height, int(frame_count * (1 + self.FRAME_COUNT_SLACK)) + 1)
+        if size > self.max_bytes:
+            self.logger.info(f"Not caching {frame_count} frames ({size / 2 ** 20:.0f} MiB): "
+                             f"over the {self.max_bytes / 2 ** 20:.0f} MiB frame cache budget")
+            return None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._prune(size)
+            return FrameCacheWriter(path, width, height, size)
+        except OSError as e:
+            self.logger.warning(f"Cannot write frame cache in {self.cache_dir}: {e}")
+            return None
+
+    def _prune(self, reserve: int):
+        """Evict the least recently used entries until a new one of `reserve` bytes fits"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(self.SUFFIX):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        entries.sort()
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if count < self.MAX_ENTRIES and total + reserve <= self.max_bytes:
+                break
+            os.unlink(os.path.join(self.cache_dir, name))
+            count -= 1
+            total -= size
@@ -5,11 +5,13 @@ import glob
 import os
 import threading
 import time
-from typing import Tuple
+from functools import partial
+from typing import List, Optional, Tuple
 
 from PIL import Image, ImageSequence
 
 from .config import BackgroundType, DisplayConfig
+from .frame_cache import FrameCache
 from ..metrics.cpu_metrics import CpuMetrics
 from ..metrics.gpu_metrics import GpuMetrics
 from ...common.logging_config import get_service_logger
@@ -18,18 +20,61 @@ from ...common.logging_config import get_service_logger
 try:
     import cv2
 
+    from .video_stream import VideoStream
+
     HAS_OPENCV = True
 except ImportError:
     HAS_OPENCV = False
 
+# Shown by metric widgets until the first sample is collected
+METRIC_PENDING = "..."
+
+
+def _if_gpu(read):
+    """Read a GPU metric only when a GPU was detected"""
+    return lambda gpu: read(gpu) if gpu.gpu_vendor is not None else None
+
+
+# Metric key -> (collector, read): the collector is "cpu" or "gpu"
+METRIC_SOURCES = {
+    'cpu_temperature': ('cpu', lambda cpu: cpu.get_temperature()),
+    'cpu_usage': ('cpu', lambda cpu: cpu.get_usage_percentage()),
+    'cpu_frequency': ('cpu', lambda cpu: cpu.get_frequency()),
+    'gpu_temperature': ('gpu', _if_gpu(lambda gpu: gpu.get_temperature())),
+    'gpu_usage': ('gpu', _if_gpu(lambda gpu: gpu.get_usage_percentage())),
+    'gpu_frequency': ('gpu', _if_gpu(lambda gpu: gpu.get_frequency())),
+    'gpu_vendor': ('gpu', lambda gpu: gpu.gpu_vendor),
+    'gpu_name': ('gpu', lambda gpu: gpu.gpu_name),
+}
+METRIC_NAMES = tuple(METRIC_SOURCES)
+
+
+def referenced_metrics(config: DisplayConfig) -> Tuple[str, ...]:
+    """The metric keys the enabled widgets of a config display, in METRIC_NAMES order"""
+    names = {metric.name for metric in config.metrics_configs or [] if metric.enabled}
+    for graph in (config.bar_configs or []) + (config.circular_configs or []):
+        if graph.enabled and getattr(graph, 'metric_name', None):
+            names.add(graph.metric_name)
+    return tuple(name for name in METRIC_NAMES if name in names)
+
 
 class FrameManager:
     """Frame manager with real-time metrics updates"""
 
     # Supported video formats
     SUPPORTED_VIDEO_FORMATS = ['.mp4', '.avi', '.mkv', '.mov', '.webm', '.flv', '.wmv', '.m4v']
+    # Decode videos on the fly instead of holding every frame in memory
+    STREAM_VIDEO = True
+    # Number of frames the video decoder thread reads ahead
+    VIDEO_LOOKAHEAD = 8
 
-    def __init__(self, config: DisplayConfig):
+    def __init__(self, config: DisplayConfig, collect_metrics: bool = True):
+        """
+        Args:
+            config: Display configuration
+            collect_metrics: Start the metric collectors when the widgets need them;
+                when False, metrics stay pending (startup frames)
+        """
         self.config = config
         self.logger = get_service_logger()
 
@@ -39,27 +84,25 @@ class FrameManager:
         self.gif_durations = []
         self.frame_duration = 1.0
         self.frame_start_time = 0
+        self.video_stream = None
+        self.stream_frame = None
+        self.frame_cache = FrameCache()
         self.metrics_thread = None
         self.metrics_running = False
         self.metrics_lock = threading.Lock()
-        # Check if we need metrics collectors
-        needs_metrics = (
-            len(config.metrics_configs) != 0 or
-            any(getattr(bar, 'metric_name', None) for bar in config.bar_configs or []) or
-            any(getattr(circ, 'metric_name', None) for circ in config.circular_configs or [])
-        )
-        
-        if needs_metrics:
-            # Initialize metrics collectors
-            self.cpu_metrics = CpuMetrics()
-            self.gpu_metrics = GpuMetrics()
-            # Variables for real-time metrics
-            self.current_metrics = self._get_current_metric()
-            # Start metrics update
-            self._start_metrics_update()
+        # Only the metrics the theme displays are sampled, and only their collectors created
+        self.metric_names = referenced_metrics(config)
+
+        # Collectors are created by the metrics thread: probing the GPU tools can take seconds
+        self.cpu_metrics = None
+        self.gpu_metrics = None
+        if self.metric_names:
+            # Variables for real-time metrics, pending until the first sample
+            self.current_metrics = dict.fromkeys(self.metric_names, METRIC_PENDING)
+            if collect_metrics:
+                # Start metrics update
+                self._start_metrics_update()
         else:
-            self.cpu_metrics = None
-            self.gpu_metrics = None
             self.current_metrics = {}
 
         # Load background
@@ -127,7 +170,7 @@ class FrameManager:
         self.background_frames = [image]
 
     def _resize_image(self, image: Image.Image) -> Image.Image:
-        image = image.resize((self.config.output_width, self.config.output_height), Image.Resampling.LANCZOS)
+        image = image.resize(self.config.canvas_size, Image.Resampling.LANCZOS)
         if image.mode != 'RGBA':
             image = image.convert('RGBA')
         return image
@@ -137,6 +180,9 @@ class FrameManager:
         if not os.path.exists(self.config.background_path):
             raise FileNotFoundError(f"Background GIF not found: {self.config.background_path}")
 
+        if self._load_cached_frames([self.config.background_path]):
+            return
+
         gif = Image.open(self.config.background_path)
 
         self.background_frames = []
@@ -151,6 +197,7 @@ class FrameManager:
             self.gif_durations.append(gif_frame_duration)
 
         self.frame_duration = self.gif_durations[0]
+        self._store_cached_frames([self.config.background_path], self.gif_durations)
 
     def _load_video(self):
         """Load a video and retrieve FPS from metadata"""
@@ -166,6 +213,16 @@ class FrameManager:
             raise RuntimeError(
                 f"Unsupported video format '{file_ext}'. Supported formats: {', '.join(self.SUPPORTED_VIDEO_FORMATS)}")
 
+        if self._load_cached_frames([self.config.background_path]):
+            return
+
+        if self.STREAM_VIDEO:
+            # The first pass of the stream fills the frame cache
+            path = self._cache_path([self.config.background_path])
+            open_cache_writer = partial(self.frame_cache.writer, path, *self.config.canvas_size) if path else None
+            self._open_video_stream(open_cache_writer)
+            return
+
         video_capture = cv2.VideoCapture(self.config.background_path)
         if not video_capture.isOpened():
             raise RuntimeError(
@@ -186,6 +243,8 @@ class FrameManager:
             self.background_frames.append(image)
 
         video_capture.release()
+        self._store_cached_frames([self.config.background_path],
+                                  [self.frame_duration] * len(self.background_frames))
 
         self.logger.info(f"Video loaded: {os.path.basename(self.config.background_path)}")
         self.logger.info(f"  Format: {os.path.splitext(self.config.background_path)[1].upper()}")
@@ -193,6 +252,30 @@ class FrameManager:
         self.logger.info(f"  Duration: {duration:.1f}s")
         self.logger.info(f"  Frame duration: {self.frame_duration:.3f}s")
 
+    def _open_video_stream(self, open_cache_writer=None):
+        """Start streaming a video through a decoder thread with a bounded look-ahead"""
+        self.video_stream = VideoStream(self.config.background_path,
+                                        *self.config.canvas_size,
+                                        self.VIDEO_LOOKAHEAD, open_cache_writer)
+        fps = self.video_stream.fps
+        duration = self.video_stream.frame_count / fps if fps > 0 else 0
+        self.frame_duration = self.video_stream.frame_duration
+
+        # Wait for the first frame so the display never starts on an empty background
+        first = self.video_stream.next_frame(timeout=5.0)
+        if first is None:
+            self.video_stream.close()
+            self.video_stream = None
+            raise RuntimeError(f"Cannot decode video: {self.config.background_path}")
+        self.current_frame_index, self.stream_frame = first
+
+        self.logger.info(f"Video streaming: {os.path.basename(self.config.background_path)}")
+        self.logger.info(f"  Format: {os.path.splitext(self.config.background_path)[1].upper()}")
+        self.logger.info(f"  FPS: {fps:.2f}")
+        self.logger.info(f"  Duration: {duration:.1f}s")
+        self.logger.info(f"  Frame duration: {self.frame_duration:.3f}s")
+        self.logger.info(f"  Look-ahead: {self.VIDEO_LOOKAHEAD} frames")
+
     def _load_image_collection(self):
         """Load an image collection from a folder"""
         if not os.path.isdir(self.config.background_path):
@@ -211,12 +294,58 @@ class FrameManager:
         if not image_files:
             raise RuntimeError(f"No images found in directory: {self.config.background_path}")
 
+        if self._load_cached_frames(image_files):
+            return
+
         for image_path in image_files:
             image = Image.open(image_path)
             image = self._resize_image(image)
             self.background_frames.append(image)
 
         self.logger.debug(f"Image collection loaded: {len(image_files)} images")
+        self._store_cached_frames(image_files, [1.0] * len(self.background_frames))
+
+    def _cache_path(self, sources: List[str]) -> Optional[str]:
+        if not self.frame_cache.enabled:
+            return None
+        return self.frame_cache.path_for(sources, *self.config.canvas_size,
+                                         getattr(self.config, 'rotation', 0))
+
+    def _load_cached_frames(self, sources: List[str]) -> bool:
+        """Serve the background from the frame cache if these sources were decoded before"""
+        path = self._cache_path(sources)
+        cached = self.frame_cache.load(path) if path else None
+        if cached is None:
+            return False
+
+        self.background_frames = cached
+        self.gif_durations = list(cached.durations)
+        self.frame_duration = cached.durations[0]
+        self.logger.info(f"Background frames loaded from cache: {len(cached)} frames ({path})")
+        return True
+
+    def _store_cached_frames(self, sources: List[str], durations: List[float]):
+        """Write the decoded frames to the frame cache, then serve them from there"""
+        path = self._cache_path(sources)
+        frame_count = len(self.background_frames)
+        writer = self.frame_cache.writer(path, *self.config.canvas_size, frame_count) if path else None
+        if writer is None:
+            return
+
+        try:
+            for frame, duration in zip(self.background_frames, durations):
+                writer.append(frame, duration)
+            writer.commit()
+        except OSError as e:
+            writer.abort()
+            self.logger.warning(f"Cannot write frame cache {path}: {e}")
+            return
+
+        cached = self.frame_cache.load(path)
+        if cached is not None:
+            # Drop the decoded frames from the heap; the page cache holds them now
+            self.background_frames = cached
+            self.logger.info(f"Background frames cached in {path}")
 
     def _load_color_background(self):
         """Load a solid color background"""
@@ -234,7 +363,7 @@ class FrameManager:
                 r, g, b = 0, 0, 0
             
             # Create solid color image
-            color_image = Image.new('RGB', (self.config.output_width, self.config.output_height), (r, g, b))
+            color_image = Image.new('RGB', self.config.canvas_size, (r, g, b))
             
             self.background_frames = [color_image]
             self.logger.info(f"Created color background: RGB({r}, {g}, {b})")
@@ -242,7 +371,7 @@ class FrameManager:
         except Exception as e:
             self.logger.error(f"Error creating color background: {e}")
             # Fallback to black
-            fallback_image = Image.new('RGB', (self.config.output_width, self.config.output_height), (0, 0, 0))
+            fallback_image = Image.new('RGB', self.config.canvas_size, (0, 0, 0))
             self.background_frames = [fallback_image]
 
     def _start_metrics_update(self):
@@ -254,6 +383,8 @@ class FrameManager:
 
     def _metrics_update_loop(self):
         """Metrics update loop every second"""
+        self._create_collectors()
+
         while self.metrics_running:
             try:
                 new_metrics = self._get_current_metric()
@@ -266,38 +397,42 @@ class FrameManager:
                 self.logger.error(f"Error updating metrics: {e}")
                 time.sleep(1.0)
 
+        if self.gpu_metrics:
+            self.gpu_metrics.close()
+
+    def _create_collectors(self):
+        """
+        Create the collectors of the displayed metrics. A collector that fails
+        to initialize is left unset, and its metrics read as "N/A".
+        """
+        collectors = {METRIC_SOURCES[name][0] for name in self.metric_names}
+        if 'cpu' in collectors:
+            try:
+                self.cpu_metrics = CpuMetrics()
+            except Exception as e:
+                self.logger.error(f"Cannot initialize CPU metrics collector: {e}")
+        if 'gpu' in collectors:
+            try:
+                self.gpu_metrics = GpuMetrics()
+            except Exception as e:
+                self.logger.error(f"Cannot initialize GPU metrics collector: {e}")
+
     def _get_current_metric(self):
         try:
-            # Collect CPU and GPU metrics
-            cpu_data = self.cpu_metrics.get_all_metrics()
-            gpu_data = self.gpu_metrics.get_all_metrics()
-            # Update metrics in a thread-safe manner
-            return {
-                # CPU metrics
-                'cpu_temperature': cpu_data.get('temperature'),
-                'cpu_usage': cpu_data.get('usage_percentage'),
-                'cpu_frequency': cpu_data.get('frequency'),
-
-                # GPU metrics
-                'gpu_temperature': gpu_data.get('temperature'),
-                'gpu_usage': gpu_data.get('usage_percentage'),
-                'gpu_frequency': gpu_data.get('frequency'),
-                'gpu_vendor': gpu_data.get('vendor'),
-                'gpu_name': gpu_data.get('name')
-            }
+            # Sample only the metrics the theme displays
+            collectors = {'cpu': self.cpu_metrics, 'gpu': self.gpu_metrics}
+            metrics = {}
+            for name in self.metric_names:
+                collector, read = METRIC_SOURCES[name]
+                if collectors[collector] is None:
+                    metrics[name] = 'N/A'
+                else:
+                    metrics[name] = read(collectors[collector])
+            return metrics
         except Exception as e:
             self.logger.error(f"Error updating metrics: {e}")
             # Return default values so metrics widgets show "N/A" instead of disappearing
-            return {
-                'cpu_temperature': 'N/A',
-                'cpu_usage': 'N/A',
-                'cpu_frequency': 'N/A',
-                'gpu_temperature': 'N/A',
-                'gpu_usage': 'N/A',
-                'gpu_frequency': 'N/A',
-                'gpu_vendor': 'N/A',
-                'gpu_name': 'N/A'
-            }
+            return dict.fromkeys(self.metric_names, 'N/A')
 
     def _gif_duration(self, frame: Image.Image) -> float:
         # Get duration from GIF metadata
@@ -306,10 +441,19 @@ class FrameManager:
         except:
             return 0.1  # Default fallback
 
-    def get_current_frame(self) -> Image.Image:
-        """Get the current background frame"""
+    def advance_frame(self) -> int:
+        """Advance to the background frame due now and return its index"""
         current_time = time.time()
 
+        if self.video_stream is not None:
+            if current_time - self.frame_start_time >= self.frame_duration:
+                # On a decoder underrun keep showing the current frame and retry next call
+                item = self.video_stream.next_frame()
+                if item is not None:
+                    self.frame_start_time = current_time
+                    self.current_frame_index, self.stream_frame = item
+            return self.current_frame_index
+
         if current_time - self.frame_start_time >= self.frame_duration:
             self.frame_start_time = current_time
             self.current_frame_index = (self.current_frame_index + 1) % len(self.background_frames)
@@ -317,6 +461,22 @@ class FrameManager:
         if self.config.background_type == BackgroundType.GIF:
             self.frame_duration = self.gif_durations[self.current_frame_index]
 
+        return self.current_frame_index
+
+    @property
+    def is_static(self) -> bool:
+        """True when the background is a single frame that never changes"""
+        return self.video_stream is None and len(self.background_frames) == 1
+
+    def get_current_frame(self) -> Image.Image:
+        """Get the current background frame"""
+        self.advance_frame()
+        return self.peek_current_frame()
+
+    def peek_current_frame(self) -> Image.Image:
+        """Get the background frame of the last advance_frame() call, without advancing"""
+        if self.video_stream is not None:
+            return self.stream_frame
         return self.background_frames[self.current_frame_index]
 
     def get_current_frame_info(self) -> Tuple[int, float]:
@@ -339,6 +499,9 @@ class FrameManager:
         self.metrics_running = False
         if self.metrics_thread:
             self.metrics_thread.join(timeout=2.0)
+        if self.video_stream:
+            self.video_stream.close()
+            self.video_stream.thread.join(timeout=2.0)
 
         self.logger.debug("FrameManager cleaned up")
 
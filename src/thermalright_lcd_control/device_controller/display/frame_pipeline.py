@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from .compositor import ComposedFrame
+from .frame_buffer import FrameBuffer
+from .frame_scheduler import FrameScheduler
+from .frame_stats import FrameStats
+
+# A rendered frame: a PIL image, an RGB array, or a frame from the NumPy compositor
+Frame = Union[Image.Image, np.ndarray, ComposedFrame]
+
+
+class FramePipeline:
+    """
+    Render -> encode -> USB write pipeline.
+
+    Each stage runs on its own thread (the writer runs on the caller's thread)
+    and the stages share a small pool of frame buffers, so the next frame is
+    rendered and encoded while the current one is on the bus. Rendering is
+    paced by a FrameScheduler; ``render`` may return None when nothing
+    visible changed, in which case nothing is encoded or sent.
+
+    Drop policy: only the newest frame matters. A rendered image that the
+    encoder has not picked up yet is replaced by a newer one, and an encoded
+    frame still waiting for the writer is recycled when a newer frame is
+    ready. Both cases are counted in ``dropped_frames``. When a rendered
+    frame is replaced, ``coalesce(newer, older)`` gives the frame to keep,
+    for frames that only describe what changed since the previous one.
+    """
+
+    def __init__(self,
+                 render: Callable[[], Optional[Frame]],
+                 encode: Callable[[Frame, FrameBuffer], FrameBuffer],
+                 send: Callable[[FrameBuffer], None],
+                 buffers: List[FrameBuffer],
+                 scheduler: FrameScheduler,
+                 logger,
+                 stats: Optional[FrameStats] = None,
+                 error_delay: float = 1.0,
+                 coalesce: Optional[Callable[[Frame, Frame], Frame]] = None):
+        if len(buffers) < 2:
+            raise ValueError("FramePipeline needs at least two frame buffers")
+        self._render = render
+        self._encode = encode
+        self._send = send
+        self.scheduler = scheduler
+        self.logger = logger
+        self.stats = stats
+        self.error_delay = error_delay
+        self._coalesce = coalesce
+
+        self._cond = threading.Condition()
+        self._free = deque(buffers)
+        self._pending_image: Optional[Frame] = None
+        self._ready_frame: Optional[FrameBuffer] = None
+        self._threads: List[threading.Thread] = []
+        self.running = False
+
+        self.frames_sent = 0
+        self.dropped_frames = 0
+
+    # --- stages ---
+
+    def _render_loop(self):
+        while self.running:
+            try:
+                self.scheduler.wait()
+                img = self._render()
+                if img is None:
+                    continue
+                with self._cond:
+                    if self._pending_image is not None:
+                        self.dropped_frames += 1
+                        if self._coalesce is not None:
+                            img = self._coalesce(img, self._pending_image)
+                    self._pending_image = img
+                    self._cond.notify_all()
+            except Exception as e:
+                self.logger.error(f"Error in render stage: {e}")
+                time.sleep(self.error_delay)
+
+    def _encode_loop(self):
+        while self.running:
+            with self._cond:
+                while self.running and (self._pending_image is None or not self._free):
+                    self._cond.wait()
+                if not self.running:
+                    return
+                img = self._pending_image
+                self._pending_image = None
+                frame = self._free.popleft()
+
+            try:
+                start = time.perf_counter()
+                self._encode(img, frame)
+                if self.stats is not None:
+                    self.stats.record("encode", time.perf_counter() - start)
+            except Exception as e:
+                self.logger.error(f"Error in encode stage: {e}")
+                self._release(frame)
+                time.sleep(self.error_delay)
+                continue
+
+            with self._cond:
+                if self._ready_frame is not None:
+                    self._free.append(self._ready_frame)
+                    self.dropped_frames += 1
+                self._ready_frame = frame
+                self._cond.notify_all()
+
+    def _next_ready_frame(self) -> Optional[FrameBuffer]:
+        with self._cond:
+            while self.running and self._ready_frame is None:
+                self._cond.wait()
+            frame = self._ready_frame
+            self._ready_frame = None
+            return frame
+
+    def _release(self, frame: FrameBuffer):
+        with self._cond:
+            self._free.append(frame)
+            self._cond.notify_all()
+
+    # --- control ---
+
+    def start(self):
+        """Start the render and encode stages"""
+        self.running = True
+        for name, target in (("render", self._render_loop), ("encode", self._encode_loop)):
+            thread = threading.Thread(target=target, name=f"frame-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def run(self):
+        """Start the pipeline and run the USB writer on the calling thread until stop()"""
+        self.start()
+        try:
+            while self.running:
+                frame = self._next_ready_frame()
+                if frame is None:
+                    break
+                try:
+                    start = time.perf_counter()
+                    self._send(frame)
+                    self.frames_sent += 1
+                    if self.stats is not None:
+                        self.stats.record("usb", time.perf_counter() - start)
+                except Exception as e:
+                    self.logger.error(f"Error in USB write stage: {e}")
+                    if self.stats is not None:
+                        self.stats.usb_errors += 1
+                    time.sleep(self.error_delay)
+                finally:
+                    self._release(frame)
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the stages, wait for their threads and return unsent buffers to the pool"""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        current = threading.current_thread()
+        for thread in self._threads:
+            if thread is not current:
+                thread.join(timeout)
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        with self._cond:
+            if self._ready_frame is not None:
+                self._free.append(self._ready_frame)
+                self._ready_frame = None
+            self._pending_image = None
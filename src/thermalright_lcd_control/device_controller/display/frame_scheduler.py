@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import time
+from typing import Callable, Optional
+
+
+class FrameScheduler:
+    """
+    Deadline based frame scheduler.
+
+    Frame slots are laid on a fixed grid of the monotonic clock, so the time
+    spent rendering and transferring a frame comes out of the frame budget
+    instead of being added to it. When a frame starts after its deadline the
+    miss is counted; if whole slots were lost they are skipped rather than
+    rendered in a burst to catch up.
+    """
+
+    # Window over which achieved_fps is measured
+    FPS_WINDOW = 5.0
+
+    def __init__(self, target_fps: float, logger=None, report_interval: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.logger = logger
+        self.report_interval = report_interval
+        self._clock = clock
+        self._sleep = sleep
+
+        self.target_fps = 0.0
+        self.period = 0.0
+        self.set_target_fps(target_fps)
+
+        self._next_deadline: Optional[float] = None
+        self.frames = 0
+        self.deadline_misses = 0
+        self.skipped_frames = 0
+        self.achieved_fps = 0.0
+        self._window_start = self._last_report = self._clock()
+        self._window_frames = 0
+
+    def set_target_fps(self, target_fps: float):
+        """Change the frame rate; takes effect from the next slot"""
+        if target_fps <= 0:
+            raise ValueError(f"Invalid target FPS: {target_fps}")
+        if target_fps != self.target_fps:
+            self.target_fps = float(target_fps)
+            self.period = 1.0 / self.target_fps
+
+    def wait(self) -> int:
+        """
+        Sleep until the next frame slot.
+
+        Returns:
+            int: Number of frame slots skipped because the caller was late
+        """
+        now = self._clock()
+        if self._next_deadline is None:
+            self._next_deadline = now
+
+        skipped = 0
+        delay = self._next_deadline - now
+        if delay > 0:
+            self._sleep(delay)
+        elif delay < 0:
+            self.deadline_misses += 1
+            skipped = int(-delay // self.period)
+            if skipped:
+                # Realign on the grid instead of bursting to catch up
+                self.skipped_frames += skipped
+                self._next_deadline += skipped * self.period
+
+        self._next_deadline += self.period
+        self._count_frame()
+        return skipped
+
+    def _count_frame(self):
+        self.frames += 1
+        self._window_frames += 1
+        now = self._clock()
+        elapsed = now - self._window_start
+        if elapsed >= self.FPS_WINDOW:
+            self.achieved_fps = self._window_frames / elapsed
+            self._window_frames = 0
+            self._window_start = now
+
+        if self.logger and now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.logger.info(
+                f"Frame rate: {self.achieved_fps:.1f}/{self.target_fps:.1f} FPS, "
+                f"deadline misses: {self.deadline_misses}, skipped frames: {self.skipped_frames}")
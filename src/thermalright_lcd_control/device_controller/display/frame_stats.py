@@ -0,0 +1,154 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional
+
+from ...common.logging_config import get_service_logger
+
+STATS_DIR = "/run/thermalright-lcd-control"
+STATS_FILE = os.path.join(STATS_DIR, "stats.json")
+
+
+class StageHistogram:
+    """
+    Fixed-size histogram of stage durations.
+
+    Buckets grow geometrically (~12% apart) from 10µs to ~30s, so recording is a
+    bisect plus an increment and percentiles are accurate to one bucket.
+    """
+
+    BOUNDS = tuple(10e-6 * 1.12 ** i for i in range(133))
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (seconds) of the bucket holding the p-th percentile"""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                break
+        if i >= len(self.BOUNDS):
+            return self.max
+        return min(self.BOUNDS[i], self.max)
+
+    def summary(self) -> Dict[str, float]:
+        """Percentiles in milliseconds"""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class FrameStats:
+    """Per-stage frame timings and service counters"""
+
+    STAGES = ("background", "compose", "text", "graphs", "encode", "usb")
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {stage: StageHistogram() for stage in self.STAGES}
+        self.usb_errors = 0
+
+    def record(self, stage: str, seconds: float):
+        self.histograms[stage].record(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+
+class StatsFileWriter:
+    """
+    Periodically rewrite a JSON stats file (atomically, via rename).
+
+    Off unless a path is given or THERMALRIGHT_STATS=1 is set, in which case the
+    file goes to STATS_FILE. The service runs as root, so the directory must be
+    owned by us and not writable by anyone else, and the temp file is created
+    with mkstemp rather than under a predictable name.
+    """
+
+    def __init__(self, collect: Callable[[], dict], path: Optional[str] = None, interval: float = 5.0):
+        self.logger = get_service_logger()
+        self.collect = collect
+        if path is None and os.environ.get("THERMALRIGHT_STATS", "").lower() in ("1", "true", "yes", "on"):
+            path = STATS_FILE
+        self.path = path
+        self.interval = interval
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.path:
+            self.logger.debug("Frame stats file disabled")
+            return
+        try:
+            self._prepare_directory()
+        except OSError as e:
+            self.logger.warning(f"Frame stats file disabled: {e}")
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="frame-stats", daemon=True)
+        self.thread.start()
+        self.logger.info(f"Writing frame stats to {self.path} every {self.interval:.0f}s")
+
+    def _prepare_directory(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o022:
+            raise PermissionError(f"{directory} is not a private directory owned by this user")
+
+    def _loop(self):
+        while self.running:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                self.logger.warning(f"Cannot write frame stats to {self.path}: {e}")
+
+    def write(self):
+        data = self.collect()
+        data["updated"] = time.time()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".stats-", suffix=".tmp", dir=directory)
+        try:
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,78 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from typing import Callable, Optional, Tuple
+
+from PIL import Image
+
+from .compositor import Compositor, Layer
+
+# Gauges are drawn this many times larger, then box-filtered down
+SUPERSAMPLE = 4
+
+
+class GaugeSpriteSheet:
+    """
+    A gauge pre-rendered at `levels` fill levels, from empty to full.
+
+    Each level is drawn `SUPERSAMPLE` times larger and box-filtered down
+    (with premultiplied alpha), so edges and the fill end are antialiased.
+    The levels are stacked vertically in one RGBA sheet; drawing a frame
+    is one alpha blit of the level nearest to the value.
+    """
+
+    def __init__(self, size: Tuple[int, int], levels: int,
+                 draw_level: Callable[[Image.Image, float, int], None]):
+        """
+        Args:
+            size: Sprite size in pixels
+            levels: Number of fill levels, at least 2
+            draw_level: Draws the gauge filled to a fraction in [0, 1] into an
+                image, at the given scale, with its top-left corner at the origin
+        """
+        if levels < 2:
+            raise ValueError(f"A gauge sprite sheet needs at least 2 levels, got {levels}")
+        self.width, self.height = size
+        self.levels = levels
+        self.sheet = Image.new('RGBA', (self.width, self.height * levels), (0, 0, 0, 0))
+
+        large_size = (self.width * SUPERSAMPLE, self.height * SUPERSAMPLE)
+        for level in range(levels):
+            large = Image.new('RGBA', large_size, (0, 0, 0, 0))
+            draw_level(large, level / (levels - 1), SUPERSAMPLE)
+            # RGBA resizing premultiplies alpha, so transparent pixels don't darken the edges
+            self.sheet.paste(large.resize(size, Image.Resampling.BOX), (0, level * self.height))
+
+        # Premultiplied sheet for the NumPy compositor, built on first use
+        self._layer: Optional[Layer] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.sheet.width * self.sheet.height * 4
+
+    def _level(self, fraction: float) -> int:
+        return round(max(0.0, min(1.0, fraction)) * (self.levels - 1))
+
+    def blend(self, compositor: Compositor, position: Tuple[int, int], fraction: float):
+        """Blend the level nearest to fraction into the compositor frame, top-left corner at position"""
+        if self._layer is None:
+            self._layer = Layer.from_image(self.sheet)
+        top = self._level(fraction) * self.height
+        compositor.blend(self._layer.crop(0, top, self.width, top + self.height), position)
+
+    def blit(self, image: Image.Image, position: Tuple[int, int], fraction: float):
+        """Draw the level nearest to fraction with its top-left corner at position"""
+        level = self._level(fraction)
+        x, y = position
+        left, top = max(0, -x), max(0, -y)
+        right = min(self.width, image.width - x)
+        bottom = min(self.height, image.height - y)
+        if right <= left or bottom <= top:
+            return
+
+        source = (left, level * self.height + top, right, level * self.height + bottom)
+        if image.mode == 'RGBA':
+            image.alpha_composite(self.sheet, (x + left, y + top), source)
+        else:
+            region = self.sheet.crop(source)
+            image.paste(region, (x + left, y + top), region)
@@ -3,107 +3,204 @@
 
 import os
 import time
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Optional, Tuple, Union
 
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image
 
+from .compositor import ComposedFrame, Compositor, Layer
 from .config import DisplayConfig
+from .foreground import ForegroundOverlay, get_foreground_overlay
 from .frame_manager import FrameManager
+from .render_plan import compile_render_plan
 from .text_renderer import TextRenderer
 from .utils import async_background
-from .config_unified import ShapeType
 from ...common.logging_config import LoggerConfig
 
 
 class DisplayGenerator:
     """Display image generator with dynamic background and real-time metrics"""
 
-    def __init__(self, config: DisplayConfig):
+    def __init__(self, config: DisplayConfig, collect_metrics: bool = True):
         self.config = config
         self.logger = self.logger = LoggerConfig.setup_service_logger()
         self.refresh_interval = 0.01
+        # Optional FrameStats receiving per-stage timings
+        self.stats = None
         # Initialize components
-        self.frame_manager = FrameManager(config)
+        self.frame_manager = FrameManager(config, collect_metrics)
         self.text_renderer = TextRenderer(config)  # Pass config for global font
+        # Widgets compiled once into draw ops
+        self.plan = compile_render_plan(config, self.text_renderer, self.logger)
+        # Change tracking: the last rendered state
+        self._last_state = None
+        # Layers that only change on config reload, composed once
+        self._base_image = None
+        self._foreground = None
+        self._static_layer = None
+        # NumPy compositor working frame, and the static layers in its format
+        self.compositor = None
+        self._base_array = None
+        self._static_overlays = []
+        if config.compositor == "numpy":
+            self.compositor = Compositor(*config.canvas_size)
+        self._build_static_layers()
 
         self.logger.info(f"DisplayGenerator initialized with background type: {self.config.background_type}")
         self.logger.info(f"Global font: {self.config.global_font_path or 'Default system font'}")
 
-    def _add_foreground_image(self, background: Image.Image) -> Image.Image:
-        """Add foreground image to background"""
+    def _load_foreground(self) -> Optional[ForegroundOverlay]:
+        """Get the prepared foreground overlay, with its transparency applied"""
         if not self.config.foreground_image_path or not os.path.exists(self.config.foreground_image_path):
-            return background
+            return None
 
         try:
-            foreground = Image.open(self.config.foreground_image_path)
-            if foreground.mode != 'RGBA':
-                foreground = foreground.convert('RGBA')
-
-            # Apply transparency
-            if self.config.foreground_alpha < 1.0:
-                alpha = foreground.split()[-1]  # Alpha channel
-                alpha = alpha.point(lambda p: int(p * self.config.foreground_alpha))
-                foreground.putalpha(alpha)
-
-            # Compose foreground image
-            result = background.copy()
-            result.paste(foreground, self.config.foreground_position, foreground)
-            return result
-
+            return get_foreground_overlay(self.config.foreground_image_path, self.config.foreground_alpha,
+                                          self.config.foreground_position, self.config.canvas_size)
         except Exception as e:
             self.logger.warning(f"Cannot load foreground image: {e}")
-            return background
+            return None
+
+    def _build_static_layers(self):
+        """
+        Compose the layers that only change on config reload (which builds a
+        new generator): foreground, custom texts and shapes.
+
+        With a static background they are drawn once onto it, giving the base
+        image every frame starts from. With an animated background, custom
+        texts and shapes go into a transparent layer; the foreground and that
+        layer are composited onto each background frame the same way as onto
+        the base image, so frames come out the same either way.
+        """
+        foreground = self._load_foreground()
+
+        if self.frame_manager.is_static:
+            image = self.frame_manager.get_current_frame()
+            image = foreground.composite(image) if foreground is not None else image.convert('RGBA')
+            self._base_image = image
+            self.plan.draw_static(image)
+        else:
+            self._foreground = foreground
+            if self.plan.static_ops:
+                self._static_layer = Image.new('RGBA', self.config.canvas_size, (0, 0, 0, 0))
+                self.plan.draw_static(self._static_layer)
+
+        if self.compositor is not None:
+            self._prepare_compositor_layers()
+
+    def _prepare_compositor_layers(self):
+        """Convert the static layers for the NumPy compositor, cropped to their visible area"""
+        if self._base_image is not None:
+            self._base_array = np.asarray(self._base_image.convert('RGB'))
+            return
+        if self._foreground is not None and self._foreground.bbox is not None:
+            bbox = self._foreground.bbox
+            self._static_overlays.append((self._foreground.layer.crop(*bbox), bbox[:2]))
+        if self._static_layer is not None:
+            bbox = self._static_layer.getchannel('A').getbbox()
+            if bbox is not None:
+                self._static_overlays.append((Layer.from_image(self._static_layer).crop(*bbox), bbox[:2]))
+
+    def _compose_static_layers(self, background: Optional[Image.Image]) -> Image.Image:
+        """Return a fresh image holding the background (None when static) and every static layer"""
+        if self._base_image is not None:
+            return self._base_image.copy()
+
+        if self._foreground is not None:
+            result = self._foreground.composite(background).convert('RGBA')
+        else:
+            result = background.convert('RGBA') if background.mode != 'RGBA' else background.copy()
+        if self._static_layer is not None:
+            result.alpha_composite(self._static_layer)
+        return result
 
-    def generate_frame_with_metrics(self, metrics: dict) -> Image.Image:
+    def generate_frame_with_metrics(self, metrics: dict, background: Optional[Image.Image] = None) -> Image.Image:
         """
         Generate a complete frame with all elements and real-time metrics
+
+        The frame is drawn on the canvas (see DisplayConfig.canvas_size) and
+        is not rotated: the encoder turns it onto the panel. Its rotation is
+        kept in the image info, under "rotation". The background advances to
+        its frame due now, unless the frame to use is given.
         """
-        # Get current background
-        background = self.frame_manager.get_current_frame()
+        if self.compositor is not None:
+            result = Image.fromarray(self.compose_frame(metrics, background).pixels, 'RGB')
+            result.info["rotation"] = self.config.rotation
+            return result
 
-        # Add foreground image if configured
-        result = self._add_foreground_image(background)
+        stats = self.stats
+        t0 = time.perf_counter()
 
-        # Create drawing object
-        draw = ImageDraw.Draw(result)
+        # Get current background, unless it is static and already part of the base image
+        if background is None and self._base_image is None:
+            background = self.frame_manager.get_current_frame()
+        t1 = time.perf_counter()
 
-        # Draw metrics
-        self.text_renderer.render_metrics(draw, metrics, self.config.metrics_configs)
+        # Add the pre-composed foreground, custom texts and shapes
+        result = self._compose_static_layers(background)
+        t2 = time.perf_counter()
 
-        # Draw date (dd/mm format)
-        self.text_renderer.render_date(draw, self.config.date_config)
+        # Draw metrics, date, time and graphs
+        self.plan.draw(result, metrics, stats)
+        t3 = time.perf_counter()
+
+        convert = result.convert('RGB')
+        convert.info["rotation"] = self.config.rotation
 
-        # Draw time (HH:MM format)
-        self.text_renderer.render_time(draw, self.config.time_config)
+        if stats is not None:
+            stats.record("background", t1 - t0)
+            stats.record("compose", t2 - t1 + time.perf_counter() - t3)
 
-        # Draw custom text widgets
-        if hasattr(self.config, 'text_configs') and self.config.text_configs:
-            for text_config in self.config.text_configs:
-                if text_config.enabled:
-                    self.text_renderer.render_custom_text(draw, text_config)
+        return convert
+
+    def compose_frame(self, metrics: dict, background: Optional[Image.Image] = None) -> ComposedFrame:
+        """
+        Generate a complete frame with the NumPy compositor
 
-        # Draw shapes
-        if hasattr(self.config, 'shape_configs') and self.config.shape_configs:
-            self._render_shapes(draw, self.config.shape_configs)
+        With a static background, the compositor frame still holds the
+        previous frame, so only the regions of the widgets that changed are
+        redrawn, and reported as dirty for a partial encode. Otherwise the
+        background advances to its frame due now, unless the frame is given.
 
-        # Draw bar graphs
-        if hasattr(self.config, 'bar_configs') and self.config.bar_configs:
-            self.logger.debug(f"Found {len(self.config.bar_configs)} bar graph configs")
-            self._render_bar_graphs(draw, metrics, self.config.bar_configs)
+        Returns:
+            ComposedFrame: uint8 RGB canvas frame, ready for the RGB565 encoder,
+            with its dirty rectangles and rotation
+        """
+        stats = self.stats
+        compositor = self.compositor
+        t0 = time.perf_counter()
+
+        if self._base_array is not None and self.plan.can_blend_changes:
+            dirty = self.plan.blend_changes(compositor, self._base_array, metrics, stats)
+            t1 = time.perf_counter()
+            frame = ComposedFrame(compositor.frame.copy(), dirty, self.config.rotation)
+            if stats is not None:
+                stats.record("compose", t1 - t0)
+            return frame
+
+        if self._base_array is not None:
+            t1 = t0
+            compositor.load(self._base_array)
         else:
-            self.logger.debug("No bar_configs found or bar_configs is empty")
+            if background is None:
+                background = self.frame_manager.get_current_frame()
+            t1 = time.perf_counter()
+            compositor.load(background)
+            for layer, origin in self._static_overlays:
+                compositor.blend(layer, origin)
+        t2 = time.perf_counter()
 
-        # Draw circular graphs
-        if hasattr(self.config, 'circular_configs') and self.config.circular_configs:
-            self._render_circular_graphs(draw, metrics, self.config.circular_configs)
+        # Blend metrics, date, time and graphs
+        self.plan.blend(compositor, metrics, stats)
 
-        convert = result.convert('RGB')
+        # The working frame is reused, so the encoder gets its own copy
+        frame = ComposedFrame(compositor.frame.copy(), rotation=self.config.rotation)
 
-        # Apply rotation if specified
-        if hasattr(self.config, 'rotation') and self.config.rotation:
-            convert = convert.rotate(-self.config.rotation)  # PIL rotate uses counterclockwise
+        if stats is not None:
+            stats.record("background", t1 - t0)
+            stats.record("compose", t2 - t1)
 
-        return convert
+        return frame
 
     def generate_frame(self) -> Image.Image:
         # Get current real-time metrics
@@ -121,187 +218,40 @@ class DisplayGenerator:
         frame = self.generate_frame()
         return frame, self.refresh_interval
 
+    def _frame_state(self, metrics: dict) -> tuple:
+        """Everything visible that can change from one frame to the next"""
+        return self.frame_manager.advance_frame(), self.plan.state(metrics)
+
+    def get_frame_if_changed(self) -> Optional[Union[Image.Image, ComposedFrame]]:
+        """
+        Generate a frame only if something visible changed since the last one
+
+        Returns:
+            Optional[Union[Image.Image, ComposedFrame]]: The new frame (a ComposedFrame
+            with the NumPy compositor), or None when nothing changed
+        """
+        metrics = self.frame_manager.get_current_metrics()
+        state = self._frame_state(metrics)
+        if state == self._last_state:
+            return None
+        # _frame_state() advanced the background for this tick already
+        background = self.frame_manager.peek_current_frame() if self._base_image is None else None
+        if self.compositor is not None:
+            frame = self.compose_frame(metrics, background)
+        else:
+            frame = self.generate_frame_with_metrics(metrics, background)
+        self._last_state = state
+        return frame
+
+    def invalidate(self):
+        """Force the next get_frame_if_changed() call to render a full frame"""
+        self._last_state = None
+        self.plan.reset_changes()
+
     def get_current_metrics(self) -> Dict[str, Any]:
         """Get current metrics"""
         return self.frame_manager.get_current_metrics()
 
-    def _render_shapes(self, draw: ImageDraw.Draw, shape_configs):
-        """Render shape widgets"""
-        for config in shape_configs:
-            if not config.enabled:
-                continue
-
-            try:
-                if config.shape_type.value == 'rectangle':
-                    if config.filled:
-                        draw.rectangle(
-                            [config.position[0], config.position[1],
-                             config.position[0] + config.width, config.position[1] + config.height],
-                            fill=config.color[:3],  # RGB only
-                            outline=config.border_color[:3] if config.border_color else None,
-                            width=config.border_width
-                        )
-                    else:
-                        draw.rectangle(
-                            [config.position[0], config.position[1],
-                             config.position[0] + config.width, config.position[1] + config.height],
-                            outline=config.border_color[:3] if config.border_color else config.color[:3],
-                            width=config.border_width
-                        )
-
-                elif config.shape_type.value == 'circle':
-                    # Draw circle (ellipse with equal width/height)
-                    bbox = [config.position[0], config.position[1],
-                           config.position[0] + config.width, config.position[1] + config.height]
-                    if config.filled:
-                        draw.ellipse(bbox, fill=config.color[:3], outline=config.border_color[:3] if config.border_color else None, width=config.border_width)
-                    else:
-                        draw.ellipse(bbox, outline=config.border_color[:3] if config.border_color else config.color[:3], width=config.border_width)
-
-                elif config.shape_type.value == 'rounded_rectangle':
-                    # For rounded rectangle, we'll approximate with a regular rectangle for now
-                    # PIL doesn't have native rounded rectangle support
-                    if config.filled:
-                        draw.rectangle(
-                            [config.position[0], config.position[1],
-                             config.position[0] + config.width, config.position[1] + config.height],
-                            fill=config.color[:3],
-                            outline=config.border_color[:3] if config.border_color else None,
-                            width=config.border_width
-                        )
-                    else:
-                        draw.rectangle(
-                            [config.position[0], config.position[1],
-                             config.position[0] + config.width, config.position[1] + config.height],
-                            outline=config.border_color[:3] if config.border_color else config.color[:3],
-                            width=config.border_width
-                        )
-
-            except Exception as e:
-                self.logger.warning(f"Error rendering shape: {e}")
-
-    def _render_bar_graphs(self, draw: ImageDraw.Draw, metrics: dict, bar_configs):
-        """Render bar graph widgets"""
-        for config in bar_configs:
-            if not config.enabled:
-                continue
-
-            try:
-                self.logger.debug(f"Rendering bar graph: position={config.position}, width={config.width}, height={config.height}, color={getattr(config, 'color', 'None')}, fill_color={getattr(config, 'fill_color', 'None')}, background_color={getattr(config, 'background_color', 'None')}")
-                
-                # Get metric value
-                value = metrics.get(config.metric_name, 0.0)
-                if value is None:
-                    value = 0.0
-
-                self.logger.debug(f"Bar graph metric {config.metric_name}: raw_value={value}, min_value={config.min_value}, max_value={config.max_value}")
-
-                # Normalize value to 0-1 range
-                normalized_value = max(0.0, min(1.0, (value - config.min_value) / (config.max_value - config.min_value)))
-
-                self.logger.debug(f"Bar graph normalized_value: {normalized_value}")
-
-                # Calculate bar dimensions
-                bar_width = int(config.width * normalized_value)
-                bar_height = config.height
-
-                self.logger.debug(f"Bar graph dimensions: bar_width={bar_width}, bar_height={bar_height}")
-
-                # Draw background bar
-                draw.rectangle(
-                    [config.position[0], config.position[1],
-                     config.position[0] + config.width, config.position[1] + config.height],
-                    fill=config.background_color[:3] if hasattr(config, 'background_color') and config.background_color else (64, 64, 64),
-                    outline=config.border_color[:3] if hasattr(config, 'border_color') and config.border_color else None,
-                    width=config.border_width if hasattr(config, 'border_width') else 1
-                )
-
-                # Draw filled bar
-                if bar_width > 0:
-                    fill_color = config.fill_color[:3] if hasattr(config, 'fill_color') and config.fill_color else config.color[:3]
-                    self.logger.debug(f"Drawing filled bar with color: {fill_color}")
-                    draw.rectangle(
-                        [config.position[0], config.position[1],
-                         config.position[0] + bar_width, config.position[1] + config.height],
-                        fill=fill_color
-                    )
-
-                # Draw value text if enabled
-                if hasattr(config, 'show_value') and config.show_value:
-                    value_text = f"{value:.1f}"
-                    font = self.text_renderer._get_font(min(12, config.height - 4))
-                    bbox = draw.textbbox(config.position, value_text, font=font)
-                    text_x = config.position[0] + config.width // 2
-                    text_y = config.position[1] + config.height // 2
-                    draw.text((text_x, text_y), value_text, fill=(255, 255, 255), font=font, anchor='mm')
-
-            except Exception as e:
-                self.logger.warning(f"Error rendering bar graph: {e}")
-
-    def _render_circular_graphs(self, draw: ImageDraw.Draw, metrics: dict, circular_configs):
-        """Render circular graph widgets"""
-        for config in circular_configs:
-            if not config.enabled:
-                continue
-
-            try:
-                self.logger.debug(f"Rendering circular graph: position={config.position}, radius={config.radius}, color={getattr(config, 'color', 'None')}, fill_color={getattr(config, 'fill_color', 'None')}, background_color={getattr(config, 'background_color', 'None')}")
-                
-                # Get metric value
-                value = metrics.get(config.metric_name, 0.0)
-                if value is None:
-                    value = 0.0
-
-                self.logger.debug(f"Circular graph metric {config.metric_name}: raw_value={value}, min_value={config.min_value}, max_value={config.max_value}")
-
-                # Normalize value to 0-1 range
-                normalized_value = max(0.0, min(1.0, (value - config.min_value) / (config.max_value - config.min_value)))
-
-                self.logger.debug(f"Circular graph normalized_value: {normalized_value}, sweep_angle will be: {int(config.sweep_angle * normalized_value)}")
-
-                # Calculate angles
-                start_angle = config.start_angle
-                sweep_angle = int(config.sweep_angle * normalized_value)
-
-                # Draw background circle
-                bbox = [config.position[0] - config.radius, config.position[1] - config.radius,
-                       config.position[0] + config.radius, config.position[1] + config.radius]
-
-                if hasattr(config, 'background_color') and config.background_color:
-                    self.logger.debug(f"Drawing background circle with color: {config.background_color}")
-                    draw.ellipse(bbox, fill=config.background_color[:3])
-
-                # Draw filled arc
-                if sweep_angle > 0:
-                    fill_color = config.fill_color[:3] if hasattr(config, 'fill_color') and config.fill_color else config.color[:3]
-                    self.logger.debug(f"Drawing filled arc with color: {fill_color}")
-                    draw.pieslice(
-                        bbox,
-                        start=start_angle,
-                        end=start_angle + sweep_angle,
-                        fill=fill_color
-                    )
-
-                # Draw border if enabled
-                if hasattr(config, 'show_border') and config.show_border:
-                    draw.ellipse(
-                        bbox,
-                        outline=config.border_color[:3] if hasattr(config, 'border_color') and config.border_color else None,
-                        width=config.border_width if hasattr(config, 'border_width') else 1
-                    )
-
-                # Draw value text if enabled
-                if hasattr(config, 'show_percentage') and config.show_percentage:
-                    percentage = int(normalized_value * 100)
-                    value_text = f"{percentage}%"
-                    font = self.text_renderer._get_font(min(12, config.radius // 2))
-                    text_x = config.position[0]
-                    text_y = config.position[1]
-                    draw.text((text_x, text_y), value_text, fill=(255, 255, 255), font=font, anchor='mm')
-
-            except Exception as e:
-                self.logger.warning(f"Error rendering circular graph: {e}")
-
     @async_background
     def cleanup(self):
         """Clean up resources"""
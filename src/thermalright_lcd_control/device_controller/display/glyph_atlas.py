@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFont
+
+# Characters of a numeric readout, before labels and units are added
+NUMERIC_CHARS = "0123456789+-.,:%/ "
+
+
+def _pixel(value: int) -> int:
+    """Round a 26.6 fixed point coordinate to the nearest pixel, as FreeType layout does"""
+    return (value + 32) >> 6
+
+
+class GlyphAtlas:
+    """
+    Pre-rendered glyph cells for numeric readouts in one font and size.
+
+    Strings made of atlas characters are built by blitting glyph coverage
+    masks at kerning-aware pen positions, reproducing what FreeType would
+    rasterize for the whole string without running it. Masks are colour
+    independent; the colour is applied when the mask becomes a sprite.
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont, chars: Iterable[str] = NUMERIC_CHARS):
+        self.font = font
+        self._glyphs: Dict[str, Tuple[np.ndarray, int, int, int]] = {}
+        self._kerning: Dict[Tuple[str, str], int] = {}
+        for char in dict.fromkeys(chars):
+            self._add_glyph(char)
+
+        # The vertical 'm' anchor does not depend on the text
+        self._baseline = self.font.getbbox("0", anchor='mm')[1] - self.font.getbbox("0", anchor='ls')[1]
+
+    def _add_glyph(self, char: str):
+        mask, (left, top) = self.font.getmask2(char, mode='L', anchor='ls')
+        width, height = mask.size
+        cell = np.asarray(Image.frombytes('L', mask.size, bytes(mask))) if width and height else None
+        advance = round(self.font.getlength(char) * 64)
+        self._glyphs[char] = (cell, left, top, advance)
+
+    def covers(self, text: str) -> bool:
+        return all(char in self._glyphs for char in text)
+
+    def _kern(self, first: str, second: str) -> int:
+        pair = (first, second)
+        kern = self._kerning.get(pair)
+        if kern is None:
+            kern = (round(self.font.getlength(first + second) * 64)
+                    - self._glyphs[first][3] - self._glyphs[second][3])
+            self._kerning[pair] = kern
+        return kern
+
+    def render(self, text: str) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """
+        Build the coverage mask of text, centered ('mm' anchor) on the origin.
+
+        Returns:
+            Optional[Tuple[Image.Image, Tuple[int, int]]]: ('L' mask, offset of
+            its top-left corner from the anchor point), or None for blank text
+        """
+        cells = []
+        pen = 0
+        for i, char in enumerate(text):
+            cell, left, top, advance = self._glyphs[char]
+            if cell is not None:
+                cells.append((_pixel(pen) + left, top, cell))
+            pen += advance
+            if i + 1 < len(text):
+                pen += self._kern(char, text[i + 1])
+        if not cells:
+            return None
+
+        x0 = min(x for x, _, _ in cells)
+        y0 = min(y for _, y, _ in cells)
+        x1 = max(x + cell.shape[1] for x, _, cell in cells)
+        y1 = max(y + cell.shape[0] for _, y, cell in cells)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint16)
+        for x, y, cell in cells:
+            area = mask[y - y0:y - y0 + cell.shape[0], x - x0:x - x0 + cell.shape[1]]
+            # Overlapping coverage combines like FreeType's string bitmap: a + b - ab
+            area += cell - (area * cell + 127) // 255
+
+        offset = (x0 - _pixel(pen // 2), y0 + self._baseline)
+        return Image.fromarray(mask.astype(np.uint8), 'L'), offset
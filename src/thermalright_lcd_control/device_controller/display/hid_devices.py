@@ -1,3 +1,4 @@
+import ctypes
 import struct
 from abc import ABC
 
@@ -21,21 +22,46 @@ class HidDevice(DisplayDevice, ABC):
 
     def send_packet(self, packet: bytes):
         """Send packet to device"""
+        if isinstance(packet, memoryview):
+            # hidapi's ctypes binding takes bytes or char arrays: wrap the frame buffer slice without copying
+            packet = (ctypes.c_char * len(packet)).from_buffer(packet)
         self.dev.write(packet)
 
 
+def header_04185304(width: int, height: int) -> bytes:
+    """Frame header of the 0418:5304 protocol"""
+    return struct.pack('<BBHHH',
+                       0x69,
+                       0x88,
+                       width,
+                       height,
+                       0
+                       )
+
+
+def header_04165302(width: int, height: int) -> bytes:
+    """Frame header of the 0416:5302 protocol"""
+    prefix = bytes([0xDA, 0xDB, 0xDC, 0xDD])
+    body = struct.pack(
+        '<6HIH',
+        2,
+        1,
+        width,
+        height,
+        2,
+        0,
+        width * height * 2,
+        0
+    )
+    return prefix + body
+
+
 class DisplayDevice04185304(HidDevice):
     def __init__(self, config_dir: str):
         super().__init__(0x0418, 0x5304, 512, 480, 480, config_dir)
 
     def get_header(self) -> bytes:
-        return struct.pack('<BBHHH',
-                           0x69,
-                           0x88,
-                           480,
-                           480,
-                           0
-                           )
+        return header_04185304(480, 480)
 
 
 class DisplayDevice04165302(HidDevice):
@@ -43,16 +69,4 @@ class DisplayDevice04165302(HidDevice):
         super().__init__(0x0416, 0x5302, 512, 320, 240, config_dir)
 
     def get_header(self) -> bytes:
-        prefix = bytes([0xDA, 0xDB, 0xDC, 0xDD])
-        body = struct.pack(
-            '<6HIH',
-            2,
-            1,
-            320,
-            240,
-            2,
-            0,
-            153600,
-            0
-        )
-        return prefix + body
+        return header_04165302(320, 240)
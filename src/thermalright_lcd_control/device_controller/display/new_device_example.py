@@ -22,7 +22,13 @@ class DisplayDeviceVIDPID(#UsbDevice if you want to use usb device
         # If this works it means that the report id is not correct.
         return bytes.fromhex("your hexadecimal header")
 
-    def _encode_image(self, img: Image) -> bytearray:
+    def _encode_image(self, img: Image, out=None, rotation: int = 0):
         # If encoding is not good, the screen will display a blurry image.
         # Try to find the correct encoding. and implement it here.
-        return super()._encode_image(img)
+        # When `out` is given, either write into it and return it, or return your own bytes.
+        # `img` is the frame as drawn on the canvas (an image or an RGB array) and `rotation`
+        # (0, 90, 180 or 270, clockwise) is how far it must be turned onto the panel: pass it
+        # on to super(), or rotate the frame yourself. An override that ignores `rotation`
+        # must set `encoder_rotates = False` on the class: it is then given frames already
+        # rotated, at the cost of a rotated copy per frame.
+        return super()._encode_image(img, out, rotation)
@@ -0,0 +1,542 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from .compositor import Compositor, Layer, Rect, merge_rects, rects_intersect, union_rect
+from .config import DisplayConfig, MetricConfig, TextConfig
+from .config_unified import BarGraphConfig, CircularGraphConfig, ShapeConfig, ShapeType
+from .gauge_sprites import GaugeSpriteSheet
+from .text_renderer import TextRenderer
+from .text_sprites import SpriteText
+
+VALUE_TEXT_COLOR = (255, 255, 255)
+BAR_BACKGROUND_COLOR = (64, 64, 64)
+# Gauge fill levels pre-rendered for the NumPy compositor when gauge_levels is not set
+DEFAULT_GAUGE_LEVELS = 101
+
+
+def _rgb(color: Optional[Tuple[int, ...]]) -> Optional[Tuple[int, ...]]:
+    return tuple(color[:3]) if color else None
+
+
+class RenderOp(ABC):
+    """
+    One widget, compiled from its config.
+
+    Colors, fonts, bounding boxes and metric keys are resolved once, so
+    drawing only depends on the current metrics. A new widget type is a new
+    RenderOp subclass and a line in compile_render_plan().
+    """
+
+    # FrameStats stage the op's drawing time is accounted to
+    stage = "text"
+    kind = "widget"
+
+    def state(self, metrics: Dict[str, Any]) -> Any:
+        """Everything visible in this op that can change between frames"""
+        return None
+
+    @abstractmethod
+    def draw(self, image: Image.Image, draw: ImageDraw.ImageDraw, metrics: Dict[str, Any]):
+        """Draw the widget for these metrics onto image, through draw"""
+        pass
+
+    @abstractmethod
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any]):
+        """Same as draw(), through the NumPy compositor and pre-rendered sprites"""
+        pass
+
+    @abstractmethod
+    def rect(self, metrics: Dict[str, Any]) -> Optional[Rect]:
+        """Pixels blend() covers for these metrics, or None when it draws nothing"""
+        pass
+
+
+class TextOp(RenderOp):
+    """Text produced by `text`: a custom text, or the date or time"""
+
+    kind = "text"
+
+    def __init__(self, renderer: TextRenderer, config: TextConfig, text: Callable[[], str]):
+        self.renderer = renderer
+        self.text = text
+        self.position = config.position
+        self.font = renderer._get_font(config.font_size)
+        self.color = config.color
+        self.sprite = SpriteText(renderer.sprites, config.position, self.font, config.color)
+
+    def state(self, metrics: Dict[str, Any]) -> Any:
+        return self.text()
+
+    def draw(self, image: Image.Image, draw: ImageDraw.ImageDraw, metrics: Dict[str, Any]):
+        self.renderer._draw_text(image, draw, self.position, self.text(), self.font, self.color)
+
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any]):
+        self.sprite.blend(compositor, self.text())
+
+    def rect(self, metrics: Dict[str, Any]) -> Optional[Rect]:
+        return self.sprite.rect(self.text())
+
+
+class MetricTextOp(RenderOp):
+    """Formatted metric readout"""
+
+    kind = "metric"
+
+    def __init__(self, renderer: TextRenderer, config: MetricConfig):
+        self.renderer = renderer
+        self.metric_name = config.name
+        self.label = config.format_label()
+        self.raw_label = config.label
+        self.unit = config.unit
+        self.format_string = config.format_string
+        # Float formats need a float, even when the metric arrives as a string
+        self.float_format = '{value:.0f}' in config.format_string or '{value:.1f}' in config.format_string
+        self.fallback_format = config.format_string.replace('{value:.0f}', '{value}').replace('{value:.1f}', '{value}')
+        self.position = config.position
+        self.font = renderer._get_font(config.font_size)
+        self.color = config.color
+        self.atlas = renderer.get_atlas(config.font_size, self.font)
+        self.sprite = SpriteText(renderer.sprites, config.position, self.font, config.color, self.atlas)
+        self._formatted = (None, None)
+
+    def state(self, metrics: Dict[str, Any]) -> Any:
+        return metrics.get(self.metric_name)
+
+    def format(self, value: Any) -> str:
+        try:
+            if self.float_format:
+                try:
+                    return self.format_string.format(label=self.label, value=float(value), unit=self.unit)
+                except (ValueError, TypeError):
+                    # Fallback: replace format with simple string
+                    return self.fallback_format.format(label=self.raw_label, value=str(value), unit=self.unit)
+
+            formatted_value = self.renderer._safe_format_value(value, "{value}", self.metric_name)
+            return self.format_string.format(label=self.label, value=formatted_value, unit=self.unit)
+        except Exception as e:
+            self.renderer.logger.warning(f"Error formatting metric {self.metric_name}: {e}")
+            return f"{self.raw_label}: {value}{self.unit}"
+
+    def draw(self, image: Image.Image, draw: ImageDraw.ImageDraw, metrics: Dict[str, Any]):
+        value = metrics.get(self.metric_name)
+        if value is None:
+            return
+        self.renderer._draw_text(image, draw, self.position, self.format(value), self.font, self.color, self.atlas)
+
+    def _text(self, value: Any) -> str:
+        # The same value is formatted for rect() and blend(), and usually for several frames
+        key = (type(value), value)
+        if key != self._formatted[0]:
+            self._formatted = (key, self.format(value))
+        return self._formatted[1]
+
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any]):
+        value = metrics.get(self.metric_name)
+        if value is not None:
+            self.sprite.blend(compositor, self._text(value))
+
+    def rect(self, metrics: Dict[str, Any]) -> Optional[Rect]:
+        value = metrics.get(self.metric_name)
+        return self.sprite.rect(self._text(value)) if value is not None else None
+
+
+class GaugeOp(RenderOp):
+    """
+    Base of the graphs: a metric normalized between min and max.
+
+    With `levels`, the gauge is pre-rendered into an antialiased sprite sheet
+    at that many fill levels, and frames blit the nearest level instead of
+    drawing the shapes.
+    """
+
+    stage = "graphs"
+
+    def __init__(self, renderer: TextRenderer, config):
+        self.renderer = renderer
+        self.metric_name = config.metric_name
+        self.min_value = config.min_value
+        self.span = config.max_value - config.min_value
+        if not self.span:
+            raise ValueError(f"min_value and max_value are both {config.min_value}")
+        self.fill_color = _rgb(config.fill_color) or _rgb(config.color)
+        self.sprites = None
+
+    def _build_sprites(self, levels: int):
+        if levels:
+            left, top, right, bottom = self.bbox
+            self.sprites = GaugeSpriteSheet((right - left + 1, bottom - top + 1), levels, self._draw_level)
+
+    @abstractmethod
+    def _draw_level(self, image: Image.Image, fraction: float, scale: int):
+        """Draw the gauge filled to fraction into a sprite image, scaled by scale"""
+        pass
+
+    @abstractmethod
+    def _draw_shapes(self, draw: ImageDraw.ImageDraw, normalized: float):
+        """Draw the gauge directly onto the frame"""
+        pass
+
+    def _draw_gauge(self, image: Image.Image, draw: ImageDraw.ImageDraw, normalized: float):
+        if self.sprites is not None:
+            self.sprites.blit(image, (self.bbox[0], self.bbox[1]), normalized)
+        else:
+            self._draw_shapes(draw, normalized)
+
+    def _blend_gauge(self, compositor: Compositor, normalized: float):
+        if self.sprites is None:
+            raise RuntimeError("the NumPy compositor needs pre-rendered gauge sprites")
+        self.sprites.blend(compositor, (self.bbox[0], self.bbox[1]), normalized)
+
+    def _gauge_rect(self, label: Optional[SpriteText], text: str) -> Rect:
+        left, top = self.bbox[0], self.bbox[1]
+        rect = (left, top, left + self.sprites.width, top + self.sprites.height)
+        return union_rect(rect, label.rect(text)) if label is not None else rect
+
+    def state(self, metrics: Dict[str, Any]) -> Any:
+        return metrics.get(self.metric_name)
+
+    def value(self, metrics: Dict[str, Any]) -> Tuple[float, float]:
+        """Return (value, value normalized to the 0-1 range)"""
+        try:
+            value = float(metrics.get(self.metric_name))
+        except (TypeError, ValueError):
+            # Missing, pending or "N/A"
+            value = 0.0
+        return value, max(0.0, min(1.0, (value - self.min_value) / self.span))
+
+    def label(self, metrics: Dict[str, Any], text: str) -> str:
+        """text, or the placeholder the metric holds while pending or unavailable"""
+        value = metrics.get(self.metric_name)
+        return value if isinstance(value, str) else text
+
+
+class BarGraphOp(GaugeOp):
+    """Horizontal bar filled in proportion to a metric"""
+
+    kind = "bar graph"
+
+    def __init__(self, renderer: TextRenderer, config: BarGraphConfig, levels: int = 0):
+        super().__init__(renderer, config)
+        x, y = config.position
+        self.x, self.y = x, y
+        self.width = config.width
+        self.bbox = [x, y, x + config.width, y + config.height]
+        self.background_color = _rgb(config.background_color) or BAR_BACKGROUND_COLOR
+        self.border_color = _rgb(config.border_color)
+        self.border_width = config.border_width
+        self.value_font = renderer._get_font(min(12, config.height - 4)) if config.show_value else None
+        self.value_position = (x + config.width // 2, y + config.height // 2)
+        self.value_text = None
+        if self.value_font is not None:
+            self.value_text = SpriteText(renderer.sprites, self.value_position, self.value_font, VALUE_TEXT_COLOR)
+        self._build_sprites(levels)
+
+    def _draw_level(self, image: Image.Image, fraction: float, scale: int):
+        width, height = image.size
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, 0, width - 1, height - 1], fill=self.background_color, outline=self.border_color,
+                       width=self.border_width * scale)
+        fill_width = round(width * fraction)
+        if fill_width > 0:
+            draw.rectangle([0, 0, fill_width - 1, height - 1], fill=self.fill_color)
+
+    def _draw_shapes(self, draw: ImageDraw.ImageDraw, normalized: float):
+        bar_width = int(self.width * normalized)
+
+        # Background bar, then the filled part
+        draw.rectangle(self.bbox, fill=self.background_color, outline=self.border_color, width=self.border_width)
+        if bar_width > 0:
+            draw.rectangle([self.x, self.y, self.x + bar_width, self.bbox[3]], fill=self.fill_color)
+
+    def draw(self, image: Image.Image, draw: ImageDraw.ImageDraw, metrics: Dict[str, Any]):
+        value, normalized = self.value(metrics)
+        self._draw_gauge(image, draw, normalized)
+
+        if self.value_font is not None:
+            draw.text(self.value_position, self.label(metrics, f"{value:.1f}"), fill=VALUE_TEXT_COLOR,
+                      font=self.value_font, anchor='mm')
+
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any]):
+        value, normalized = self.value(metrics)
+        self._blend_gauge(compositor, normalized)
+
+        if self.value_text is not None:
+            self.value_text.blend(compositor, self.label(metrics, f"{value:.1f}"))
+
+    def rect(self, metrics: Dict[str, Any]) -> Optional[Rect]:
+        value, _ = self.value(metrics)
+        return self._gauge_rect(self.value_text, self.label(metrics, f"{value:.1f}"))
+
+
+class CircularGraphOp(GaugeOp):
+    """Pie slice swept in proportion to a metric"""
+
+    kind = "circular graph"
+
+    def __init__(self, renderer: TextRenderer, config: CircularGraphConfig, levels: int = 0):
+        super().__init__(renderer, config)
+        x, y = config.position
+        self.position = config.position
+        self.bbox = [x - config.radius, y - config.radius, x + config.radius, y + config.radius]
+        self.start_angle = config.start_angle
+        self.sweep_angle = config.sweep_angle
+        self.background_color = _rgb(config.background_color)
+        self.show_border = config.show_border
+        self.border_color = _rgb(config.border_color)
+        self.border_width = config.border_width
+        self.percentage_font = renderer._get_font(min(12, config.radius // 2)) if config.show_percentage else None
+        self.percentage_text = None
+        if self.percentage_font is not None:
+            self.percentage_text = SpriteText(renderer.sprites, self.position, self.percentage_font, VALUE_TEXT_COLOR)
+        self._build_sprites(levels)
+
+    def _draw_circle(self, draw: ImageDraw.ImageDraw, bbox, sweep_angle: float, border_width: int):
+        if self.background_color is not None:
+            draw.ellipse(bbox, fill=self.background_color)
+        if sweep_angle > 0:
+            draw.pieslice(bbox, start=self.start_angle, end=self.start_angle + sweep_angle, fill=self.fill_color)
+        if self.show_border:
+            draw.ellipse(bbox, outline=self.border_color, width=border_width)
+
+    def _draw_level(self, image: Image.Image, fraction: float, scale: int):
+        width, height = image.size
+        self._draw_circle(ImageDraw.Draw(image), [0, 0, width - 1, height - 1], self.sweep_angle * fraction, self.border_width * scale)
+
+    def _draw_shapes(self, draw: ImageDraw.ImageDraw, normalized: float):
+        self._draw_circle(draw, self.bbox, int(self.sweep_angle * normalized), self.border_width)
+
+    def draw(self, image: Image.Image, draw: ImageDraw.ImageDraw, metrics: Dict[str, Any]):
+        _, normalized = self.value(metrics)
+        self._draw_gauge(image, draw, normalized)
+
+        if self.percentage_font is not None:
+            draw.text(self.position, self.label(metrics, f"{int(normalized * 100)}%"), fill=VALUE_TEXT_COLOR,
+                      font=self.percentage_font, anchor='mm')
+
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any]):
+        _, normalized = self.value(metrics)
+        self._blend_gauge(compositor, normalized)
+
+        if self.percentage_text is not None:
+            self.percentage_text.blend(compositor, self.label(metrics, f"{int(normalized * 100)}%"))
+
+    def rect(self, metrics: Dict[str, Any]) -> Optional[Rect]:
+        _, normalized = self.value(metrics)
+        return self._gauge_rect(self.percentage_text, self.label(metrics, f"{int(normalized * 100)}%"))
+
+
+class ShapeOp(RenderOp):
+    """Rectangle or circle; rounded rectangles are drawn as plain rectangles"""
+
+    kind = "shape"
+
+    # PIL doesn't have native rounded rectangle support
+    SHAPES = {
+        ShapeType.RECTANGLE: ImageDraw.ImageDraw.rectangle,
+        ShapeType.CIRCLE: ImageDraw.ImageDraw.ellipse,
+        ShapeType.ROUNDED_RECTANGLE: ImageDraw.ImageDraw.rectangle,
+    }
+
+    def __init__(self, renderer: TextRenderer, config: ShapeConfig):
+        x, y = config.position
+        self.bbox = [x, y, x + config.width, y + config.height]
+        self.draw_shape = self.SHAPES[ShapeType(config.shape_type)]
+        border_color = _rgb(config.border_color)
+        if config.filled:
+            self.fill, self.outline = _rgb(config.color), border_color
+        else:
+            self.fill, self.outline = None, border_color or _rgb(config.color)
+        self.border_width = config.border_width
+        self._layer: Optional[Layer] = None
+
+    def draw(self, image: Image.Image, draw: ImageDraw.ImageDraw, metrics: Dict[str, Any]):
+        self.draw_shape(draw, self.bbox, fill=self.fill, outline=self.outline, width=self.border_width)
+
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any]):
+        if self._layer is None:
+            # Rasterized once: a shape never changes
+            left, top, right, bottom = self.bbox
+            image = Image.new('RGBA', (right - left + 1, bottom - top + 1), (0, 0, 0, 0))
+            self.draw_shape(ImageDraw.Draw(image), [0, 0, right - left, bottom - top],
+                            fill=self.fill, outline=self.outline, width=self.border_width)
+            self._layer = Layer.from_image(image)
+        compositor.blend(self._layer, (self.bbox[0], self.bbox[1]))
+
+    def rect(self, metrics: Dict[str, Any]) -> Optional[Rect]:
+        # PIL shape boxes include their right and bottom edges
+        left, top, right, bottom = self.bbox
+        return left, top, right + 1, bottom + 1
+
+
+class RenderPlan:
+    """
+    Flat list of compiled widget ops.
+
+    `static_ops` only change on config reload and are drawn once into the
+    generator's static layers; `ops` are drawn on every frame.
+
+    When blending into the NumPy compositor, the plan remembers the state
+    and the rectangle of every op in the frame it holds, so the next frame
+    can be produced by redrawing only the rectangles that changed.
+    """
+
+    def __init__(self, static_ops: List[RenderOp], ops: List[RenderOp], logger):
+        self.static_ops = static_ops
+        self.ops = ops
+        self.logger = logger
+        self.metric_names = tuple(dict.fromkeys(
+            op.metric_name for op in ops if getattr(op, 'metric_name', None)))
+        # Per op state and rectangle in the compositor frame, None until a full blend
+        self._blended: Optional[Tuple[tuple, List[Optional[Rect]]]] = None
+
+    def state(self, metrics: Dict[str, Any]) -> tuple:
+        """Everything visible in the dynamic ops that can change between frames"""
+        return tuple(op.state(metrics) for op in self.ops)
+
+    def _run(self, op: RenderOp, render: Callable[[RenderOp], None]):
+        try:
+            render(op)
+        except Exception as e:
+            self.logger.warning(f"Error rendering {op.kind}: {e}")
+
+    def _run_all(self, render: Callable[[RenderOp], None], stats, ops: Optional[List[RenderOp]] = None):
+        """Run the dynamic ops, accounting their time per stage when stats is given"""
+        ops = self.ops if ops is None else ops
+        if stats is None:
+            for op in ops:
+                self._run(op, render)
+            return
+
+        totals = {"text": 0.0, "graphs": 0.0}
+        for op in ops:
+            start = time.perf_counter()
+            self._run(op, render)
+            totals[op.stage] += time.perf_counter() - start
+        for stage, seconds in totals.items():
+            stats.record(stage, seconds)
+
+    def draw_static(self, image: Image.Image):
+        draw = ImageDraw.Draw(image)
+        for op in self.static_ops:
+            self._run(op, lambda static_op: static_op.draw(image, draw, {}))
+
+    def draw(self, image: Image.Image, metrics: Dict[str, Any], stats=None):
+        """Draw the dynamic ops onto a PIL image"""
+        metrics = metrics or {}
+        draw = ImageDraw.Draw(image)
+        self._run_all(lambda op: op.draw(image, draw, metrics), stats)
+
+    def blend(self, compositor: Compositor, metrics: Dict[str, Any], stats=None):
+        """Blend the dynamic ops into the NumPy compositor frame"""
+        metrics = metrics or {}
+        self._run_all(lambda op: op.blend(compositor, metrics), stats)
+        self._blended = (self.state(metrics), self._rects(compositor, metrics))
+
+    def _rects(self, compositor: Compositor, metrics: Dict[str, Any]) -> List[Optional[Rect]]:
+        """Rectangle of each op, clipped to the frame"""
+        rects = []
+        for op in self.ops:
+            try:
+                rect = op.rect(metrics)
+            except Exception as e:
+                # Unknown extent: assume the op covers the whole frame
+                self.logger.debug(f"Cannot measure {op.kind}: {e}")
+                rect = (0, 0, compositor.width, compositor.height)
+            if rect is not None:
+                rect = (max(rect[0], 0), max(rect[1], 0),
+                        min(rect[2], compositor.width), min(rect[3], compositor.height))
+                if rect[0] >= rect[2] or rect[1] >= rect[3]:
+                    rect = None
+            rects.append(rect)
+        return rects
+
+    @property
+    def can_blend_changes(self) -> bool:
+        return self._blended is not None
+
+    def reset_changes(self):
+        """Forget the blended frame, so the next one is blended in full"""
+        self._blended = None
+
+    def blend_changes(self, compositor: Compositor, base: np.ndarray, metrics: Dict[str, Any],
+                      stats=None) -> List[Rect]:
+        """
+        Update the compositor frame, which holds the previously blended frame,
+        to the current metrics.
+
+        The old and new rectangles of the ops whose state or extent changed
+        are restored from base, and every op overlapping them is blended
+        again, clipped to them.
+
+        Returns:
+            List[Rect]: The rectangles of the frame that changed
+        """
+        metrics = metrics or {}
+        states, rects = self.state(metrics), self._rects(compositor, metrics)
+        old_states, old_rects = self._blended
+        dirty = []
+        for state, rect, old_state, old_rect in zip(states, rects, old_states, old_rects):
+            if state != old_state or rect != old_rect:
+                dirty += [r for r in (old_rect, rect) if r is not None]
+        dirty = merge_rects(dirty)
+
+        for rect in dirty:
+            compositor.restore(base, rect)
+        clips = {op: [d for d in dirty if rects_intersect(rect, d)]
+                 for op, rect in zip(self.ops, rects) if rect is not None}
+
+        def render(op: RenderOp):
+            for clip in clips[op]:
+                compositor.clip = clip
+                op.blend(compositor, metrics)
+
+        try:
+            self._run_all(render, stats, [op for op in self.ops if clips.get(op)])
+        finally:
+            compositor.clip = None
+        self._blended = (states, rects)
+        return dirty
+
+
+def compile_render_plan(config: DisplayConfig, renderer: TextRenderer, logger) -> RenderPlan:
+    """Turn a display config into the ops drawing its enabled widgets, in drawing order"""
+    static_ops: List[RenderOp] = []
+    ops: List[RenderOp] = []
+    # The NumPy compositor only blits gauges, so they are always pre-rendered there
+    gauge_levels = config.gauge_levels or (DEFAULT_GAUGE_LEVELS if config.compositor == "numpy" else 0)
+
+    def add(target: List[RenderOp], factory: Callable[[], RenderOp], kind: str):
+        try:
+            target.append(factory())
+        except Exception as e:
+            logger.warning(f"Skipping {kind}: {e}")
+
+    for text_config in config.text_configs or []:
+        if text_config.enabled and text_config.text:
+            add(static_ops, lambda: TextOp(renderer, text_config, lambda text=text_config.text: text), "text")
+    for shape_config in config.shape_configs or []:
+        if shape_config.enabled:
+            add(static_ops, lambda: ShapeOp(renderer, shape_config), "shape")
+
+    for metric_config in config.metrics_configs or []:
+        if metric_config.enabled:
+            add(ops, lambda: MetricTextOp(renderer, metric_config), "metric")
+    if config.date_config and config.date_config.enabled:
+        add(ops, lambda: TextOp(renderer, config.date_config, renderer.date_text), "date")
+    if config.time_config and config.time_config.enabled:
+        add(ops, lambda: TextOp(renderer, config.time_config, renderer.time_text), "time")
+    for bar_config in config.bar_configs or []:
+        if bar_config.enabled:
+            add(ops, lambda: BarGraphOp(renderer, bar_config, gauge_levels), "bar graph")
+    for circular_config in config.circular_configs or []:
+        if circular_config.enabled:
+            add(ops, lambda: CircularGraphOp(renderer, circular_config, gauge_levels), "circular graph")
+
+    return RenderPlan(static_ops, ops, logger)
@@ -2,11 +2,14 @@
 # Copyright © 2025 Rejeb Ben Rejeb
 
 from datetime import datetime
+from string import Formatter
 from typing import Optional, List, Dict, Any
 
-from PIL import ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont
 
-from .config import TextConfig, MetricConfig, DisplayConfig
+from .config import MetricConfig, DisplayConfig
+from .glyph_atlas import GlyphAtlas, NUMERIC_CHARS
+from .text_sprites import TextSpriteCache
 from ...common.logging_config import LoggerConfig
 
 # Import font manager from current package
@@ -30,10 +33,45 @@ class TextRenderer:
         self.logger = LoggerConfig.setup_service_logger()
         self.font_manager = get_font_manager()
         self._font_cache = {}
+        # Rasterized strings, reused until the text changes
+        self.sprites = TextSpriteCache()
+        # Glyph atlases for metric readouts, per font size
+        self._atlases = self._build_atlases(display_config.metrics_configs or [])
 
     def _get_font(self, font_size: int) -> ImageFont.ImageFont:
         return self.font_manager.get_font(font_size)
 
+    def _build_atlases(self, configs: List[MetricConfig]) -> Dict[int, GlyphAtlas]:
+        """Pre-render the digits, signs, labels and units of the metric readouts"""
+        configs = [c for c in configs if c.enabled]
+        chars = NUMERIC_CHARS + "".join(
+            config.format_label() + config.unit
+            + "".join(literal for literal, _, _, _ in Formatter().parse(config.format_string))
+            for config in configs
+        )
+        atlases = {}
+        for font_size in {config.font_size for config in configs}:
+            font = self._get_font(font_size)
+            if isinstance(font, ImageFont.FreeTypeFont):
+                try:
+                    atlases[font_size] = GlyphAtlas(font, chars)
+                except Exception as e:
+                    self.logger.warning(f"Cannot build glyph atlas for font size {font_size}: {e}")
+        return atlases
+
+    def get_atlas(self, font_size: int, font: ImageFont.ImageFont) -> Optional[GlyphAtlas]:
+        """Glyph atlas of the metric readouts drawn with font, if one was built"""
+        atlas = self._atlases.get(font_size)
+        return atlas if atlas is not None and atlas.font is font else None
+
+    def _draw_text(self, image: Image.Image, draw: ImageDraw.ImageDraw, position, text: str,
+                   font: ImageFont.ImageFont, color, atlas: Optional[GlyphAtlas] = None):
+        """Draw text centered on position onto image, through the sprite cache when possible"""
+        if any(int(v) != v for v in position):
+            draw.text(position, text, fill=color, font=font, anchor='mm')
+            return
+        self.sprites.draw(image, position, text, font, color, atlas=atlas)
+
     def _safe_format_value(self, value: Any, format_string: str, metric_name: str) -> str:
         """Safely format a metric value, handling various types and potential errors"""
         if value is None:
@@ -64,134 +102,12 @@ class TextRenderer:
             self.logger.warning(f"Error formatting value {value} for metric {metric_name}: {e}")
             return str(value) if value is not None else "N/A"
 
-    def render_metrics(self, draw: ImageDraw.Draw, metrics: Optional[Dict[str, Any]],
-                       configs: List[MetricConfig]):
-        """Display metrics on the image"""
-        if not metrics or not configs:
-            return
-
-        for config in configs:
-            if not config.enabled:
-                continue
-
-            # Get metric value
-            value = metrics.get(config.name)
-            if value is None:
-                continue
-
-            # Format text safely
-            try:
-                # Use safe formatting for the value
-                formatted_value = self._safe_format_value(value, "{value}", config.name)
-
-                # If the format string expects a float formatting and we have a numeric value
-                if '{value:.0f}' in config.format_string or '{value:.1f}' in config.format_string:
-                    try:
-                        # Convert to float for proper formatting
-                        if isinstance(value, str):
-                            numeric_value = float(value)
-                        else:
-                            numeric_value = float(value)
-                        text = config.format_string.format(
-                            label=config.format_label(),
-                            value=numeric_value,
-                            unit=config.unit
-                        )
-                    except (ValueError, TypeError):
-                        # Fallback: replace format with simple string
-                        simple_format = config.format_string.replace('{value:.0f}', '{value}').replace('{value:.1f}',
-                                                                                                       '{value}')
-                        text = simple_format.format(
-                            label=config.label,
-                            value=str(value) if value is not None else "N/A",
-                            unit=config.unit
-                        )
-                else:
-                    # Standard formatting
-                    text = config.format_string.format(
-                        label=config.format_label(),
-                        value=formatted_value,
-                        unit=config.unit
-                    )
-
-            except Exception as e:
-                self.logger.warning(f"Error formatting metric {config.name}: {e}")
-                # Fallback to simple display
-                text = f"{config.label}: {value if value is not None else 'N/A'}{config.unit}"
-
-            # Get font using global font configuration
-            font = self._get_font(config.font_size)
-            
-            # Get text bounding box to clear area
-            try:
-                bbox = draw.textbbox(config.position, text, font=font, anchor='mm')
-                # Clear the area with background color (transparent - removed black box)
-                # draw.rectangle(bbox, fill=(0, 0, 0))
-            except Exception as e:
-                self.logger.warning(f"Error clearing text area for {config.name}: {e}")
-            
-            # Draw text
-            draw.text(config.position, text, fill=config.color, font=font, anchor='mm')
-
-    def render_date(self, draw: ImageDraw.Draw, config: Optional[TextConfig]):
-        """Display current date formatted as dd/mm"""
-        if not config or not config.enabled:
-            return
-
-        # dd/mm format
-        current_date = datetime.now().strftime("%d/%m")
-
-        # Get font using global font configuration
-        font = self._get_font(config.font_size)
-
-        # Draw text
-        # Get text bounding box to clear area
-        try:
-            bbox = draw.textbbox(config.position, current_date, font=font, anchor='mm')
-            # Clear the area with background color (transparent - removed black box)
-            # draw.rectangle(bbox, fill=(0, 0, 0))
-        except Exception as e:
-            self.logger.warning(f"Error clearing date text area: {e}")
-        
-        draw.text(config.position, current_date, fill=config.color, font=font, anchor='mm')
-
-    def render_time(self, draw: ImageDraw.Draw, config: Optional[TextConfig]):
-        """Display current time formatted as HH:MM"""
-        if not config or not config.enabled:
-            return
-
-        # HH:MM format
-        current_time = datetime.now().strftime("%H:%M")
-
-        # Get font using global font configuration
-        font = self._get_font(config.font_size)
-
-        # Draw text
-        # Get text bounding box to clear area
-        try:
-            bbox = draw.textbbox(config.position, current_time, font=font, anchor='mm')
-            # Clear the area with background color (transparent - removed black box)
-            # draw.rectangle(bbox, fill=(0, 0, 0))
-        except Exception as e:
-            self.logger.warning(f"Error clearing time text area: {e}")
-        
-        draw.text(config.position, current_time, fill=config.color, font=font, anchor='mm')
-
-    def render_custom_text(self, draw: ImageDraw.Draw, config: TextConfig):
-        """Display custom text"""
-        if not config.enabled or not config.text:
-            return
-
-        # Get font using global font configuration
-        font = self._get_font(config.font_size)
+    @staticmethod
+    def date_text() -> str:
+        """Current date formatted as dd/mm"""
+        return datetime.now().strftime("%d/%m")
 
-        # Draw text
-        # Get text bounding box to clear area
-        try:
-            bbox = draw.textbbox(config.position, config.text, font=font, anchor='mm')
-            # Clear the area with background color (transparent - removed black box)
-            # draw.rectangle(bbox, fill=(0, 0, 0))
-        except Exception as e:
-            self.logger.warning(f"Error clearing custom text area: {e}")
-        
-        draw.text(config.position, config.text, fill=config.color, font=font, anchor='mm')
+    @staticmethod
+    def time_text() -> str:
+        """Current time formatted as HH:MM"""
+        return datetime.now().strftime("%H:%M")
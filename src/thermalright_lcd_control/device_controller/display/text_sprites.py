@@ -0,0 +1,182 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .compositor import Compositor, Layer
+from .glyph_atlas import GlyphAtlas
+
+
+class TextSprite:
+    """Pre-rasterized text: an RGBA image and its offset from the anchor point"""
+
+    __slots__ = ("image", "offset", "nbytes", "layer", "cached")
+
+    def __init__(self, image: Image.Image, offset: Tuple[int, int]):
+        self.image = image
+        self.offset = offset
+        self.nbytes = image.width * image.height * 4
+        # Premultiplied pixels for the NumPy compositor, built on first use
+        self.layer: Optional[Layer] = None
+        # Whether the sprite is (still) in a cache, and counted in its bytes
+        self.cached = False
+
+
+class TextSpriteCache:
+    """
+    LRU cache of rasterized text sprites.
+
+    Sprites are keyed by (text, font, color, anchor) and blitted with alpha
+    onto the frame, so FreeType only runs when a string changes. Memory is
+    bounded by `budget` bytes of sprite pixels.
+    """
+
+    def __init__(self, budget: int = 4 * 1024 * 1024):
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sprites: "OrderedDict[tuple, TextSprite]" = OrderedDict()
+        self._measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+
+    def get(self, text: str, font: ImageFont.ImageFont, color: Tuple[int, ...], anchor: str = 'mm',
+            atlas: Optional[GlyphAtlas] = None) -> TextSprite:
+        key = (text, font, getattr(font, 'size', None), color, anchor)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = None
+        if atlas is not None and anchor == 'mm' and atlas.covers(text):
+            sprite = self._from_atlas(text, atlas, color)
+        if sprite is None:
+            sprite = self._rasterize(text, font, color, anchor)
+        self._sprites[key] = sprite
+        sprite.cached = True
+        self.nbytes += sprite.nbytes
+        self._evict()
+        return sprite
+
+    def _evict(self):
+        """Drop least recently used sprites until the cache fits its budget"""
+        while self.nbytes > self.budget and len(self._sprites) > 1:
+            _, evicted = self._sprites.popitem(last=False)
+            evicted.cached = False
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def _rasterize(self, text: str, font: ImageFont.ImageFont, color: Tuple[int, ...], anchor: str) -> TextSprite:
+        left, top, right, bottom = self._measure.textbbox((0, 0), text, font=font, anchor=anchor)
+        mask = Image.new('L', (max(right - left, 1), max(bottom - top, 1)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font, anchor=anchor)
+        return self._colorize(mask, color, (left, top))
+
+    def _from_atlas(self, text: str, atlas: GlyphAtlas, color: Tuple[int, ...]) -> Optional[TextSprite]:
+        rendered = atlas.render(text)
+        if rendered is None:
+            return None
+        mask, offset = rendered
+        return self._colorize(mask, color, offset)
+
+    @staticmethod
+    def _colorize(mask: Image.Image, color: Tuple[int, ...], offset: Tuple[int, int]) -> TextSprite:
+        # Ink alpha is ignored, as when drawing straight onto the RGB frame
+        image = Image.new('RGBA', mask.size, tuple(color[:3]) + (255,))
+        image.putalpha(mask)
+        return TextSprite(image, offset)
+
+    def draw(self, image: Image.Image, position: Tuple[int, int], text: str,
+             font: ImageFont.ImageFont, color: Tuple[int, ...], anchor: str = 'mm',
+             atlas: Optional[GlyphAtlas] = None):
+        """Blit the sprite for text onto image, anchored at position"""
+        sprite = self.get(text, font, color, anchor, atlas)
+        x = int(position[0]) + sprite.offset[0]
+        y = int(position[1]) + sprite.offset[1]
+        left, top = max(0, -x), max(0, -y)
+        right = min(sprite.image.width, image.width - x)
+        bottom = min(sprite.image.height, image.height - y)
+        if right <= left or bottom <= top:
+            return
+
+        if image.mode == 'RGBA':
+            image.alpha_composite(sprite.image, (x + left, y + top), (left, top, right, bottom))
+        else:
+            region = sprite.image.crop((left, top, right, bottom))
+            image.paste(region, (x + left, y + top), region)
+
+    def layer(self, sprite: TextSprite) -> Layer:
+        """
+        Premultiplied pixels of a sprite, for the NumPy compositor.
+
+        A SpriteText may hold on to a sprite that was evicted since; its layer
+        is built all the same, but only sprites in the cache count towards
+        the budget.
+        """
+        if sprite.layer is None:
+            sprite.layer = Layer.from_image(sprite.image)
+            sprite.nbytes += sprite.layer.nbytes
+            if sprite.cached:
+                self.nbytes += sprite.layer.nbytes
+                self._evict()
+        return sprite.layer
+
+    def clear(self):
+        for sprite in self._sprites.values():
+            sprite.cached = False
+        self._sprites.clear()
+        self.nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._sprites),
+            "bytes": self.nbytes,
+        }
+
+
+class SpriteText:
+    """
+    Text at a fixed place, font and colour, blended through a sprite cache.
+
+    The sprite of the last text is kept, so asking for the bounds of a text
+    and then blending it only looks the sprite up once.
+    """
+
+    __slots__ = ("sprites", "position", "font", "color", "atlas", "_text", "_sprite")
+
+    def __init__(self, sprites: TextSpriteCache, position: Tuple[int, int], font: ImageFont.ImageFont,
+                 color: Tuple[int, ...], atlas: Optional[GlyphAtlas] = None):
+        self.sprites = sprites
+        self.position = (round(position[0]), round(position[1]))
+        self.font = font
+        self.color = color
+        self.atlas = atlas
+        self._text = None
+        self._sprite = None
+
+    def _get(self, text: str) -> TextSprite:
+        if text != self._text:
+            self._sprite = self.sprites.get(text, self.font, self.color, atlas=self.atlas)
+            self._text = text
+        return self._sprite
+
+    def rect(self, text: str) -> Tuple[int, int, int, int]:
+        """Pixels covered by text: (left, top, right, bottom)"""
+        sprite = self._get(text)
+        x, y = self.position[0] + sprite.offset[0], self.position[1] + sprite.offset[1]
+        return x, y, x + sprite.image.width, y + sprite.image.height
+
+    def blend(self, compositor: Compositor, text: str):
+        """Blend text into the compositor frame, centered on the position"""
+        sprite = self._get(text)
+        compositor.blend(self.sprites.layer(sprite),
+                         (self.position[0] + sprite.offset[0], self.position[1] + sprite.offset[1]))
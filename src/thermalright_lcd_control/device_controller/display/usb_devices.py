@@ -1,14 +1,17 @@
 # usb_devices.py
 from abc import ABC
 from typing import Optional, Tuple
+import os
 import time
 
+import numpy as np
 import usb.core
 import usb.util
-import numpy as np
 from PIL import Image
 
 from .display_device import DisplayDevice
+from .encoder import PixelLayout
+from .frame_buffer import FrameBuffer
 
 
 def _find_bulk_out_ep(dev: usb.core.Device) -> Tuple[int, int]:
@@ -82,8 +85,8 @@ class UsbDevice(DisplayDevice, ABC):
 
     # --- Encoding ---
 
-    def _encode_image(self, img: Image) -> bytes:
-        return super()._encode_image(img)
+    def _encode_image(self, img: Image, out: Optional[np.ndarray] = None, rotation: int = 0):
+        return super()._encode_image(img, out, rotation)
 
     # --- USB transfer ---
 
@@ -116,6 +119,18 @@ class UsbDevice(DisplayDevice, ABC):
 # ChiZhu Tech 87AD:70DB device
 # -----------------------------
 
+def header_87ad70db(width: int, height: int, cmd: int, mode: int, payload_len: int) -> bytes:
+    """64-byte frame header of the 87AD:70DB protocol (see DisplayDevice87AD70DB)"""
+    hdr = bytearray(64)
+    hdr[0:4]   = bytes.fromhex("12 34 56 78")
+    hdr[4:8]   = int(cmd).to_bytes(4, "little")
+    hdr[8:12]  = int(width).to_bytes(4, "little")
+    hdr[12:16] = int(height).to_bytes(4, "little")
+    hdr[0x38:0x3C] = int(mode).to_bytes(4, "little")         # mode = 2
+    hdr[0x3C:0x40] = int(payload_len).to_bytes(4, "little")  # bytes in payload
+    return bytes(hdr)
+
+
 class DisplayDevice87AD70DB(UsbDevice):
     """
     ChiZhu Tech USBDISPLAY (VID=0x87AD, PID=0x70DB), 320x320
@@ -128,33 +143,52 @@ class DisplayDevice87AD70DB(UsbDevice):
           0x38..3B : mode   (LE u32) = 2
           0x3C..3F : payload_len (LE u32) = 204800
       - Payload: 320*320*2 = 204,800 bytes, RGB565 **big-endian**
-      - Transfer order per frame: header(64) → 400×(512B) → ZLP
+      - Transfer order per frame: header(64) → payload → ZLP
+          payload goes out as one bulk transfer by default, or as N×transfer_size
+          writes (transfer_size=512 gives the original 400×512B flow for firmware
+          that needs it; also settable with THERMALRIGHT_BULK_TRANSFER_SIZE)
       - EOS: single header(len=0, mode=2) + ZLP, then a short quiet wait
     """
     PKT = 512
     W, H = 320, 320
+    pixel_layout = PixelLayout.ROWS
+    pixel_big_endian = True
+    target_fps = 30.0
     PAYLOAD_BYTES = W * H * 2      # 204,800
     PACKETS_PER_FRAME = PAYLOAD_BYTES // PKT  # 400
 
-    def __init__(self, config_dir: str, start_wait: float = 2.0, stop_wait: float = 2.0):
+    def __init__(self, config_dir: str, start_wait: float = 2.0, stop_wait: float = 2.0,
+                 transfer_size: Optional[int] = None):
         # app-level “chunk_size” not used for the actual frame writes; we still set it
         super().__init__(0x87AD, 0x70DB, self.PKT, self.W, self.H, config_dir)
         self.start_wait = start_wait
         self.stop_wait = stop_wait
+        self.transfer_size = self._resolve_transfer_size(transfer_size)
+        self.logger.info(f"87AD:70DB payload transfer size: {self.transfer_size} bytes "
+                         f"({self.PAYLOAD_BYTES // self.transfer_size} write(s) per frame)")
         # Build standard headers now
         self._hdr_frame = self._make_header(cmd=3, mode=2, payload_len=self.PAYLOAD_BYTES)
         self._hdr_eos   = self._make_header(cmd=3, mode=2, payload_len=0)
         time.sleep(max(self.start_wait, 0.0))  # quiet window like the working flow
 
+    def _resolve_transfer_size(self, transfer_size: Optional[int]) -> int:
+        """Bytes per payload write: a multiple of PKT that divides the payload"""
+        if transfer_size is None:
+            env_size = os.environ.get("THERMALRIGHT_BULK_TRANSFER_SIZE")
+            try:
+                transfer_size = int(env_size) if env_size else self.PAYLOAD_BYTES
+            except ValueError:
+                self.logger.warning(f"Invalid THERMALRIGHT_BULK_TRANSFER_SIZE={env_size!r}, using a single transfer")
+                transfer_size = self.PAYLOAD_BYTES
+
+        transfer_size = min(max(int(transfer_size), self.PKT), self.PAYLOAD_BYTES)
+        transfer_size -= transfer_size % self.PKT
+        while self.PAYLOAD_BYTES % transfer_size:
+            transfer_size -= self.PKT
+        return transfer_size
+
     def _make_header(self, cmd: int, mode: int, payload_len: int) -> bytes:
-        hdr = bytearray(64)
-        hdr[0:4]   = bytes.fromhex("12 34 56 78")
-        hdr[4:8]   = int(cmd).to_bytes(4, "little")
-        hdr[8:12]  = int(self.width).to_bytes(4, "little")
-        hdr[12:16] = int(self.height).to_bytes(4, "little")
-        hdr[0x38:0x3C] = int(mode).to_bytes(4, "little")         # mode = 2
-        hdr[0x3C:0x40] = int(payload_len).to_bytes(4, "little")  # bytes in payload
-        return bytes(hdr)
+        return header_87ad70db(self.width, self.height, cmd, mode, payload_len)
 
     def get_header(self) -> bytes:
         # The base constructor calls this; make sure it returns *something* valid.
@@ -166,40 +200,33 @@ class DisplayDevice87AD70DB(UsbDevice):
             return self._make_header(cmd=3, mode=2, payload_len=self.PAYLOAD_BYTES)
 
     # --- encoding: RGB565 big-endian, row-major, no per-row separators ---
-    def _encode_image(self, img: Image) -> bytes:
-        if img.size != (self.width, self.height):
-            img = img.resize((self.width, self.height), Image.LANCZOS)
-        rgb = img.convert("RGB")
-        arr = np.array(rgb, dtype=np.uint8)
-        r = arr[..., 0].astype(np.uint16)
-        g = arr[..., 1].astype(np.uint16)
-        b = arr[..., 2].astype(np.uint16)
-        v = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
-        hi = (v >> 8).astype(np.uint8)
-        lo = (v & 0xFF).astype(np.uint8)
-        out = np.empty((self.height, self.width * 2), dtype=np.uint8)
-        out[..., 0::2] = hi  # BE
-        out[..., 1::2] = lo
-        return out.tobytes()
-
-    # --- run: bulk framing (no HID report-id, no generic chunker) ---
+    def _encode_image(self, img: Image, out: Optional[np.ndarray] = None, rotation: int = 0):
+        self._encoder.rotation = rotation
+        if isinstance(img, Image.Image) and img.size != self._encoder.canvas_size:
+            img = img.resize(self._encoder.canvas_size, Image.LANCZOS)
+        return super()._encode_image(img, out, rotation)
+
+    def _build_frame_buffer(self) -> FrameBuffer:
+        # Header goes out as its own transfer, so the buffer only holds the payload writes
+        return FrameBuffer(b"", self.PAYLOAD_BYTES, self.transfer_size)
+
+    # --- transfer: bulk framing (no HID report-id, no generic chunker) ---
+    def _send_frame(self, frame: FrameBuffer):
+        # header
+        self.dev.write(self.ep_out, self._hdr_frame, timeout=2000)
+        # payload: the whole buffer in one call (handed to libusb without a copy),
+        # or transfer_size slices that split it exactly
+        if frame.packet_count == 1:
+            self.dev.write(self.ep_out, frame.buffer, timeout=5000)
+        else:
+            for chunk in frame.packets:
+                self.dev.write(self.ep_out, chunk, timeout=5000)
+        # commit (ZLP)
+        self._zlp()
+
     def run(self):
         self.logger.info("Display device (87AD:70DB) running (bulk mode)")
-        while True:
-            img, delay_time = self._get_generator().get_frame_with_duration()
-            payload = self._encode_image(img)
-            # header
-            self.dev.write(self.ep_out, self._hdr_frame, timeout=2000)
-            # payload in 512B slices
-            off = 0
-            for _ in range(self.PACKETS_PER_FRAME):
-                chunk = payload[off:off + self.PKT]
-                # chunks are exactly 512B by construction
-                self.dev.write(self.ep_out, chunk, timeout=5000)
-                off += self.PKT
-            # commit (ZLP)
-            self._zlp()
-            time.sleep(delay_time)
+        super().run()
 
     # --- graceful shutdown consistent with EOS probe ---
     def end_stream(self):
@@ -210,11 +237,14 @@ class DisplayDevice87AD70DB(UsbDevice):
             pass
         time.sleep(max(self.stop_wait, 0.0))
 
-    def close(self):
+    def close(self, timeout: float = 5.0):
         try:
-            self.end_stream()
+            super().close(timeout)
         finally:
             try:
-                usb.util.release_interface(self.dev, self.iface)
+                self.end_stream()
             finally:
-                usb.util.dispose_resources(self.dev)
+                try:
+                    usb.util.release_interface(self.dev, self.iface)
+                finally:
+                    usb.util.dispose_resources(self.dev)
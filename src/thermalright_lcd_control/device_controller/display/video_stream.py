@@ -0,0 +1,146 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import threading
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+import cv2
+from PIL import Image
+
+from .frame_cache import FrameCacheWriter
+from ...common.logging_config import get_service_logger
+
+
+class VideoStream:
+    """
+    Streaming video background decoder.
+
+    A decoder thread reads the clip with cv2.VideoCapture a few frames ahead
+    into a bounded ring buffer, resizing with OpenCV, and loops by seeking back
+    to frame 0. Memory use depends on the look-ahead, not on the clip length.
+    Frames of the first pass can be handed to a frame cache writer, opened by
+    ``open_cache_writer(frame_count)`` once the clip length is known (it may
+    return None to skip caching) and committed once the clip has been decoded
+    end to end.
+    """
+
+    def __init__(self, path: str, width: int, height: int, lookahead: int = 8,
+                 open_cache_writer: Optional[Callable[[int], Optional[FrameCacheWriter]]] = None):
+        self.logger = get_service_logger()
+        self.path = path
+        self.width = width
+        self.height = height
+
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise RuntimeError(
+                f"Cannot open video: {path}. Please check if the file is corrupted or if OpenCV supports this codec.")
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_duration = 1.0 / self.fps if self.fps > 0 else 1.0 / 30  # Fallback 30 FPS
+
+        src_width = self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+        src_height = self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        shrinking = src_width * src_height > width * height
+        self._interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+
+        self._frames = deque()
+        self._lookahead = max(lookahead, 1)
+        self._cond = threading.Condition()
+        self._position = 0
+        self._cache_writer = open_cache_writer(self.frame_count) if open_cache_writer is not None else None
+        self.underruns = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._decode_loop, name="video-decoder", daemon=True)
+        self.thread.start()
+
+    def _read(self) -> Optional[Tuple[int, Image.Image]]:
+        ret, frame = self.capture.read()
+        if not ret:
+            if self._position == 0:
+                return None
+            # End of clip: loop back to the first frame
+            self._commit_cache()
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self._position = 0
+            ret, frame = self.capture.read()
+            if not ret:
+                return None
+
+        index = self._position
+        self._position += 1
+        frame = cv2.resize(frame, (self.width, self.height), interpolation=self._interpolation)
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        image = Image.fromarray(frame)
+        if self._cache_writer is not None:
+            try:
+                self._cache_writer.append(image, self.frame_duration)
+            except OSError as e:
+                self.logger.warning(f"Cannot write video frame cache: {e}")
+                self._cache_writer.abort()
+                self._cache_writer = None
+        return index, image
+
+    def _commit_cache(self):
+        if self._cache_writer is None:
+            return
+        try:
+            path = self._cache_writer.commit()
+            self.logger.info(f"Video frames cached in {path}")
+        except OSError as e:
+            self.logger.warning(f"Cannot write video frame cache: {e}")
+            self._cache_writer.abort()
+        self._cache_writer = None
+
+    def _decode_loop(self):
+        try:
+            while self.running:
+                with self._cond:
+                    while self.running and len(self._frames) >= self._lookahead:
+                        self._cond.wait()
+                    if not self.running:
+                        break
+
+                item = self._read()
+                if item is None:
+                    self.logger.error(f"Cannot decode any frame from video: {self.path}")
+                    break
+
+                with self._cond:
+                    self._frames.append(item)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.logger.error(f"Video decoder stopped: {e}")
+        finally:
+            self.running = False
+            self.capture.release()
+            if self._cache_writer is not None:
+                # Clip not decoded end to end: drop the partial cache file
+                self._cache_writer.abort()
+                self._cache_writer = None
+            with self._cond:
+                self._cond.notify_all()
+
+    def next_frame(self, timeout: float = 0.0) -> Optional[Tuple[int, Image.Image]]:
+        """
+        Take the next decoded frame.
+
+        Returns:
+            Optional[Tuple[int, Image.Image]]: (index in the clip, RGB image), or
+            None if the decoder has not caught up within `timeout` seconds
+        """
+        with self._cond:
+            if not self._frames and timeout > 0:
+                self._cond.wait_for(lambda: self._frames or not self.running, timeout)
+            if not self._frames:
+                self.underruns += 1
+                return None
+            item = self._frames.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
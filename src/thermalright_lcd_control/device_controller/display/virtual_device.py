@@ -0,0 +1,163 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from PIL import Image
+
+from .display_device import DisplayDevice
+from .encoder import PixelLayout
+from .frame_buffer import FrameBuffer
+from .hid_devices import header_04165302, header_04185304
+from .usb_devices import header_87ad70db
+
+
+@dataclass(frozen=True)
+class VirtualProtocol:
+    """Wire protocol emulated by a VirtualDisplayDevice"""
+    vid: int
+    pid: int
+    default_size: Tuple[int, int]
+    make_header: Callable[[int, int], bytes]
+    layout: PixelLayout
+    big_endian: bool
+    bulk: bool  # header -> payload -> ZLP bulk transfers instead of HID report packets
+    report_id: bytes = bytes([0x00])
+    chunk_size: int = 512
+
+
+VIRTUAL_PROTOCOLS = {
+    "0416:5302": VirtualProtocol(0x0416, 0x5302, (320, 240), header_04165302,
+                                 PixelLayout.COLUMNS_BOTTOM_UP, False, bulk=False),
+    "0418:5304": VirtualProtocol(0x0418, 0x5304, (480, 480), header_04185304,
+                                 PixelLayout.COLUMNS_BOTTOM_UP, False, bulk=False),
+    "87ad:70db": VirtualProtocol(0x87AD, 0x70DB, (320, 320),
+                                 lambda w, h: header_87ad70db(w, h, cmd=3, mode=2, payload_len=w * h * 2),
+                                 PixelLayout.ROWS, True, bulk=True, report_id=b""),
+}
+
+
+class VirtualDisplayDevice(DisplayDevice):
+    """
+    Loopback display device for hardware-free benchmarks and CI.
+
+    Frames go through the same render -> encode -> packet path as real
+    hardware and are consumed like the panel would: report IDs are stripped,
+    the header is checked and the RGB565 payload is reassembled, then decoded
+    back into an image on demand (``last_frame``). An optional link bandwidth
+    (bytes/s) makes each write take as long as it would on the bus.
+    """
+
+    def __init__(self, config_dir: str, protocol: str = "0418:5304",
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 bandwidth: Optional[float] = None,
+                 on_frame: Optional[Callable[[Image.Image], None]] = None):
+        try:
+            self.protocol = VIRTUAL_PROTOCOLS[protocol.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown virtual protocol '{protocol}'. "
+                             f"Supported: {', '.join(VIRTUAL_PROTOCOLS)}") from None
+        width = width or self.protocol.default_size[0]
+        height = height or self.protocol.default_size[1]
+
+        # Per-protocol wire format, set before the base class builds the encoder
+        self.pixel_layout = self.protocol.layout
+        self.pixel_big_endian = self.protocol.big_endian
+        self.report_id = self.protocol.report_id
+        if self.protocol.bulk:
+            self.target_fps = 30.0
+
+        self.bandwidth = bandwidth
+        self.on_frame = on_frame
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.protocol_errors = 0
+        self._rx = bytearray()
+        self._last_payload: Optional[bytes] = None
+
+        super().__init__(self.protocol.vid, self.protocol.pid, self.protocol.chunk_size,
+                         width, height, config_dir)
+        self._frame_size = len(self.header) + self._encoder.payload_size
+        self.logger.info(f"Virtual display device {protocol} {width}x{height}"
+                         + (f", link {bandwidth / 1e6:.1f} MB/s" if bandwidth else ""))
+
+    def get_header(self) -> bytes:
+        return self.protocol.make_header(self.width, self.height)
+
+    def reset(self):
+        self.logger.info("Virtual display device: nothing to reset")
+
+    def _build_frame_buffer(self) -> FrameBuffer:
+        if self.protocol.bulk:
+            # Header is its own transfer; payload goes out as one bulk write
+            return FrameBuffer(b"", self._encoder.payload_size, self._encoder.payload_size)
+        return super()._build_frame_buffer()
+
+    # --- device side ---
+
+    def _link_delay(self, size: int):
+        self.bytes_received += size
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def send_packet(self, packet: bytes):
+        """Consume one HID report: report ID + chunk of the header/payload stream"""
+        self._link_delay(len(packet))
+        rid = len(self.report_id)
+        if bytes(packet[:rid]) != self.report_id:
+            self._protocol_error(f"unexpected report ID {bytes(packet[:rid]).hex()}")
+            return
+        self._rx += packet[rid:]
+        if len(self._rx) >= self._frame_size:
+            # Whatever follows the payload in the last packet is padding
+            self._receive_frame()
+
+    def _bulk_write(self, data):
+        """Consume one bulk OUT transfer; a zero-length packet commits the frame"""
+        self._link_delay(len(data))
+        if len(data):
+            self._rx += data
+        else:
+            self._receive_frame()
+
+    def _send_frame(self, frame: FrameBuffer):
+        if not self.protocol.bulk:
+            super()._send_frame(frame)
+            return
+        self._bulk_write(self.header)
+        for chunk in frame.packets:
+            self._bulk_write(chunk)
+        self._bulk_write(b"")
+
+    def _receive_frame(self):
+        header_size = len(self.header)
+        header = bytes(self._rx[:header_size])
+        payload = bytes(self._rx[header_size:self._frame_size])
+        received = len(self._rx)
+        self._rx.clear()
+
+        if header != self.header:
+            self._protocol_error(f"bad frame header {header.hex()}")
+            return
+        if len(payload) != self._encoder.payload_size or (self.protocol.bulk and received != self._frame_size):
+            self._protocol_error(f"frame of {received} bytes, expected {self._frame_size}")
+            return
+
+        self._last_payload = payload
+        self.frames_received += 1
+        if self.on_frame is not None:
+            self.on_frame(self.last_frame)
+
+    def _protocol_error(self, message: str):
+        self.protocol_errors += 1
+        self._rx.clear()
+        self.logger.warning(f"Virtual display device protocol error: {message}")
+
+    @property
+    def last_frame(self) -> Optional[Image.Image]:
+        """Last complete frame received, decoded back into an RGB image"""
+        if self._last_payload is None:
+            return None
+        return self._encoder.decode(self._last_payload)
@@ -2,18 +2,25 @@
 import glob, os, re
 import psutil
 from . import Metrics
+from .cpu_usage import CpuUsageSampler
+from .sensors import SensorRegistry
 from ...common.logging_config import LoggerConfig
 
 class CpuMetrics(Metrics):
     """
     AMD-friendly CPU metrics with robust k10temp/zenpower scanning.
     Prefers Tdie > Tctl; falls back to first available temp*_input,
-    else psutil, else thermal zones.
+    else the hwmon drivers psutil reports, else thermal zones.
+    Sensors are discovered once and read through open files (see SensorRegistry).
     """
     def __init__(self):
         super().__init__()
         self.logger = LoggerConfig.setup_service_logger()
         self.cpu_usage = 0.0
+        # Usage of each online core by CPU number, from the last usage sample
+        self.per_core_usage = {}
+        self._usage_sampler = CpuUsageSampler()
+        self.sensors = SensorRegistry()
         self.cpu_temp = None
         self.cpu_freq = None
 
@@ -54,148 +61,147 @@ class CpuMetrics(Metrics):
                         break
         return out
 
+    def _temp_index(self, path):
+        return int(re.search(r"temp(\d+)_input$", path).group(1))
+
+    def _temp_inputs(self, root):
+        """Readable temp*_input files of an hwmon root, in sensor order."""
+        inputs = sorted(glob.glob(os.path.join(root, "temp*_input")), key=self._temp_index)
+        return [p for p in inputs if self._read_float(p) is not None]
+
     def _pick_best_amd_temp(self, root):
         """
-        From an AMD hwmon root, choose Tdie > Tctl > otherwise first reasonable temp*_input.
+        From an AMD hwmon root, choose Tdie > Tctl > otherwise the hottest
+        non-CCD sensor, else the hottest CCD (some systems only expose CCDs).
+        Returns the temp*_input paths to read (their max is the temperature)
+        and a description of the source.
         """
         # Map labels
         labels = {}
         for lbl in glob.glob(os.path.join(root, "temp*_label")):
             m = re.search(r"temp(\d+)_label$", lbl)
-            if not m: 
+            if not m:
                 continue
-            idx = m.group(1)
             try:
-                labels[idx] = open(lbl).read().strip().lower()
+                labels[int(m.group(1))] = open(lbl).read().strip().lower()
             except Exception:
                 pass
 
-        def read_idx(idx):
-            p = os.path.join(root, f"temp{idx}_input")
-            return self._read_float(p, 1/1000.0)
-
-        # 1) Prefer Tdie
-        for idx, lab in labels.items():
-            if "tdie" in lab:
-                v = read_idx(idx)
-                if v is not None:
-                    return v, f"{root}:temp{idx}_input (Tdie)"
-
-        # 2) Then Tctl
-        for idx, lab in labels.items():
-            if "tctl" in lab:
-                v = read_idx(idx)
-                if v is not None:
-                    return v, f"{root}:temp{idx}_input (Tctl)"
-
-        # 3) Otherwise pick a reasonable sensor:
-        #    prefer non-ccd sensors; if none, take max CCD (some systems only expose CCDs).
-        inputs = sorted(glob.glob(os.path.join(root, "temp*_input")))
-        non_ccd = []
-        ccd = []
-        for p in inputs:
-            idx = re.search(r"temp(\d+)_input$", p).group(1)
-            lab = labels.get(idx, "")
-            v = self._read_float(p, 1/1000.0)
-            if v is None:
-                continue
-            if "ccd" in lab:
-                ccd.append((v, p))
-            else:
-                non_ccd.append((v, p))
-        pick = (max(non_ccd) if non_ccd else (max(ccd) if ccd else (None, None)))
-        if pick[0] is not None:
-            tag = "non-CCD" if non_ccd else "CCD"
-            return pick[0], f"{pick[1]} ({tag})"
+        inputs = self._temp_inputs(root)
+        for tag in ("tdie", "tctl"):
+            for p in inputs:
+                if tag in labels.get(self._temp_index(p), ""):
+                    return [p], f"{p} ({labels[self._temp_index(p)]})"
 
-        return None, None
+        non_ccd = [p for p in inputs if "ccd" not in labels.get(self._temp_index(p), "")]
+        ccd = [p for p in inputs if p not in non_ccd]
+        if non_ccd:
+            return non_ccd, f"{root} (non-CCD)"
+        if ccd:
+            return ccd, f"{root} (CCD)"
+        return [], None
 
     # ---------- temperature ----------
-    def get_temperature(self):
+    def _discover_temperature(self):
+        """
+        Paths of the CPU temperature sensor, best source first:
+        AMD hwmon, then the hwmon drivers psutil would report, then thermal zones.
+        """
         # 1) AMD hwmon direct
         try:
             for root, drv in self._amd_hwmon_candidates():
-                v, src = self._pick_best_amd_temp(root)
-                if v is not None:
-                    self.cpu_temp = v
-                    self.logger.debug(f"CPU temp via {drv}: {v:.1f}°C from {src}")
-                    return v
+                paths, src = self._pick_best_amd_temp(root)
+                if paths:
+                    self.logger.info(f"CPU temperature via {drv}: {src}")
+                    return paths
         except Exception as e:
-            self.logger.debug(f"AMD hwmon read failed: {e}")
+            self.logger.debug(f"AMD hwmon scan failed: {e}")
 
-        # 2) psutil (may already expose k10temp)
-        try:
-            temps = psutil.sensors_temperatures()
-            # Try explicit k10temp/zenpower keys first
-            for key in ("k10temp", "zenpower", "coretemp", "cpu-thermal", "acpitz"):
-                if key in temps and temps[key]:
-                    for e in temps[key]:
-                        cur = getattr(e, "current", None)
-                        if cur is not None:
-                            self.cpu_temp = float(cur)
-                            self.logger.debug(f"CPU temp via psutil[{key}]: {self.cpu_temp:.1f}°C")
-                            return self.cpu_temp
-            # Otherwise, heuristically pick the first with a plausible current
-            for name, entries in temps.items():
-                for e in entries:
-                    cur = getattr(e, "current", None)
-                    if cur is not None and 0.0 < cur < 120.0:
-                        self.cpu_temp = float(cur)
-                        self.logger.debug(f"CPU temp via psutil[{name}]: {self.cpu_temp:.1f}°C")
-                        return self.cpu_temp
-        except Exception as e:
-            self.logger.debug(f"psutil sensors_temperatures failed: {e}")
+        # 2) hwmon drivers by name (what psutil.sensors_temperatures reads)
+        drivers = {}
+        for namefile in sorted(glob.glob("/sys/class/hwmon/hwmon*/name")):
+            try:
+                drivers.setdefault(open(namefile).read().strip(), []).append(os.path.dirname(namefile))
+            except Exception:
+                continue
+        for key in ("k10temp", "zenpower", "coretemp", "cpu-thermal", "acpitz"):
+            for root in drivers.get(key, ()):
+                inputs = self._temp_inputs(root)
+                if inputs:
+                    self.logger.info(f"CPU temperature via hwmon[{key}]: {inputs[0]}")
+                    return inputs[:1]
+        # Otherwise, heuristically pick the first with a plausible value
+        for name, roots in drivers.items():
+            for root in roots:
+                for p in self._temp_inputs(root):
+                    v = self._read_float(p, 1/1000.0)
+                    if v is not None and 0.0 < v < 120.0:
+                        self.logger.info(f"CPU temperature via hwmon[{name}]: {p}")
+                        return [p]
 
         # 3) thermal zones (types include k10temp/zenpower/x86_pkg_temp/cpu)
-        try:
-            for type_file in glob.glob("/sys/class/thermal/thermal_zone*/type"):
-                try:
-                    tname = open(type_file).read().strip().lower()
-                except Exception:
-                    continue
-                if not any(k in tname for k in ("k10temp", "zenpower", "x86_pkg_temp", "cpu")):
-                    continue
-                tfile = os.path.join(os.path.dirname(type_file), "temp")
-                v = self._read_float(tfile, 1/1000.0)
-                if v is not None and 0.0 < v < 120.0:
-                    self.cpu_temp = v
-                    self.logger.debug(f"CPU temp via thermal zone '{tname}': {v:.1f}°C")
-                    return v
-        except Exception as e:
-            self.logger.debug(f"thermal zones failed: {e}")
+        for type_file in sorted(glob.glob("/sys/class/thermal/thermal_zone*/type")):
+            try:
+                tname = open(type_file).read().strip().lower()
+            except Exception:
+                continue
+            if not any(k in tname for k in ("k10temp", "zenpower", "x86_pkg_temp", "cpu")):
+                continue
+            tfile = os.path.join(os.path.dirname(type_file), "temp")
+            v = self._read_float(tfile, 1/1000.0)
+            if v is not None and 0.0 < v < 120.0:
+                self.logger.info(f"CPU temperature via thermal zone '{tname}': {tfile}")
+                return [tfile]
+        return []
 
-        self.logger.warning("CPU temperature unavailable")
-        return None
+    def get_temperature(self):
+        v = self.sensors.read_float("temperature", self._discover_temperature, 1/1000.0)
+        if v is None:
+            self.logger.warning("CPU temperature unavailable")
+            return None
+        self.cpu_temp = v
+        return v
 
     # ---------- usage ----------
     def get_usage_percentage(self):
+        """Usage since the previous call, from /proc/stat jiffies (never sleeps)"""
+        try:
+            self.cpu_usage, self.per_core_usage = self._usage_sampler.sample()
+            return self.cpu_usage
+        except (ValueError, IndexError) as e:
+            self.logger.error(f"Error reading CPU usage: {e}")
+            return 0.0
+        except OSError:
+            pass
         try:
-            self.cpu_usage = psutil.cpu_percent(interval=0.5)
+            # No /proc/stat: psutil, also measuring since the previous call
+            self.cpu_usage = psutil.cpu_percent(interval=None)
+            self.per_core_usage = dict(enumerate(psutil.cpu_percent(interval=None, percpu=True)))
             return self.cpu_usage
         except Exception as e:
             self.logger.error(f"Error reading CPU usage: {e}")
             return 0.0
 
     # ---------- frequency ----------
-    def _cpufreq_sysfs(self):
-        for p in ("/sys/devices/system/cpu/cpufreq/policy0/scaling_cur_freq",
-                  "/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq"):
-            if os.path.exists(p):
-                v = self._read_float(p, 1/1000.0)  # kHz -> MHz
-                if v:
-                    return round(v, 2)
-        return None
+    def _discover_frequency(self):
+        """scaling_cur_freq of every cpufreq policy (or of every CPU on old kernels)"""
+        paths = glob.glob("/sys/devices/system/cpu/cpufreq/policy*/scaling_cur_freq")
+        if not paths:
+            paths = glob.glob("/sys/devices/system/cpu/cpu[0-9]*/cpufreq/scaling_cur_freq")
+        return sorted(paths)
 
     def get_frequency(self):
         try:
+            # Mean over the policies, as psutil.cpu_freq reports it
+            v = self.sensors.read_float("frequency", self._discover_frequency, 1/1000.0,  # kHz -> MHz
+                                        reduce=lambda values: sum(values) / len(values))
+            if v:
+                self.cpu_freq = round(v, 2)
+                return self.cpu_freq
             fi = psutil.cpu_freq()
             if fi and fi.current:
                 self.cpu_freq = round(float(fi.current), 2)
                 return self.cpu_freq
-            v = self._cpufreq_sysfs()
-            if v:
-                self.cpu_freq = v
-                return v
             with open("/proc/cpuinfo") as f:
                 for line in f:
                     if line.startswith("cpu MHz"):
@@ -210,6 +216,7 @@ class CpuMetrics(Metrics):
         return {
             "temperature": self.get_temperature(),
             "usage_percentage": self.get_usage_percentage(),
+            "per_core_usage": self.per_core_usage,
             "frequency": self.get_frequency(),
             "name": self.get_name(),
         }
@@ -0,0 +1,73 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from typing import Dict, Optional, Tuple
+
+# (busy, total) jiffies of one /proc/stat cpu line
+Jiffies = Tuple[int, int]
+
+
+def _parse_jiffies(fields) -> Jiffies:
+    """
+    Busy and total jiffies from the counters of a cpu line:
+    user nice system idle iowait irq softirq steal [guest guest_nice].
+    Guest time is already counted in user and nice, so it is left out.
+    """
+    counters = [int(value) for value in fields[:8]]
+    total = sum(counters)
+    idle = counters[3] + (counters[4] if len(counters) > 4 else 0)
+    return total - idle, total
+
+
+class CpuUsageSampler:
+    """
+    CPU usage from /proc/stat, computed from the jiffies elapsed since the
+    previous sample.
+
+    A sample is one read of /proc/stat and never sleeps, so the usage covers
+    the time between two calls (the metrics tick) instead of a blocking
+    measurement window. The first sample, and a core seen for the first time
+    or whose counters went backwards (CPU hotplug), give the average since
+    boot; samples taken within the same jiffy repeat the last usage. Offline
+    cores are left out of the per-core usage.
+    """
+
+    def __init__(self, path: str = "/proc/stat"):
+        self.path = path
+        self._previous: Dict[str, Jiffies] = {}
+        self._last: Dict[str, float] = {}
+
+    def _read(self) -> Dict[str, Jiffies]:
+        jiffies = {}
+        with open(self.path) as f:
+            for line in f:
+                if not line.startswith("cpu"):
+                    # The cpu lines come first
+                    break
+                name, *fields = line.split()
+                jiffies[name] = _parse_jiffies(fields)
+        return jiffies
+
+    def _usage(self, name: str, current: Jiffies, previous: Optional[Jiffies]) -> float:
+        busy, total = current
+        if previous is not None:
+            if (busy, total) == previous:
+                return self._last.get(name, 0.0)
+            if total > previous[1] and busy >= previous[0]:
+                busy, total = busy - previous[0], total - previous[1]
+        return max(0.0, min(100.0, 100.0 * busy / total)) if total > 0 else 0.0
+
+    def sample(self) -> Tuple[float, Dict[int, float]]:
+        """
+        Take a sample
+
+        Returns:
+            Tuple[float, Dict[int, float]]: Aggregate usage percentage, and the
+            usage percentage of each online core by CPU number
+        """
+        current = self._read()
+        previous, self._previous = self._previous, current
+        usage = {name: self._usage(name, jiffies, previous.get(name)) for name, jiffies in current.items()}
+        self._last = usage
+        per_core = {int(name[3:]): value for name, value in usage.items() if name != "cpu"}
+        return usage.get("cpu", 0.0), per_core
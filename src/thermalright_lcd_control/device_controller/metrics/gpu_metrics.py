@@ -2,23 +2,31 @@
 # Copyright © 2025
 
 import glob
-import json
 import os
 import re
 import subprocess
 
 from . import Metrics
+from .intel_gpu_top import IntelGpuTopStream
+from .nvidia_smi import NvidiaSmiStream
+from .sensors import SensorRegistry
 from ...common.logging_config import LoggerConfig
 
+# nvidia-smi / intel_gpu_top samples older than this many seconds are treated as unavailable
+STREAM_MAX_AGE = 5.0
+
 
 class GpuMetrics(Metrics):
     """
     AMD-friendly GPU metrics:
       - Detect vendor via sysfs; still supports NVIDIA (nvidia-smi) & Intel.
+      - NVIDIA: every metric from one long-lived nvidia-smi loop (see NvidiaSmiStream).
+      - Intel usage: engine busy from one long-running intel_gpu_top (see IntelGpuTopStream).
       - On AMD: prefer a discrete GPU first, then fallback to iGPU.
       - AMD temperature: hwmon for the *selected* card (junction/hotspot, else edge).
       - AMD usage: /sys/class/drm/cardX/device/gpu_busy_percent (selected card).
       - AMD frequency: prefer pp_dpm_sclk on selected card, else that card's hwmon freq1_input, else debugfs match by BDF.
+      - sysfs sensors are discovered once and read through open files (see SensorRegistry).
     """
     def __init__(self):
         super().__init__()
@@ -35,6 +43,9 @@ class GpuMetrics(Metrics):
         self.amd_pci_bdf = None            # e.g., "0000:65:00.0"
         self.amd_hwmon_base = None         # /sys/class/hwmon/hwmonY
 
+        self.sensors = SensorRegistry()
+        self.nvidia_stream = None          # started on the first NVIDIA read
+        self.intel_stream = None           # started on the first Intel usage read
         self.logger.debug("GpuMetrics initialized")
         self._detect_gpu()
 
@@ -221,6 +232,12 @@ class GpuMetrics(Metrics):
             f"hwmon={self.amd_hwmon_base}"
         )
 
+    def _refresh_amd_card(self):
+        """Select the card again when its paths went away (driver reload, hotplug)."""
+        if not (self.amd_card_path and os.path.isdir(self.amd_card_path)
+                and self.amd_hwmon_base and os.path.isdir(self.amd_hwmon_base)):
+            self._select_amd_card()
+
     # ---------- names ----------
 
     def _get_nvidia_name(self):
@@ -279,25 +296,31 @@ class GpuMetrics(Metrics):
             self.logger.error(f"Error reading GPU temperature: {e}")
             return None
 
+    def _nvidia_sample(self):
+        """The latest nvidia-smi sample, or None"""
+        if self.nvidia_stream is None:
+            self.nvidia_stream = NvidiaSmiStream()
+        # Only the read that starts nvidia-smi waits, for its first sample
+        return self.nvidia_stream.latest(max_age=STREAM_MAX_AGE, wait=4.0)
+
+    def _nvidia_value(self, field):
+        """A field of the latest nvidia-smi sample, or None"""
+        sample = self._nvidia_sample()
+        return sample.get(field) if sample else None
+
     def _get_nvidia_temperature(self):
-        try:
-            r = subprocess.run(
-                ["nvidia-smi", "--query-gpu=temperature.gpu", "--format=csv,noheader,nounits"],
-                capture_output=True, text=True, timeout=4
-            )
-            if r.returncode == 0 and r.stdout.strip():
-                self.gpu_temp = float(r.stdout.strip().splitlines()[0])
-                self.logger.debug(f"NVIDIA GPU temperature: {self.gpu_temp}°C")
-                return self.gpu_temp
-        except Exception:
-            pass
-        return None
+        v = self._nvidia_value("temperature.gpu")
+        if v is not None:
+            self.gpu_temp = v
+            self.logger.debug(f"NVIDIA GPU temperature: {self.gpu_temp}°C")
+        return v
 
-    def _amd_hwmon_temp(self):
+    def _discover_amd_temperature(self):
         """
-        Prefer 'junction'/'hotspot' label if present, else 'edge' for the selected card.
-        temp*_input is millidegrees.
+        Prefer 'junction'/'hotspot' label if present, else 'edge' for the selected card,
+        else its first temp*_input.
         """
+        self._refresh_amd_card()
         bases = []
         if self.amd_hwmon_base:
             bases.append(self.amd_hwmon_base)
@@ -312,47 +335,33 @@ class GpuMetrics(Metrics):
                     continue
 
         for base in bases:
-            try:
-                labels = {}
-                for lbl in glob.glob(os.path.join(base, "temp*_label")):
-                    m = re.search(r"temp(\d+)_label$", lbl)
-                    if not m:
-                        continue
-                    idx = m.group(1)
-                    try:
-                        with open(lbl) as f:
-                            labels[idx] = f.read().strip().lower()
-                    except Exception:
-                        pass
-
-                # pick best
-                pick = None
+            labels = {}
+            for lbl in glob.glob(os.path.join(base, "temp*_label")):
+                m = re.search(r"temp(\d+)_label$", lbl)
+                if not m:
+                    continue
+                try:
+                    with open(lbl) as f:
+                        labels[m.group(1)] = f.read().strip().lower()
+                except Exception:
+                    pass
+
+            # pick best
+            for keys in (("junction", "hotspot", "tjunction"), ("edge",)):
                 for idx, lab in labels.items():
-                    if any(k in lab for k in ("junction", "hotspot", "tjunction")):
-                        pick = idx
-                        break
-                if not pick:
-                    for idx, lab in labels.items():
-                        if "edge" in lab:
-                            pick = idx
-                            break
-
-                if pick:
-                    p = os.path.join(base, f"temp{pick}_input")
-                    if os.path.exists(p):
-                        v = self._read_file_float(p, scale=1/1000.0)
-                        if v is not None:
-                            return v
-
-                # fallback: first temp*_input
-                inputs = sorted(glob.glob(os.path.join(base, "temp*_input")))
-                if inputs:
-                    v = self._read_file_float(inputs[0], scale=1/1000.0)
-                    if v is not None:
-                        return v
-            except Exception:
-                continue
-        return None
+                    p = os.path.join(base, f"temp{idx}_input")
+                    if any(k in lab for k in keys) and self._read_file_float(p) is not None:
+                        return [p]
+
+            # fallback: first temp*_input
+            for p in sorted(glob.glob(os.path.join(base, "temp*_input"))):
+                if self._read_file_float(p) is not None:
+                    return [p]
+        return []
+
+    def _amd_hwmon_temp(self):
+        """Temperature of the selected card from hwmon; temp*_input is millidegrees."""
+        return self.sensors.read_float("amd_temperature", self._discover_amd_temperature, 1/1000.0)
 
     def _read_file_float(self, path, scale=1.0):
         try:
@@ -383,22 +392,26 @@ class GpuMetrics(Metrics):
             pass
         return None
 
-    def _get_intel_temperature(self):
-        try:
-            for name_file in glob.glob("/sys/class/hwmon/hwmon*/name"):
+    def _discover_intel_temperature(self):
+        for name_file in glob.glob("/sys/class/hwmon/hwmon*/name"):
+            try:
                 with open(name_file) as f:
                     if "i915" not in f.read().strip().lower():
                         continue
-                base = os.path.dirname(name_file)
-                for tin in glob.glob(os.path.join(base, "temp*_input")):
-                    v = self._read_file_float(tin, scale=1/1000.0)
-                    if v is not None:
-                        self.gpu_temp = v
-                        self.logger.debug(f"Intel GPU temperature: {v:.1f}°C")
-                        return v
-        except Exception:
-            pass
-        return None
+            except Exception:
+                continue
+            base = os.path.dirname(name_file)
+            for tin in glob.glob(os.path.join(base, "temp*_input")):
+                if self._read_file_float(tin) is not None:
+                    return [tin]
+        return []
+
+    def _get_intel_temperature(self):
+        v = self.sensors.read_float("intel_temperature", self._discover_intel_temperature, 1/1000.0)
+        if v is not None:
+            self.gpu_temp = v
+            self.logger.debug(f"Intel GPU temperature: {v:.1f}°C")
+        return v
 
     # ---------- usage ----------
 
@@ -417,42 +430,31 @@ class GpuMetrics(Metrics):
             return None
 
     def _get_nvidia_usage(self):
-        try:
-            r = subprocess.run(
-                ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
-                capture_output=True, text=True, timeout=4
-            )
-            if r.returncode == 0 and r.stdout.strip():
-                self.gpu_usage = float(r.stdout.strip().splitlines()[0])
-                self.logger.debug(f"NVIDIA GPU usage: {self.gpu_usage:.1f}%")
-                return self.gpu_usage
-        except Exception:
-            pass
-        return None
+        v = self._nvidia_value("utilization.gpu")
+        if v is not None:
+            self.gpu_usage = v
+            self.logger.debug(f"NVIDIA GPU usage: {self.gpu_usage:.1f}%")
+        return v
+
+    def _discover_amd_usage(self):
+        self._refresh_amd_card()
+        candidates = [os.path.join(self.amd_card_path, "gpu_busy_percent")] if self.amd_card_path else []
+        # Fallback search (should be rare)
+        candidates += sorted(glob.glob("/sys/class/drm/card*/device/gpu_busy_percent"))
+        for p in candidates:
+            if self._read_file_float(p) is not None:
+                return [p]
+        return []
 
     def _get_amd_usage(self):
         """
         Use the selected AMD card's instantaneous busy percent.
         """
-        if self.amd_card_path:
-            p = os.path.join(self.amd_card_path, "gpu_busy_percent")
-            try:
-                with open(p) as f:
-                    self.gpu_usage = float(f.read().strip())
-                    self.logger.debug(f"AMD GPU usage: {self.gpu_usage:.1f}% (from {p})")
-                    return self.gpu_usage
-            except Exception:
-                pass
-
-        # Fallback search (should be rare)
-        for p in glob.glob("/sys/class/drm/card*/device/gpu_busy_percent"):
-            try:
-                with open(p) as f:
-                    self.gpu_usage = float(f.read().strip())
-                    self.logger.debug(f"AMD GPU usage: {self.gpu_usage:.1f}% (from {p})")
-                    return self.gpu_usage
-            except Exception:
-                continue
+        v = self.sensors.read_float("amd_usage", self._discover_amd_usage)
+        if v is not None:
+            self.gpu_usage = v
+            self.logger.debug(f"AMD GPU usage: {self.gpu_usage:.1f}%")
+            return self.gpu_usage
 
         # rocm-smi fallback
         try:
@@ -470,23 +472,15 @@ class GpuMetrics(Metrics):
         return None
 
     def _get_intel_usage(self):
-        try:
-            r = subprocess.run(["intel_gpu_top", "-J", "-s", "1000"],
-                               capture_output=True, text=True, timeout=3)
-            if r.returncode == 0:
-                data = json.loads(r.stdout)
-                if "engines" in data:
-                    vals = []
-                    for eng in data["engines"].values():
-                        if isinstance(eng, dict) and "busy" in eng:
-                            vals.append(float(eng["busy"]))
-                    if vals:
-                        self.gpu_usage = sum(vals) / len(vals)
-                        self.logger.debug(f"Intel GPU usage: {self.gpu_usage:.1f}%")
-                        return self.gpu_usage
-        except Exception:
-            pass
-        return None
+        if self.intel_stream is None:
+            self.intel_stream = IntelGpuTopStream()
+        # Only the read that starts intel_gpu_top waits, for its first period
+        sample = self.intel_stream.latest(max_age=STREAM_MAX_AGE, wait=2.0)
+        if sample is None:
+            return None
+        self.gpu_usage = sample["usage"]
+        self.logger.debug(f"Intel GPU usage: {self.gpu_usage:.1f}%")
+        return self.gpu_usage
 
     # ---------- frequency ----------
 
@@ -505,51 +499,41 @@ class GpuMetrics(Metrics):
             return None
 
     def _get_nvidia_frequency(self):
-        try:
-            r = subprocess.run(
-                ["nvidia-smi", "--query-gpu=clocks.current.graphics", "--format=csv,noheader,nounits"],
-                capture_output=True, text=True, timeout=4
-            )
-            if r.returncode == 0 and r.stdout.strip():
-                self.gpu_freq = round(float(r.stdout.strip().splitlines()[0]), 2)
-                self.logger.debug(f"NVIDIA GPU frequency: {self.gpu_freq:.2f} MHz")
-                return self.gpu_freq
-        except Exception:
-            pass
+        v = self._nvidia_value("clocks.current.graphics")
+        if v is not None:
+            self.gpu_freq = round(v, 2)
+            self.logger.debug(f"NVIDIA GPU frequency: {self.gpu_freq:.2f} MHz")
+            return self.gpu_freq
         return None
 
-    def _amd_freq_from_pp_dpm(self, card_dev_dir):
-        p = os.path.join(card_dev_dir, "pp_dpm_sclk")
-        try:
-            with open(p) as f:
-                # lines like: "0: 300Mhz", "1: 500Mhz *"
-                current = None
-                for line in f:
-                    if "*" in line:
-                        current = line
-                        break
-                if not current:
-                    return None
-                mhz = re.search(r"(\d+)\s*MHz", current, re.IGNORECASE)
-                if mhz:
-                    return float(mhz.group(1))
-        except Exception:
-            pass
+    def _existing(self, directory, name):
+        """[directory/name] when it exists, for sensor discovery."""
+        if not directory:
+            return []
+        p = os.path.join(directory, name)
+        return [p] if os.path.exists(p) else []
+
+    def _discover_amd_file(self, name, hwmon=False):
+        """An attribute of the selected card, or of its hwmon."""
+        self._refresh_amd_card()
+        return self._existing(self.amd_hwmon_base if hwmon else self.amd_card_path, name)
+
+    def _amd_freq_from_pp_dpm(self):
+        txt = self.sensors.read_text("amd_sclk", lambda: self._discover_amd_file("pp_dpm_sclk"))
+        if not txt:
+            return None
+        # lines like: "0: 300Mhz", "1: 500Mhz *"
+        for line in txt.splitlines():
+            if "*" in line:
+                mhz = re.search(r"(\d+)\s*MHz", line, re.IGNORECASE)
+                return float(mhz.group(1)) if mhz else None
         return None
 
     def _amd_freq_from_hwmon(self):
         # some kernels expose freq1_input (Hz) under the selected amdgpu hwmon
-        base = self.amd_hwmon_base
-        if not base:
-            return None
-        f1 = os.path.join(base, "freq1_input")
-        try:
-            if os.path.exists(f1):
-                hz = self._read_file_float(f1, scale=1.0)
-                if hz and hz > 0:
-                    return round(hz / 1_000_000.0, 2)  # Hz → MHz
-        except Exception:
-            pass
+        hz = self.sensors.read_float("amd_hwmon_freq", lambda: self._discover_amd_file("freq1_input", hwmon=True))
+        if hz and hz > 0:
+            return round(hz / 1_000_000.0, 2)  # Hz → MHz
         return None
 
     def _amd_freq_from_debugfs(self):
@@ -584,7 +568,7 @@ class GpuMetrics(Metrics):
             self._select_amd_card()
 
         # 1) pp_dpm_sclk on selected card
-        v = self._amd_freq_from_pp_dpm(self.amd_card_path) if self.amd_card_path else None
+        v = self._amd_freq_from_pp_dpm()
         if v:
             self.gpu_freq = round(v, 2)
             self.logger.debug(f"AMD GPU freq (pp_dpm_sclk): {self.gpu_freq} MHz")
@@ -607,14 +591,12 @@ class GpuMetrics(Metrics):
         return None
 
     def _get_intel_frequency(self):
-        try:
-            for p in glob.glob("/sys/class/drm/card*/gt_cur_freq_mhz"):
-                with open(p) as f:
-                    self.gpu_freq = round(float(f.read().strip()), 2)
-                    self.logger.debug(f"Intel GPU frequency: {self.gpu_freq} MHz")
-                    return self.gpu_freq
-        except Exception:
-            pass
+        v = self.sensors.read_float(
+            "intel_freq", lambda: sorted(glob.glob("/sys/class/drm/card*/gt_cur_freq_mhz"))[:1])
+        if v is not None:
+            self.gpu_freq = round(v, 2)
+            self.logger.debug(f"Intel GPU frequency: {self.gpu_freq} MHz")
+            return self.gpu_freq
         return None
 
     def get_memory_usage(self):
@@ -633,50 +615,31 @@ class GpuMetrics(Metrics):
             return None
 
     def _get_nvidia_memory_usage(self):
-        try:
-            r = subprocess.run(
-                ["nvidia-smi", "--query-gpu=memory.used,memory.total", "--format=csv,noheader,nounits"],
-                capture_output=True, text=True, timeout=4
-            )
-            if r.returncode == 0:
-                line = r.stdout.strip().split('\n')[0]
-                used, total = [int(x.strip()) for x in line.split(',')]
-                if total > 0:
-                    return round((used / total) * 100, 1)
-        except Exception:
-            pass
+        # Both fields from the same sample
+        sample = self._nvidia_sample()
+        if not sample:
+            return None
+        used, total = sample.get("memory.used"), sample.get("memory.total")
+        if used is not None and total:
+            return round((used / total) * 100, 1)
         return None
 
     def _get_amd_memory_usage(self):
         """Get AMD GPU memory usage percentage"""
-        if not self.amd_card_path:
-            return None
-        try:
-            # Try visible VRAM first (what applications see)
-            used_file = os.path.join(self.amd_card_path, "mem_info_vis_vram_used")
-            total_file = os.path.join(self.amd_card_path, "mem_info_vis_vram_total")
-            
-            if os.path.exists(used_file) and os.path.exists(total_file):
-                with open(used_file) as f:
-                    used = int(f.read().strip())
-                with open(total_file) as f:
-                    total = int(f.read().strip())
-                if total > 0:
-                    return round((used / total) * 100, 1)
-            
-            # Fallback to total VRAM
-            used_file = os.path.join(self.amd_card_path, "mem_info_vram_used")
-            total_file = os.path.join(self.amd_card_path, "mem_info_vram_total")
-            
-            if os.path.exists(used_file) and os.path.exists(total_file):
-                with open(used_file) as f:
-                    used = int(f.read().strip())
-                with open(total_file) as f:
-                    total = int(f.read().strip())
-                if total > 0:
-                    return round((used / total) * 100, 1)
-        except Exception as e:
-            self.logger.error(f"Error reading AMD GPU memory: {e}")
+        def vram(kind):
+            def discover():
+                self._refresh_amd_card()
+                # Try visible VRAM first (what applications see), else total VRAM
+                for prefix in ("mem_info_vis_vram", "mem_info_vram"):
+                    if (self._existing(self.amd_card_path, f"{prefix}_used")
+                            and self._existing(self.amd_card_path, f"{prefix}_total")):
+                        return self._existing(self.amd_card_path, f"{prefix}_{kind}")
+                return []
+            return self.sensors.read_float(f"amd_vram_{kind}", discover)
+
+        used, total = vram("used"), vram("total")
+        if used is not None and total:
+            return round((used / total) * 100, 1)
         return None
 
     def _get_intel_memory_usage(self):
@@ -698,6 +661,14 @@ class GpuMetrics(Metrics):
             'memory_usage': self.get_memory_usage()
         }
 
+    def close(self):
+        """Stop the telemetry processes and close the sensor files"""
+        for stream in (self.nvidia_stream, self.intel_stream):
+            if stream is not None:
+                stream.stop()
+        self.nvidia_stream = self.intel_stream = None
+        self.sensors.close()
+
     def get_metric_value(self, metric_name) -> str:
         if metric_name == "gpu_temperature":
             v = self.get_temperature(); return f"{v}" if v is not None else "N/A"
@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import json
+from typing import List, Optional
+
+from .process_stream import ProcessStream, Sample
+
+INTEL_GPU_TOP = "intel_gpu_top"
+
+
+class IntelGpuTopStream(ProcessStream):
+    """
+    Intel GPU engine usage from one long-running `intel_gpu_top -J` process.
+
+    intel_gpu_top prints a JSON object per period, as elements of an array
+    or back to back depending on its version. The objects are cut out of the
+    stream by tracking brace depth outside strings, so each one is parsed as
+    soon as it is complete. Samples hold the busy percentage of each engine
+    under "engines" and their mean under "usage".
+    """
+
+    def __init__(self, interval_ms: int = 1000, executable: str = INTEL_GPU_TOP, **kwargs):
+        super().__init__([executable, "-J", "-s", str(interval_ms)], **kwargs)
+        self.reset()
+
+    def reset(self):
+        self._chunks: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def handle_line(self, line: str) -> Optional[Sample]:
+        sample = None
+        start = 0 if self._depth else None
+        for i, char in enumerate(line):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._depth > 0
+            elif char == "{":
+                if self._depth == 0:
+                    start = i
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._chunks.append(line[start:i + 1])
+                    text, self._chunks, start = "".join(self._chunks), [], None
+                    sample = self._parse(text) or sample
+        if self._depth:
+            self._chunks.append(line[start:])
+        return sample
+
+    def _parse(self, text: str) -> Optional[Sample]:
+        try:
+            period = json.loads(text)
+        except ValueError as e:
+            self.logger.debug(f"Cannot parse intel_gpu_top sample: {e}")
+            return None
+        engines = {}
+        for name, engine in period.get("engines", {}).items():
+            if isinstance(engine, dict) and "busy" in engine:
+                engines[name] = float(engine["busy"])
+        if not engines:
+            return None
+        return {"engines": engines, "usage": sum(engines.values()) / len(engines)}
@@ -0,0 +1,44 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+from typing import Optional
+
+from .process_stream import ProcessStream, Sample
+
+NVIDIA_SMI = "nvidia-smi"
+
+# Queried together on every loop; the name is left out as it may contain commas
+FIELDS = ("index", "temperature.gpu", "utilization.gpu", "clocks.current.graphics",
+          "memory.used", "memory.total")
+
+
+class NvidiaSmiStream(ProcessStream):
+    """
+    NVIDIA telemetry from one long-lived `nvidia-smi --loop-ms` process.
+
+    Every field comes from a single batched query printed each `interval_ms`,
+    instead of spawning nvidia-smi once per metric. Samples are keyed by the
+    query field names; unsupported fields ("[N/A]", "[Not Supported]") are None.
+    Only the GPU with index `gpu_index` is kept.
+    """
+
+    def __init__(self, interval_ms: int = 1000, gpu_index: int = 0, executable: str = NVIDIA_SMI, **kwargs):
+        super().__init__([executable, f"--query-gpu={','.join(FIELDS)}",
+                          "--format=csv,noheader,nounits", f"--loop-ms={interval_ms}"], **kwargs)
+        self.gpu_index = gpu_index
+
+    @staticmethod
+    def _value(text: str) -> Optional[float]:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+
+    def handle_line(self, line: str) -> Optional[Sample]:
+        values = [value.strip() for value in line.split(",")]
+        if len(values) != len(FIELDS):
+            return None
+        sample = {field: self._value(value) for field, value in zip(FIELDS, values)}
+        if sample["index"] != self.gpu_index:
+            return None
+        return sample
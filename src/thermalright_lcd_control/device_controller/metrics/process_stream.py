@@ -0,0 +1,145 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from ...common.logging_config import LoggerConfig
+
+Sample = Dict[str, Any]
+
+
+class ProcessStream(ABC):
+    """
+    A long-lived telemetry process whose output is parsed on a reader thread.
+
+    Subclasses turn output lines into samples in `handle_line`; the latest
+    sample is kept for the metrics thread, which never waits on the process.
+    The process is started on first use and restarted when it exits, after
+    `restart_delay` seconds, doubled after each run that gave no sample, up
+    to `max_restart_delay`.
+    """
+
+    def __init__(self, command: List[str], restart_delay: float = 1.0, max_restart_delay: float = 60.0):
+        self.logger = LoggerConfig.setup_service_logger()
+        self.command = command
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._sample: Optional[Sample] = None
+        self._sample_time = 0.0
+        self._first_sample = threading.Event()
+        self._stop = threading.Event()
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def handle_line(self, line: str) -> Optional[Sample]:
+        """Parse a line of output, returning a complete sample or None"""
+        pass
+
+    def reset(self):
+        """Drop parser state before the process is (re)started"""
+
+    def start(self) -> bool:
+        """Start the reader thread, returning False when it is already running"""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.command[0]}-reader", daemon=True)
+        self._thread.start()
+        return True
+
+    def latest(self, max_age: Optional[float] = None, wait: float = 0.0) -> Optional[Sample]:
+        """
+        The latest sample, or None when there is none or it is older than
+        max_age seconds. When this call starts the stream, wait up to `wait`
+        seconds for its first sample.
+        """
+        if self.start() and wait > 0:
+            self._first_sample.wait(wait)
+        with self._lock:
+            if self._sample is None:
+                return None
+            if max_age is not None and time.monotonic() - self._sample_time > max_age:
+                return None
+            return self._sample
+
+    def _publish(self, sample: Sample):
+        with self._lock:
+            self._sample = sample
+            self._sample_time = time.monotonic()
+        self._first_sample.set()
+
+    def _run(self):
+        delay = self.restart_delay
+        while not self._stop.is_set():
+            produced = self._run_once()
+            if self._stop.is_set():
+                break
+            if produced:
+                delay = self.restart_delay
+            self.logger.warning(f"{self.command[0]} exited, restarting in {delay:.1f} s")
+            if self._stop.wait(delay):
+                break
+            if not produced:
+                delay = min(delay * 2, self.max_restart_delay)
+            self.restarts += 1
+
+    def _run_once(self) -> bool:
+        """Run the process until it exits, returning whether it gave a sample"""
+        try:
+            process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                       stdin=subprocess.DEVNULL, text=True, bufsize=1)
+        except OSError as e:
+            self.logger.debug(f"Cannot start {self.command[0]}: {e}")
+            return False
+        with self._lock:
+            self._process = process
+        self.reset()
+        produced = False
+        try:
+            if self._stop.is_set():
+                # stop() ran before the process was published
+                return False
+            for line in process.stdout:
+                if self._stop.is_set():
+                    break
+                try:
+                    sample = self.handle_line(line)
+                except Exception as e:
+                    self.logger.debug(f"Cannot parse {self.command[0]} output {line!r}: {e}")
+                    continue
+                if sample is not None:
+                    self._publish(sample)
+                    produced = True
+        finally:
+            self._terminate(process)
+            with self._lock:
+                self._process = None
+        return produced
+
+    def _terminate(self, process: subprocess.Popen):
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        process.stdout.close()
+
+    def stop(self):
+        """Stop the process and the reader thread"""
+        self._stop.set()
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+        if self._thread is not None:
+            self._thread.join(timeout=3.0)
+            self._thread = None
@@ -0,0 +1,151 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright © 2025 Rejeb Ben Rejeb
+
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ...common.logging_config import LoggerConfig
+
+# Directories whose entries change when a sensor or GPU comes or goes
+HOTPLUG_DIRS = ("/sys/class/hwmon", "/sys/class/drm")
+
+
+class SensorFile:
+    """
+    A sysfs attribute kept open and read with os.pread at offset 0, which
+    makes the kernel produce a fresh value: one syscall per read.
+    """
+
+    __slots__ = ("path", "_fd")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+
+    def read_text(self) -> str:
+        # sysfs attributes are at most a page
+        return os.pread(self._fd, 4096, 0).decode(errors="replace")
+
+    def read_float(self, scale: float = 1.0) -> float:
+        return float(self.read_text().strip()) * scale
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class SensorRegistry:
+    """
+    Sensors discovered once, then read through open file descriptors.
+
+    Each sensor has a name and a discovery function returning the paths to
+    read (best first, several when the value is reduced over them, e.g. the
+    hottest CCD). Discovery runs on the first read, again after a read fails
+    (driver reloaded, device gone) and when the hwmon/drm devices change,
+    which is checked every `hotplug_interval` seconds. A sensor that was not
+    found is looked for again after `retry_interval` seconds.
+    """
+
+    def __init__(self, retry_interval: float = 30.0, hotplug_interval: float = 10.0,
+                 hotplug_dirs: Iterable[str] = HOTPLUG_DIRS):
+        self.logger = LoggerConfig.setup_service_logger()
+        self.retry_interval = retry_interval
+        self.hotplug_interval = hotplug_interval
+        self.hotplug_dirs = tuple(hotplug_dirs)
+        self._sensors: Dict[str, List[SensorFile]] = {}
+        # When discovery last found nothing, per sensor name
+        self._missing: Dict[str, float] = {}
+        self._devices: Optional[Tuple] = None
+        self._hotplug_checked = float("-inf")
+
+    def _device_list(self) -> Tuple:
+        devices = []
+        for directory in self.hotplug_dirs:
+            try:
+                devices.append(tuple(sorted(os.listdir(directory))))
+            except OSError:
+                devices.append(None)
+        return tuple(devices)
+
+    def _check_hotplug(self):
+        now = time.monotonic()
+        if now - self._hotplug_checked < self.hotplug_interval:
+            return
+        self._hotplug_checked = now
+        devices = self._device_list()
+        if self._devices is not None and devices != self._devices:
+            self.logger.info("Sensor devices changed, discovering sensors again")
+            self.invalidate()
+        self._devices = devices
+
+    def _files(self, name: str, discover: Callable[[], List[str]]) -> List[SensorFile]:
+        self._check_hotplug()
+        files = self._sensors.get(name)
+        if files is not None:
+            return files
+        missing = self._missing.get(name)
+        if missing is not None and time.monotonic() - missing < self.retry_interval:
+            return []
+
+        files = []
+        try:
+            for path in discover():
+                try:
+                    files.append(SensorFile(path))
+                except OSError as e:
+                    self.logger.debug(f"Cannot open sensor {path}: {e}")
+        except Exception as e:
+            self.logger.debug(f"Discovery of sensor {name} failed: {e}")
+        if files:
+            self._sensors[name] = files
+            self._missing.pop(name, None)
+            self.logger.debug(f"Sensor {name}: {', '.join(f.path for f in files)}")
+        else:
+            self._missing[name] = time.monotonic()
+        return files
+
+    def _forget(self, name: str):
+        for sensor in self._sensors.pop(name, ()):
+            sensor.close()
+
+    def read_float(self, name: str, discover: Callable[[], List[str]], scale: float = 1.0,
+                   reduce: Callable[[List[float]], float] = max) -> Optional[float]:
+        """Read a numeric sensor, reduced over its files, or None when unavailable"""
+        files = self._files(name, discover)
+        if not files:
+            return None
+        try:
+            return reduce([sensor.read_float(scale) for sensor in files])
+        except (OSError, ValueError) as e:
+            self.logger.debug(f"Sensor {name} read failed, discovering it again: {e}")
+            self._forget(name)
+            return None
+
+    def read_text(self, name: str, discover: Callable[[], List[str]]) -> Optional[str]:
+        """Read the first file of a text sensor, or None when unavailable"""
+        files = self._files(name, discover)
+        if not files:
+            return None
+        try:
+            return files[0].read_text()
+        except OSError as e:
+            self.logger.debug(f"Sensor {name} read failed, discovering it again: {e}")
+            self._forget(name)
+            return None
+
+    def invalidate(self):
+        """Close every sensor, so each is discovered again on its next read"""
+        for name in list(self._sensors):
+            self._forget(name)
+        self._missing.clear()
+
+    def close(self):
+        self.invalidate()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -168,11 +168,13 @@ class PreviewManager:
             if pil_image.mode != 'RGB':
                 pil_image = pil_image.convert('RGB')
 
-            # Apply rotation to PIL image based on current_rotation
+            # The generator draws the unrotated canvas (the device encoder turns it),
+            # so the preview applies the rotation, once
             current_rotation = getattr(self, 'current_rotation', 0)
             if current_rotation:
-                # PIL rotate uses counterclockwise, so negate for clockwise rotation
-                pil_image = pil_image.rotate(-current_rotation)
+                # PIL rotate uses counterclockwise, so negate for clockwise rotation;
+                # quarter turns with expand are exact transposes that keep the panel shape
+                pil_image = pil_image.rotate(-current_rotation, expand=True)
 
             width, height = pil_image.size
             image_data = pil_image.tobytes("raw", "RGB")
@@ -112,6 +112,8 @@ class MetricDataManager:
         self.running = False
         if self.thread:
             self.thread.join(timeout=2.0)
+        if self.gpu_metrics:
+            self.gpu_metrics.close()
         self.logger.info("MetricDataManager stopped")
     
     def _update_loop(self):
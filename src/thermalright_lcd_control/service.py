@@ -18,18 +18,39 @@ if __name__ == "__main__" and __package__ is None:
     __package__ = 'thermalright_lcd_control'
 
 
+def _parse_size(value: str):
+    try:
+        width, height = value.lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid size '{value}', expected WIDTHxHEIGHT (e.g. 480x480)")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Thermal Right LCD Control")
     parser.add_argument('--config',
                         required=True,
                         help="Display configuration file")
+    parser.add_argument('--virtual',
+                        metavar='PROTOCOL',
+                        help="Use a virtual loopback display instead of hardware "
+                             "(0416:5302, 0418:5304 or 87ad:70db)")
+    parser.add_argument('--virtual-size',
+                        metavar='WxH',
+                        type=_parse_size,
+                        help="Resolution of the virtual display (default: the protocol's panel size)")
+    parser.add_argument('--virtual-bandwidth',
+                        metavar='MBPS',
+                        type=float,
+                        help="Simulated link bandwidth of the virtual display in MB/s (default: unlimited)")
     args = parser.parse_args()
     from .common.logging_config import get_service_logger
     logger = get_service_logger()
     logger.info("Thermal Right LCD Control starting in device controller mode")
 
     from .device_controller import run_service
-    run_service(args.config)
+    bandwidth = args.virtual_bandwidth * 1e6 if args.virtual_bandwidth else None
+    run_service(args.config, args.virtual, args.virtual_size, bandwidth)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test the payload transfer size, framing and shutdown of the 87AD:70DB bulk
+device against a fake USB device.
+"""
+import logging
+import os
+import sys
+import threading
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+
+from thermalright_lcd_control.device_controller.display import usb_devices
+from thermalright_lcd_control.device_controller.display.usb_devices import DisplayDevice87AD70DB
+
+EP_OUT = 0x01
+
+
+class FakeUsbDevice:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, endpoint, data, timeout=None):
+        assert endpoint == EP_OUT
+        self.writes.append(bytes(data))
+        return len(data)
+
+
+def make_device(transfer_size=None):
+    """A 87AD:70DB device without USB discovery or the start/stop quiet windows"""
+    device = DisplayDevice87AD70DB.__new__(DisplayDevice87AD70DB)
+    device.logger = logging.getLogger(__name__)
+    device.width, device.height = device.W, device.H
+    device.dev = FakeUsbDevice()
+    device.ep_out = EP_OUT
+    device.transfer_size = device._resolve_transfer_size(transfer_size)
+    device._hdr_frame = device._make_header(cmd=3, mode=2, payload_len=device.PAYLOAD_BYTES)
+    return device
+
+
+@pytest.mark.parametrize("requested, expected", [
+    (None, 204800),
+    (512, 512),
+    (100, 512),           # at least one packet
+    (10 ** 9, 204800),    # at most the whole payload
+    (1000, 512),          # rounded down to a multiple of 512...
+    (8192, 8192),
+    (16384, 12800),       # ...that divides 204800
+    (102400, 102400),
+])
+def test_transfer_size_divides_the_payload(monkeypatch, requested, expected):
+    monkeypatch.delenv("THERMALRIGHT_BULK_TRANSFER_SIZE", raising=False)
+    size = make_device(requested).transfer_size
+    assert size == expected
+    assert size % DisplayDevice87AD70DB.PKT == 0
+    assert DisplayDevice87AD70DB.PAYLOAD_BYTES % size == 0
+
+
+@pytest.mark.parametrize("env, expected", [("4096", 4096), ("20000", 12800), ("", 204800), ("fast", 204800)])
+def test_transfer_size_from_the_environment(monkeypatch, env, expected):
+    monkeypatch.setenv("THERMALRIGHT_BULK_TRANSFER_SIZE", env)
+    assert make_device().transfer_size == expected
+    # An explicit size wins over the environment
+    assert make_device(512).transfer_size == 512
+
+
+def send_frame(device):
+    frame = device._build_frame_buffer()
+    payload = np.arange(device.PAYLOAD_BYTES, dtype=np.uint32).astype(np.uint8)
+    frame.payload[:] = payload
+    frame.commit()
+    device._send_frame(frame)
+    return payload.tobytes()
+
+
+def test_payload_goes_out_in_one_write(monkeypatch):
+    monkeypatch.delenv("THERMALRIGHT_BULK_TRANSFER_SIZE", raising=False)
+    device = make_device()
+    payload = send_frame(device)
+    header, data, zlp = device.dev.writes
+    assert header == device._hdr_frame
+    assert data == payload
+    assert zlp == b""
+
+
+def test_payload_is_split_into_transfer_size_writes():
+    device = make_device(512)
+    payload = send_frame(device)
+    writes = device.dev.writes
+    assert writes[0] == device._hdr_frame
+    assert writes[-1] == b""
+    chunks = writes[1:-1]
+    assert len(chunks) == device.PACKETS_PER_FRAME
+    assert {len(chunk) for chunk in chunks} == {512}
+    assert b"".join(chunks) == payload
+
+
+class FakeGenerator:
+    cleaned_up = False
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+def test_close_stops_the_generator_then_ends_the_stream(monkeypatch):
+    released = []
+    monkeypatch.setattr(usb_devices.usb.util, "release_interface", lambda dev, iface: released.append(iface))
+    monkeypatch.setattr(usb_devices.usb.util, "dispose_resources", lambda dev: released.append("disposed"))
+    device = make_device(512)
+    device.iface = 0
+    device.stop_wait = 0
+    device._hdr_eos = device._make_header(cmd=3, mode=2, payload_len=0)
+    device._build_lock = threading.Lock()
+    generator = device._generator = FakeGenerator()
+
+    device.close(timeout=1.0)
+    assert generator.cleaned_up
+    assert device._generator is None
+    assert device.dev.writes == [device._hdr_eos, b""]
+    assert released == [0, "disposed"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
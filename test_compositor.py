@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the NumPy premultiplied alpha compositor.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image
+
+from thermalright_lcd_control.device_controller.display.compositor import (
+    ComposedFrame, Compositor, Layer, merge_rects)
+
+
+def random_pixels(shape, seed):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("position", [(0, 0), (10, 5), (-7, -3), (50, 30)])
+def test_blend_matches_pil_alpha_composite(position):
+    background = random_pixels((40, 60, 3), 1)
+    overlay = Image.fromarray(random_pixels((20, 25, 4), 2), 'RGBA')
+
+    expected = Image.fromarray(background, 'RGB').convert('RGBA')
+    canvas = Image.new('RGBA', expected.size, (0, 0, 0, 0))
+    canvas.paste(overlay, position)
+    expected = np.asarray(Image.alpha_composite(expected, canvas).convert('RGB'))
+
+    compositor = Compositor(60, 40)
+    compositor.load(background)
+    compositor.blend(Layer.from_image(overlay), position)
+
+    diff = np.abs(compositor.frame.astype(int) - expected)
+    assert diff.max() <= 1
+
+
+def test_opaque_and_transparent_pixels_are_exact():
+    pixels = np.zeros((2, 2, 4), dtype=np.uint8)
+    pixels[0, 0] = (255, 255, 255, 255)
+    pixels[1, 1] = (10, 20, 30, 255)
+    pixels[0, 1] = (0, 0, 0, 0)
+    pixels[1, 0] = (0, 0, 0, 128)
+
+    compositor = Compositor(2, 2)
+    compositor.load(np.full((2, 2, 3), 255, dtype=np.uint8))
+    compositor.blend(Layer.from_image(Image.fromarray(pixels, 'RGBA')))
+
+    assert compositor.frame.tolist() == [[[255, 255, 255], [255, 255, 255]],
+                                         [[127, 127, 127], [10, 20, 30]]]
+
+
+def test_crop_is_a_view():
+    layer = Layer.from_image(Image.fromarray(random_pixels((10, 10, 4), 3), 'RGBA'))
+    cropped = layer.crop(2, 3, 7, 5)
+
+    assert (cropped.width, cropped.height) == (5, 2)
+    assert np.shares_memory(cropped.premultiplied, layer.premultiplied)
+
+
+def test_load_image():
+    image = Image.fromarray(random_pixels((8, 12, 3), 4), 'RGB')
+    compositor = Compositor(12, 8)
+    compositor.load(image.convert('RGBA'))
+
+    assert np.array_equal(compositor.frame, np.asarray(image))
+
+
+def test_merge_rects_joins_overlapping_rects():
+    merged = merge_rects([(0, 0, 10, 10), (20, 0, 30, 10), (5, 5, 25, 8), (40, 40, 50, 50)])
+    assert sorted(merged) == [(0, 0, 30, 10), (40, 40, 50, 50)]
+
+
+def test_coalesce_keeps_the_dirty_rects_of_dropped_frames():
+    pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+    newer = ComposedFrame(pixels, [(0, 0, 2, 2)])
+    assert newer.coalesce(ComposedFrame(pixels, [(2, 2, 4, 4)])).dirty == [(2, 2, 4, 4), (0, 0, 2, 2)]
+    assert newer.coalesce(ComposedFrame(pixels)).dirty is None
+
+
+def test_blend_is_limited_to_clip():
+    background = random_pixels((20, 20, 3), 5)
+    layer = Layer.from_image(Image.new('RGBA', (20, 20), (255, 0, 0, 255)))
+    compositor = Compositor(20, 20)
+    compositor.load(background)
+    compositor.clip = (5, 5, 10, 15)
+    compositor.blend(layer)
+
+    expected = background.copy()
+    expected[5:15, 5:10] = (255, 0, 0)
+    assert np.array_equal(compositor.frame, expected)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the /proc/stat CPU usage sampler.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The device_controller package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.metrics.cpu_metrics import CpuMetrics
+from thermalright_lcd_control.device_controller.metrics.cpu_usage import CpuUsageSampler
+
+
+def write_stat(path, cpus):
+    """cpus: {name: (user, idle)}"""
+    lines = [f"{name} {user} 0 0 {idle} 0 0 0 0 0 0" for name, (user, idle) in cpus.items()]
+    path.write_text("\n".join(lines + ["intr 12345 0 0", "ctxt 6789"]) + "\n")
+
+
+@pytest.fixture
+def stat(tmp_path):
+    return tmp_path / "stat"
+
+
+def test_usage_is_computed_from_deltas(stat):
+    sampler = CpuUsageSampler(str(stat))
+    write_stat(stat, {"cpu": (100, 300), "cpu0": (50, 150), "cpu1": (50, 150)})
+    assert sampler.sample() == (25.0, {0: 25.0, 1: 25.0})
+
+    write_stat(stat, {"cpu": (180, 320), "cpu0": (130, 150), "cpu1": (50, 170)})
+    assert sampler.sample() == (80.0, {0: 100.0, 1: 0.0})
+
+
+def test_sample_within_the_same_jiffy_repeats_the_last_usage(stat):
+    sampler = CpuUsageSampler(str(stat))
+    write_stat(stat, {"cpu": (10, 10)})
+    sampler.sample()
+    write_stat(stat, {"cpu": (40, 20)})
+    assert sampler.sample()[0] == 75.0
+    assert sampler.sample()[0] == 75.0
+
+
+def test_hotplugged_cores(stat):
+    sampler = CpuUsageSampler(str(stat))
+    write_stat(stat, {"cpu": (100, 100), "cpu0": (50, 50), "cpu1": (50, 50)})
+    sampler.sample()
+
+    # cpu1 goes offline, cpu2 comes online with its counters since boot
+    write_stat(stat, {"cpu": (150, 150), "cpu0": (100, 50), "cpu2": (10, 30)})
+    assert sampler.sample()[1] == {0: 100.0, 2: 25.0}
+
+    # cpu0 counters restart after an offline/online cycle: average since they restarted
+    write_stat(stat, {"cpu": (160, 160), "cpu0": (5, 15), "cpu2": (10, 40)})
+    assert sampler.sample()[1] == {0: 25.0, 2: 0.0}
+
+
+@pytest.mark.parametrize("content", ["cpu 100 0 0 abc\n", "cpu0\n"])
+def test_malformed_stat_reads_as_no_usage(stat, content):
+    metrics = CpuMetrics()
+    metrics._usage_sampler = CpuUsageSampler(str(stat))
+    stat.write_text(content)
+    assert metrics.get_usage_percentage() == 0.0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
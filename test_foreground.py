@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the prepared foreground overlay.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image
+
+from thermalright_lcd_control.device_controller.display.foreground import get_foreground_overlay
+
+
+@pytest.fixture
+def foreground(tmp_path):
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 256, (20, 30, 4), dtype=np.uint8)
+    path = str(tmp_path / "foreground.png")
+    Image.fromarray(pixels, 'RGBA').save(path)
+    return path
+
+
+def background(seed=2):
+    pixels = np.random.default_rng(seed).integers(0, 256, (40, 50, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+@pytest.mark.parametrize("alpha", [1.0, 0.4])
+@pytest.mark.parametrize("position", [(5, 7), (-10, -4), (35, 30)])
+def test_composite_matches_pil_alpha_composite(foreground, alpha, position):
+    overlay = get_foreground_overlay(foreground, alpha, position, (50, 40))
+    bg = background()
+
+    expected = Image.alpha_composite(bg.convert('RGBA'), overlay.image).convert('RGB')
+    result = overlay.composite(bg)
+
+    assert result.size == (50, 40)
+    assert np.abs(np.asarray(result).astype(int) - np.asarray(expected)).max() <= 1
+
+
+def test_composited_frames_do_not_share_pixels(foreground):
+    overlay = get_foreground_overlay(foreground, 0.7, (5, 7), (50, 40))
+    first = overlay.composite(background(seed=2))
+    pixels = np.asarray(first).copy()
+    second = overlay.composite(background(seed=3))
+
+    assert np.array_equal(np.asarray(first), pixels)
+    assert not np.array_equal(np.asarray(second), pixels)
+
+def test_alpha_and_clipping_are_applied_once(foreground):
+    overlay = get_foreground_overlay(foreground, 0.5, (-10, 30), (50, 40))
+    source = np.asarray(Image.open(foreground))
+    layer = np.asarray(overlay.image)
+
+    assert overlay.bbox == (0, 30, 20, 40)
+    assert np.array_equal(layer[30:40, 0:20, :3], source[0:10, 10:30, :3])
+    assert np.array_equal(layer[30:40, 0:20, 3], (source[0:10, 10:30, 3] * 0.5).astype(np.uint8))
+    assert not layer[:30].any()
+
+
+def test_overlay_is_shared_until_something_changes(foreground):
+    overlay = get_foreground_overlay(foreground, 1.0, (0, 0), (50, 40))
+    assert get_foreground_overlay(foreground, 1.0, [0, 0], (50, 40)) is overlay
+    assert get_foreground_overlay(foreground, 0.5, (0, 0), (50, 40)) is not overlay
+    assert get_foreground_overlay(foreground, 1.0, (1, 0), (50, 40)) is not overlay
+
+    st = os.stat(foreground)
+    os.utime(foreground, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert get_foreground_overlay(foreground, 1.0, (0, 0), (50, 40)) is not overlay
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
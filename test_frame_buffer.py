@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test that the persistent FrameBuffer produces the same packets as the
+original header + payload chunking.
+"""
+import os
+import struct
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+
+from thermalright_lcd_control.device_controller.display.frame_buffer import FrameBuffer
+
+
+def legacy_packets(img_bytes, chunk_size, report_id):
+    """Original DisplayDevice._prepare_frame_packets"""
+    frame_packets = []
+    for i in range(0, len(img_bytes), chunk_size):
+        chunk = img_bytes[i:i + chunk_size]
+        if len(chunk) < chunk_size:
+            chunk += b"\x00" * (chunk_size - len(chunk))
+        frame_packets.append(report_id + chunk)
+    return frame_packets
+
+
+@pytest.mark.parametrize("report_id", [bytes([0x00]), b""])
+def test_packets_match_legacy_chunking(report_id):
+    header = struct.pack('<BBHHH', 0x69, 0x88, 480, 480, 0)
+    payload = np.random.default_rng(0).integers(0, 256, 480 * 480 * 2, dtype=np.uint8)
+    frame = FrameBuffer(header, payload.size, 512, report_id)
+
+    frame.payload[:] = payload
+    frame.commit()
+
+    expected = legacy_packets(header + payload.tobytes(), 512, report_id)
+    assert [bytes(p) for p in frame.packets] == expected
+
+
+def test_header_and_report_id_survive_frames():
+    header = bytes([0xDA, 0xDB, 0xDC, 0xDD])
+    frame = FrameBuffer(header, 100, 32, bytes([0x01]))
+    for value in (0x11, 0x22):
+        frame.payload[:] = value
+        frame.commit()
+        assert frame.tobytes() == header + bytes([value]) * 100
+        assert all(p[0] == 0x01 for p in frame.packets)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-disk background frame cache.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image
+
+from thermalright_lcd_control.device_controller.display.frame_cache import (
+    CachedFrames, FrameCache, cache_entry_size)
+
+
+def random_image(width, height, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+def quantized(img):
+    return np.asarray(img) & np.array([0xF8, 0xFC, 0xF8], dtype=np.uint8)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "background.gif"
+    path.write_bytes(b"frames")
+    return str(path)
+
+
+def write_entry(cache, path, images, durations):
+    writer = cache.writer(path, 40, 30, len(images))
+    for image, duration in zip(images, durations):
+        writer.append(image, duration)
+    return writer.commit()
+
+
+def test_frames_round_trip_through_the_cache_file(tmp_path, source):
+    cache = FrameCache(str(tmp_path / "cache"))
+    path = cache.path_for([source], 40, 30)
+    assert cache.load(path) is None
+
+    images = [random_image(40, 30, seed) for seed in range(3)]
+    write_entry(cache, path, images, [0.1, 0.2, 0.3])
+
+    frames = cache.load(path)
+    assert len(frames) == 3
+    assert frames.durations == [0.1, 0.2, 0.3]
+    for image, frame in zip(images, frames):
+        assert frame.size == (40, 30)
+        assert np.array_equal(np.asarray(frame), quantized(image))
+    assert [f for f in os.listdir(tmp_path / "cache") if f.endswith(".tmp")] == []
+
+
+def test_key_covers_source_mtime_resolution_and_rotation(source):
+    cache = FrameCache("/unused")
+    path = cache.path_for([source], 40, 30)
+    assert cache.path_for([source], 30, 40) != path
+    assert cache.path_for([source], 40, 30, rotation=90) != path
+
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.path_for([source], 40, 30) != path
+
+
+def test_truncated_or_foreign_files_are_ignored(tmp_path, source):
+    cache = FrameCache(str(tmp_path))
+    path = cache.path_for([source], 40, 30)
+    write_entry(cache, path, [random_image(40, 30)], [1.0])
+
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+    assert cache.load(path) is None
+
+    with open(path, "wb") as f:
+        f.write(b"not a cache file at all")
+    assert cache.load(path) is None
+    with pytest.raises(ValueError):
+        CachedFrames(path)
+
+
+def test_aborted_writer_leaves_nothing_behind(tmp_path, source):
+    cache = FrameCache(str(tmp_path / "cache"))
+    path = cache.path_for([source], 40, 30)
+    writer = cache.writer(path, 40, 30, 1)
+    writer.append(random_image(40, 30), 1.0)
+    writer.abort()
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def test_only_recent_entries_are_kept(tmp_path):
+    cache = FrameCache(str(tmp_path))
+    cache.MAX_ENTRIES = 2
+    for i in range(4):
+        write_entry(cache, str(tmp_path / f"{i}{cache.SUFFIX}"), [random_image(40, 30)], [1.0])
+        os.utime(tmp_path / f"{i}{cache.SUFFIX}", (i, i))
+    assert sorted(os.listdir(tmp_path)) == [f"2{cache.SUFFIX}", f"3{cache.SUFFIX}"]
+
+
+def test_entries_are_evicted_by_total_size(tmp_path):
+    entry_size = cache_entry_size(40, 30, 2)
+    # Room for two entries, and the 3 frames a new 2-frame entry reserves
+    cache = FrameCache(str(tmp_path), max_bytes=2 * entry_size + cache_entry_size(40, 30, 3))
+    for i in range(3):
+        write_entry(cache, str(tmp_path / f"{i}{cache.SUFFIX}"), [random_image(40, 30)] * 2, [1.0] * 2)
+        os.utime(tmp_path / f"{i}{cache.SUFFIX}", (i, i))
+    assert os.path.getsize(tmp_path / f"0{cache.SUFFIX}") == entry_size
+
+    # Two entries' worth has to go to reserve 5 frames for a 4-frame entry
+    write_entry(cache, str(tmp_path / f"3{cache.SUFFIX}"), [random_image(40, 30)] * 4, [1.0] * 4)
+    assert sorted(os.listdir(tmp_path)) == [f"2{cache.SUFFIX}", f"3{cache.SUFFIX}"]
+
+
+def test_sources_over_the_budget_are_not_cached(tmp_path, source):
+    cache = FrameCache(str(tmp_path / "cache"), max_bytes=cache_entry_size(40, 30, 2))
+    path = cache.path_for([source], 40, 30)
+    assert cache.writer(path, 40, 30, 3) is None
+
+    # A source longer than its reported frame count stops at the budget
+    writer = cache.writer(path, 40, 30, 1)
+    writer.append(random_image(40, 30), 1.0)
+    writer.append(random_image(40, 30), 1.0)
+    with pytest.raises(OSError):
+        writer.append(random_image(40, 30), 1.0)
+    writer.abort()
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def test_writer_stops_at_the_reserved_size(tmp_path, source):
+    cache = FrameCache(str(tmp_path / "cache"))
+    path = cache.path_for([source], 40, 30)
+    writer = cache.writer(path, 40, 30, 20)
+    reserved = int(20 * (1 + cache.FRAME_COUNT_SLACK)) + 1
+    assert writer.max_bytes == cache_entry_size(40, 30, reserved)
+
+    image = random_image(40, 30)
+    for _ in range(reserved):
+        writer.append(image, 1.0)
+    with pytest.raises(OSError):
+        writer.append(image, 1.0)
+    writer.abort()
+
+def test_empty_cache_dir_disables_the_cache(monkeypatch):
+    monkeypatch.setenv("THERMALRIGHT_FRAME_CACHE_DIR", "")
+    assert not FrameCache().enabled
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for demand-driven metrics collection in the frame manager.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.display.config import BackgroundType, DisplayConfig, MetricConfig
+from thermalright_lcd_control.device_controller.display import frame_manager
+from thermalright_lcd_control.device_controller.display.config_unified import BarGraphConfig, CircularGraphConfig
+from thermalright_lcd_control.device_controller.display.frame_manager import (
+    METRIC_PENDING, FrameManager, referenced_metrics)
+
+
+def make_config(**widgets):
+    return DisplayConfig(background_path="", background_type=BackgroundType.COLOR,
+                         background_color={"r": 0, "g": 0, "b": 0}, **widgets)
+
+
+class FakeCpuMetrics:
+    def __init__(self):
+        self.reads = []
+
+    def get_temperature(self):
+        self.reads.append("temperature")
+        return 48.5
+
+    def get_usage_percentage(self):
+        self.reads.append("usage")
+        return 12.0
+
+    def get_frequency(self):
+        self.reads.append("frequency")
+        return 3600.0
+
+
+def test_referenced_metrics_follow_the_enabled_widgets():
+    config = make_config(
+        metrics_configs=[MetricConfig(name="gpu_usage"), MetricConfig(name="cpu_frequency", enabled=False),
+                         MetricConfig(name="ram_usage")],
+        bar_configs=[BarGraphConfig(position=(0, 0), width=100, height=10, color=(255, 0, 0, 255),
+                                    metric_name="cpu_temperature")],
+        circular_configs=[CircularGraphConfig(position=(50, 50), radius=30, color=(0, 0, 255, 255),
+                                              metric_name="gpu_temperature", enabled=False)],
+    )
+    assert referenced_metrics(config) == ("cpu_temperature", "gpu_usage")
+    assert referenced_metrics(make_config()) == ()
+
+
+def test_only_displayed_metrics_are_sampled():
+    manager = FrameManager(make_config(metrics_configs=[MetricConfig(name="cpu_temperature")]),
+                           collect_metrics=False)
+    assert manager.get_current_metrics() == {"cpu_temperature": METRIC_PENDING}
+
+    manager.cpu_metrics = FakeCpuMetrics()
+    assert manager._get_current_metric() == {"cpu_temperature": 48.5}
+    assert manager.cpu_metrics.reads == ["temperature"]
+    assert manager.gpu_metrics is None
+
+
+def test_metrics_of_a_failed_collector_read_as_not_available(monkeypatch):
+    def broken_gpu_metrics():
+        raise RuntimeError("no GPU tools")
+
+    monkeypatch.setattr(frame_manager, "CpuMetrics", FakeCpuMetrics)
+    monkeypatch.setattr(frame_manager, "GpuMetrics", broken_gpu_metrics)
+    manager = FrameManager(make_config(metrics_configs=[MetricConfig(name="cpu_temperature"),
+                                                        MetricConfig(name="gpu_usage")]),
+                           collect_metrics=False)
+    manager._create_collectors()
+    assert manager.gpu_metrics is None
+    assert manager._get_current_metric() == {"cpu_temperature": 48.5, "gpu_usage": "N/A"}
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
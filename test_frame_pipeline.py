@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test the threaded render -> encode -> write FramePipeline with fake stages.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.display.frame_buffer import FrameBuffer
+from thermalright_lcd_control.device_controller.display.frame_pipeline import FramePipeline
+from thermalright_lcd_control.device_controller.display.frame_stats import FrameStats
+
+
+class FakeScheduler:
+    def wait(self):
+        time.sleep(0.001)
+        return 0
+
+
+class FakeLogger:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+class Stages:
+    """Fake render/encode/send stages; frames are increasing integers"""
+
+    def __init__(self):
+        self.counter = itertools.count(1)
+        self.rendered = 0
+        self.encoded = []
+        self.sent = []
+
+    def render(self):
+        self.rendered += 1
+        return next(self.counter)
+
+    def encode(self, value, frame):
+        frame.payload[:4] = list(value.to_bytes(4, "little"))
+        self.encoded.append(value)
+        return frame
+
+    def send(self, frame):
+        self.sent.append(int.from_bytes(frame.payload[:4].tobytes(), "little"))
+
+
+def make_pipeline(stages, depth=3, **kwargs):
+    kwargs.setdefault("logger", FakeLogger())
+    return FramePipeline(
+        render=stages.render,
+        encode=stages.encode,
+        send=stages.send,
+        buffers=[FrameBuffer(b"HD", 4, 8) for _ in range(depth)],
+        scheduler=FakeScheduler(),
+        **kwargs
+    )
+
+
+def run_in_thread(pipeline):
+    thread = threading.Thread(target=pipeline.run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_needs_two_buffers():
+    with pytest.raises(ValueError):
+        make_pipeline(Stages(), depth=1)
+
+
+def test_slow_writer_gets_the_newest_frame_instead_of_a_queue():
+    stages = Stages()
+    released = threading.Event()
+    blocked = []
+    send = stages.send
+
+    def slow_send(frame):
+        if not blocked:
+            blocked.append(True)
+            released.wait()
+        send(frame)
+
+    stages.send = slow_send
+    pipeline = make_pipeline(stages)
+    runner = run_in_thread(pipeline)
+
+    # The writer is stuck on the first frame: encoding keeps going with the
+    # two remaining buffers, recycling the ready frame each time, so the
+    # pool never runs dry
+    wait_for(lambda: blocked and len(stages.encoded) >= 20)
+    newest = stages.encoded[-1]
+
+    released.set()
+    wait_for(lambda: len(stages.sent) >= 3)
+    pipeline.stop()
+    runner.join(5)
+
+    # The second frame on the bus is a recent one, not the one queued behind the first
+    assert stages.sent[1] >= newest
+    assert stages.sent == sorted(stages.sent)
+    assert pipeline.dropped_frames > 15
+    in_flight = stages.rendered - len(stages.sent) - pipeline.dropped_frames
+    assert 0 <= in_flight <= 3
+
+
+def test_stop_joins_threads_and_returns_buffers():
+    stages = Stages()
+    pipeline = make_pipeline(stages)
+    runner = run_in_thread(pipeline)
+    wait_for(lambda: len(stages.sent) >= 5)
+    threads = list(pipeline._threads)
+    pipeline.stop()
+    runner.join(5)
+
+    assert not runner.is_alive()
+    assert threads and not any(thread.is_alive() for thread in threads)
+    assert len(pipeline._free) == 3
+    assert pipeline.frames_sent == len(stages.sent)
+
+
+def test_unchanged_frames_are_not_encoded():
+    stages = Stages()
+    stages.render = lambda: None
+    pipeline = make_pipeline(stages)
+    runner = run_in_thread(pipeline)
+    time.sleep(0.05)
+    pipeline.stop()
+    runner.join(5)
+    assert stages.encoded == [] and stages.sent == []
+
+
+@pytest.mark.parametrize("stage", ["render", "encode", "send"])
+def test_errors_are_logged_and_throttled(stage):
+    stages = Stages()
+    calls = []
+
+    def failing(*args):
+        calls.append(time.monotonic())
+        raise RuntimeError("boom")
+
+    setattr(stages, stage, failing)
+    logger = FakeLogger()
+    stats = FrameStats()
+    pipeline = make_pipeline(stages, logger=logger, stats=stats, error_delay=0.1)
+    runner = run_in_thread(pipeline)
+    wait_for(lambda: len(calls) >= 2)
+    pipeline.stop()
+    runner.join(5)
+
+    assert calls[1] - calls[0] >= 0.09
+    assert logger.errors and all("boom" in message for message in logger.errors)
+    assert len(pipeline._free) == 3
+    if stage == "send":
+        assert stats.usb_errors >= 2
+        assert pipeline.frames_sent == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test the deadline based FrameScheduler with a simulated clock.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.display.frame_scheduler import FrameScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_scheduler(fps):
+    clock = FakeClock()
+    return FrameScheduler(fps, clock=clock, sleep=clock.sleep), clock
+
+
+def test_work_time_comes_out_of_the_budget():
+    scheduler, clock = make_scheduler(10)
+    scheduler.wait()
+    starts = []
+    for _ in range(5):
+        clock.now += 0.03  # render + transfer
+        scheduler.wait()
+        starts.append(round(clock.now, 6))
+    assert starts == [100.1, 100.2, 100.3, 100.4, 100.5]
+    assert scheduler.deadline_misses == 0
+
+
+def test_late_frames_skip_slots_instead_of_bursting():
+    scheduler, clock = make_scheduler(10)
+    scheduler.wait()
+    clock.now += 0.35  # 2.5 periods late for the next slot
+    assert scheduler.wait() == 2
+    assert scheduler.deadline_misses == 1
+    assert scheduler.skipped_frames == 2
+    # Next slot is back on the 0.1s grid
+    scheduler.wait()
+    assert round(clock.now, 6) == 100.4
+
+
+def test_achieved_fps_is_measured():
+    scheduler, clock = make_scheduler(20)
+    for _ in range(int(FrameScheduler.FPS_WINDOW * 20) + 2):
+        scheduler.wait()
+    assert scheduler.achieved_fps == pytest.approx(20, rel=0.05)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test the fixed-size stage histograms used for frame timing stats.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.display.frame_stats import (
+    STATS_FILE, FrameStats, StageHistogram, StatsFileWriter
+)
+
+
+def test_percentiles_are_within_one_bucket():
+    histogram = StageHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000.0)
+    assert histogram.count == 100
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=0.12)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=0.12)
+    assert histogram.percentile(100) == pytest.approx(0.100)
+
+
+def test_empty_and_out_of_range_values():
+    histogram = StageHistogram()
+    assert histogram.summary()["p99_ms"] == 0.0
+    histogram.record(120.0)
+    assert histogram.percentile(50) == 120.0
+
+
+def test_stats_file_is_rewritten(tmp_path):
+    stats = FrameStats()
+    stats.record("encode", 0.002)
+    path = tmp_path / "stats.json"
+    writer = StatsFileWriter(lambda: {"stages": stats.snapshot()}, path=str(path))
+    writer.write()
+    data = json.loads(path.read_text())
+    assert data["stages"]["encode"]["count"] == 1
+    assert set(data["stages"]) == set(FrameStats.STAGES)
+    assert os.listdir(tmp_path) == ["stats.json"]
+
+
+def test_stats_file_is_opt_in(monkeypatch):
+    monkeypatch.delenv("THERMALRIGHT_STATS", raising=False)
+    writer = StatsFileWriter(dict)
+    assert writer.path is None
+    writer.start()
+    assert writer.thread is None
+
+    monkeypatch.setenv("THERMALRIGHT_STATS", "1")
+    assert StatsFileWriter(dict).path == STATS_FILE
+
+
+def test_shared_directory_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    writer = StatsFileWriter(dict, path=str(shared / "stats.json"), interval=0.01)
+    writer.start()
+    assert not writer.running
+    assert not (shared / "stats.json").exists()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
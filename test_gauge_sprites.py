@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for pre-rendered gauge sprite sheets.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from thermalright_lcd_control.device_controller.display.gauge_sprites import GaugeSpriteSheet
+
+
+def draw_bar(image, fraction, scale):
+    width, height = image.size
+    fill_width = round(width * fraction)
+    if fill_width > 0:
+        ImageDraw.Draw(image).rectangle([0, 0, fill_width - 1, height - 1], fill=(255, 0, 0))
+
+
+def draw_disc(image, fraction, scale):
+    width, height = image.size
+    ImageDraw.Draw(image).ellipse([0, 0, width - 1, height - 1], fill=(0, 255, 0))
+
+
+def test_levels_are_stacked_in_one_sheet():
+    sheet = GaugeSpriteSheet((40, 6), 101, draw_bar)
+
+    assert sheet.sheet.size == (40, 6 * 101)
+    assert sheet.nbytes == 40 * 6 * 101 * 4
+
+
+@pytest.mark.parametrize("fraction, filled", [(0.0, 0), (0.5, 20), (1.0, 40), (1.7, 40), (0.251, 10)])
+def test_blit_draws_nearest_level(fraction, filled):
+    sheet = GaugeSpriteSheet((40, 6), 5, draw_bar)
+    image = Image.new('RGBA', (50, 10), (0, 0, 0, 255))
+    sheet.blit(image, (5, 2), fraction)
+
+    row = np.asarray(image)[4, 5:45]
+    assert (row[:filled] == (255, 0, 0, 255)).all()
+    assert (row[filled:] == (0, 0, 0, 255)).all()
+
+
+def test_edges_are_antialiased():
+    sheet = GaugeSpriteSheet((41, 41), 2, draw_disc)
+    alpha = np.asarray(sheet.sheet.getchannel('A'))
+
+    assert alpha[20, 20] == 255
+    assert alpha[0, 0] == 0
+    assert ((alpha > 0) & (alpha < 255)).sum() > 40
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_blit_is_clipped_to_the_image(mode):
+    sheet = GaugeSpriteSheet((41, 41), 2, draw_disc)
+    image = Image.new(mode, (30, 30))
+    sheet.blit(image, (-20, -20), 1.0)
+    sheet.blit(image, (100, 100), 1.0)
+
+    assert np.asarray(image)[0, 0, 1] == 255
+    assert np.asarray(image)[29, 29, 1] == 0
+
+
+def test_needs_two_levels():
+    with pytest.raises(ValueError):
+        GaugeSpriteSheet((10, 10), 1, draw_bar)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test that DisplayGenerator and DisplayDevice only render frames when
+something visible changed, and that the static theme layers composed once
+per generator give the same frames as composing them every frame.
+"""
+import os
+import sys
+import time
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image
+
+from thermalright_lcd_control.device_controller.display.config import (
+    BackgroundType, DisplayConfig, MetricConfig, TextConfig)
+from thermalright_lcd_control.device_controller.display.config_unified import ShapeConfig, ShapeType
+from thermalright_lcd_control.device_controller.display.generator import DisplayGenerator
+from thermalright_lcd_control.device_controller.display.virtual_device import VirtualDisplayDevice
+
+
+def make_generator(**kwargs):
+    kwargs.setdefault("background_path", "")
+    kwargs.setdefault("background_type", BackgroundType.COLOR)
+    config = DisplayConfig(metrics_configs=[MetricConfig(name="cpu_temperature", position=(10, 10))],
+                           **kwargs)
+    generator = DisplayGenerator(config, collect_metrics=False)
+    generator.frame_manager.current_metrics = {"cpu_temperature": 40}
+    return generator
+
+
+@pytest.mark.parametrize("compositor", ["pil", "numpy"])
+def test_unchanged_state_renders_nothing(compositor):
+    generator = make_generator(compositor=compositor)
+    assert generator.get_frame_if_changed() is not None
+    assert generator.get_frame_if_changed() is None
+    # Metrics the theme does not show are not a visible change
+    generator.frame_manager.current_metrics["gpu_usage"] = 12
+    assert generator.get_frame_if_changed() is None
+
+
+@pytest.mark.parametrize("compositor", ["pil", "numpy"])
+def test_metric_change_renders_a_frame(compositor):
+    generator = make_generator(compositor=compositor)
+    first = generator.get_frame_if_changed()
+    generator.frame_manager.current_metrics["cpu_temperature"] = 41
+    second = generator.get_frame_if_changed()
+    assert second is not None
+    assert second is not first
+    assert generator.get_frame_if_changed() is None
+
+
+def test_invalidate_forces_a_frame():
+    generator = make_generator()
+    generator.get_frame_if_changed()
+    assert generator.get_frame_if_changed() is None
+    generator.invalidate()
+    assert generator.get_frame_if_changed() is not None
+    assert generator.get_frame_if_changed() is None
+
+
+def test_device_resends_after_keepalive_interval():
+    generator = make_generator()
+    # Only the render path is exercised: no config file, no generator build
+    device = VirtualDisplayDevice.__new__(VirtualDisplayDevice)
+    device._get_generator = lambda: generator
+    device.keepalive_interval = 0.2
+
+    assert device._render_frame() is not None
+    assert device._render_frame() is None
+    time.sleep(0.25)
+    assert device._render_frame() is not None
+    assert device._render_frame() is None
+
+
+def test_device_without_change_tracking_always_renders():
+    generator = make_generator()
+    device = VirtualDisplayDevice.__new__(VirtualDisplayDevice)
+    device._get_generator = lambda: generator
+    device.change_tracking = False
+    assert device._render_frame() is not None
+    assert device._render_frame() is not None
+
+
+@pytest.mark.parametrize("compositor", ["pil", "numpy"])
+def test_background_advances_once_per_frame(tmp_path, monkeypatch, compositor):
+    monkeypatch.setenv("THERMALRIGHT_FRAME_CACHE_DIR", "")
+    for seed in range(3):
+        random_image(320, 240, seed=seed).save(tmp_path / f"{seed}.png")
+    generator = make_generator(compositor=compositor, background_path=str(tmp_path),
+                               background_type=BackgroundType.IMAGE_COLLECTION)
+    frame_manager = generator.frame_manager
+    frame_manager.frame_duration = 0.0
+    advance_frame = frame_manager.advance_frame
+    advances = []
+    monkeypatch.setattr(frame_manager, "advance_frame", lambda: advances.append(1) or advance_frame())
+
+    for index in (1, 2, 0):
+        assert generator.get_frame_if_changed() is not None
+        assert frame_manager.current_frame_index == index
+    assert len(advances) == 3
+
+
+def random_image(width, height, seed=0, mode='RGB'):
+    channels = len(mode)
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, channels), dtype=np.uint8)
+    return Image.fromarray(pixels, mode)
+
+
+def compose_every_frame(generator, background, metrics):
+    """A frame composed the way it was before the static layers were built once per generator"""
+    foreground = generator._load_foreground()
+    image = foreground.composite(background) if foreground is not None else background.convert('RGBA')
+    generator.plan.draw_static(image)
+    generator.plan.draw(image, metrics, None)
+    return image.convert('RGB')
+
+
+@pytest.fixture
+def themed_generator(tmp_path, monkeypatch):
+    """A generator with a foreground, a custom text and a shape over the given background"""
+    monkeypatch.setenv("THERMALRIGHT_FRAME_CACHE_DIR", "")
+    foreground = tmp_path / "foreground.png"
+    random_image(120, 80, seed=10, mode='RGBA').save(foreground)
+
+    def make(background_type, background_path):
+        config = DisplayConfig(
+            background_path=str(background_path), background_type=background_type,
+            foreground_image_path=str(foreground), foreground_position=(40, 30), foreground_alpha=0.6,
+            metrics_configs=[MetricConfig(name="cpu_temperature", position=(10, 10))],
+            text_configs=[TextConfig(text="CPU", position=(60, 50), font_size=24)],
+            shape_configs=[ShapeConfig(position=(150, 100), width=60, height=40,
+                                       shape_type=ShapeType.ROUNDED_RECTANGLE, color=(200, 40, 40, 160),
+                                       corner_radius=8)])
+        return DisplayGenerator(config, collect_metrics=False)
+    return make
+
+
+def test_static_layers_match_per_frame_composition_on_a_static_background(tmp_path, themed_generator):
+    background = tmp_path / "background.png"
+    random_image(320, 240, seed=1).save(background)
+    generator = themed_generator(BackgroundType.IMAGE, background)
+    assert generator.frame_manager.is_static
+
+    metrics = {"cpu_temperature": 40}
+    frame = generator.generate_frame_with_metrics(metrics)
+    expected = compose_every_frame(generator, generator.frame_manager.get_current_frame(), metrics)
+    assert np.array_equal(np.asarray(frame), np.asarray(expected))
+
+
+def test_static_layers_match_per_frame_composition_on_an_animated_background(tmp_path, themed_generator):
+    backgrounds = tmp_path / "backgrounds"
+    backgrounds.mkdir()
+    for seed in range(2):
+        random_image(320, 240, seed=seed).save(backgrounds / f"{seed}.png")
+    generator = themed_generator(BackgroundType.IMAGE_COLLECTION, backgrounds)
+    assert not generator.frame_manager.is_static
+
+    for index, background in enumerate(generator.frame_manager.background_frames):
+        generator.frame_manager.get_current_frame = lambda: background
+        metrics = {"cpu_temperature": 40 + index}
+        frame = generator.generate_frame_with_metrics(metrics)
+        expected = compose_every_frame(generator, background, metrics)
+        assert np.array_equal(np.asarray(frame), np.asarray(expected))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the glyph atlas used by numeric readouts.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from thermalright_lcd_control.device_controller.display.glyph_atlas import GlyphAtlas, NUMERIC_CHARS
+from thermalright_lcd_control.device_controller.display.text_sprites import TextSpriteCache
+
+READOUTS = ["0", "42°C", "CPU: 100%", "1.5 GHz", "-7", "12:34", "3/4", "99.9%", "11", "GPU  65°C"]
+
+
+def background():
+    pixels = np.random.default_rng(5).integers(0, 256, (80, 200, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+@pytest.mark.parametrize("size", [12, 16, 24, 40])
+def test_atlas_sprites_match_freetype(size):
+    font = ImageFont.load_default(size)
+    atlas = GlyphAtlas(font, NUMERIC_CHARS + "CPUGHz°")
+    cache = TextSpriteCache()
+    for text in READOUTS:
+        expected = background()
+        ImageDraw.Draw(expected).text((100, 40), text, fill=(0, 255, 128), font=font, anchor='mm')
+
+        result = background()
+        cache.draw(result, (100, 40), text, font, (0, 255, 128), atlas=atlas)
+
+        diff = np.abs(np.asarray(result).astype(int) - np.asarray(expected))
+        assert diff.max() <= 1, text
+
+
+def test_covers_only_atlas_characters():
+    atlas = GlyphAtlas(ImageFont.load_default(16))
+
+    assert atlas.covers("-12.5%")
+    assert not atlas.covers("42°C")
+
+
+def test_uncovered_text_falls_back_to_freetype():
+    font = ImageFont.load_default(16)
+    expected = background()
+    ImageDraw.Draw(expected).text((100, 40), "RTX 4090", fill=(255, 255, 255), font=font, anchor='mm')
+
+    result = background()
+    TextSpriteCache().draw(result, (100, 40), "RTX 4090", font, (255, 255, 255), atlas=GlyphAtlas(font))
+
+    assert np.array_equal(np.asarray(result), np.asarray(expected))
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming intel_gpu_top reader, against a scripted fake intel_gpu_top.
+"""
+import json
+import os
+import stat
+import sys
+import textwrap
+import time
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The device_controller package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.metrics.intel_gpu_top import IntelGpuTopStream
+
+
+def period(render, video):
+    return {
+        "period": {"duration": 1000.0, "unit": "ms"},
+        "frequency": {"requested": 300.0, "actual": 300.0, "unit": "MHz"},
+        "engines": {
+            "Render/3D/0": {"busy": render, "sema": 0.0, "wait": 0.0, "unit": "%"},
+            "Video/0": {"busy": video, "sema": 0.0, "wait": 0.0, "unit": "%"},
+        },
+    }
+
+
+def feed(stream, text):
+    samples = [stream.handle_line(line) for line in text.splitlines(keepends=True)]
+    return [sample for sample in samples if sample is not None]
+
+
+def test_array_output_is_parsed_period_by_period():
+    stream = IntelGpuTopStream()
+    text = "[\n" + ",\n".join(json.dumps(period(r, 10.0), indent="\t") for r in (50.0, 70.0))
+    samples = feed(stream, text)
+    assert samples == [{"engines": {"Render/3D/0": 50.0, "Video/0": 10.0}, "usage": 30.0},
+                       {"engines": {"Render/3D/0": 70.0, "Video/0": 10.0}, "usage": 40.0}]
+
+
+def test_back_to_back_objects_and_braces_in_strings():
+    stream = IntelGpuTopStream()
+    first = period(20.0, 0.0)
+    first["clients"] = {"1": {"name": "game {demo} \"}\""}}
+    assert feed(stream, json.dumps(first) + json.dumps(period(80.0, 20.0)) + "\n") == [
+        {"engines": {"Render/3D/0": 80.0, "Video/0": 20.0}, "usage": 50.0}]
+
+
+def test_malformed_period_is_skipped():
+    stream = IntelGpuTopStream()
+    text = '{\n"engines": {"Render/3D/0": {"busy": oops}}\n}\n' + json.dumps(period(10.0, 30.0)) + "\n"
+    assert [sample["usage"] for sample in feed(stream, text)] == [20.0]
+
+
+def fake_intel_gpu_top(tmp_path, body):
+    """Write an executable intel_gpu_top stand-in; `runs` counts its starts"""
+    script = tmp_path / "intel_gpu_top"
+    script.write_text(f"#!{sys.executable}\n" + textwrap.dedent("""
+        import json, os, sys, time
+        runs_file = os.path.join(os.path.dirname(__file__), "runs")
+        runs = int(open(runs_file).read()) + 1 if os.path.exists(runs_file) else 1
+        open(runs_file, "w").write(str(runs))
+        assert sys.argv[1:3] == ["-J", "-s"]
+        def period(busy):
+            return json.dumps({"engines": {"Render/3D/0": {"busy": busy, "unit": "%"}}}, indent="\\t")
+    """) + textwrap.dedent(body))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return script
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def streams():
+    started = []
+    yield started
+    for stream in started:
+        stream.stop()
+
+
+def test_streamed_periods_publish_the_latest_usage(tmp_path, streams):
+    script = fake_intel_gpu_top(tmp_path, """
+        print("[")
+        busy = 0
+        while True:
+            busy += 1
+            print(period(busy) + ",", flush=True)
+            time.sleep(0.02)
+    """)
+    stream = IntelGpuTopStream(interval_ms=20, executable=str(script))
+    streams.append(stream)
+    assert stream.latest(wait=5.0) is not None
+    first = stream.latest()["usage"]
+    assert wait_for(lambda: stream.latest()["usage"] > first)
+    assert (tmp_path / "runs").read_text() == "1"
+
+
+def test_dying_process_is_restarted_with_backoff(tmp_path, streams):
+    script = fake_intel_gpu_top(tmp_path, """
+        if runs == 1:
+            # Dies half way through its first period
+            print("[\\n{\\n\\"engines\\": {", flush=True)
+            sys.exit(1)
+        if runs == 2:
+            sys.exit(1)
+        print("[\\n" + period(runs * 10.0), flush=True)
+        time.sleep(10)
+    """)
+    stream = IntelGpuTopStream(executable=str(script), restart_delay=0.05, max_restart_delay=1.0)
+    streams.append(stream)
+    started = time.monotonic()
+    stream.start()
+    assert wait_for(lambda: stream.latest() is not None)
+    # Waited 0.05 s after the first run, then 0.1 s after the second
+    assert time.monotonic() - started >= 0.15
+    assert stream.latest()["usage"] == 30.0
+    assert stream.restarts == 2
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming nvidia-smi reader, against a fake nvidia-smi script.
+"""
+import os
+import stat
+import sys
+import textwrap
+import time
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The device_controller package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.metrics.gpu_metrics import GpuMetrics
+from thermalright_lcd_control.device_controller.metrics.nvidia_smi import NvidiaSmiStream
+
+
+def fake_nvidia_smi(tmp_path, body):
+    """Write an executable nvidia-smi stand-in; `runs` counts its starts"""
+    script = tmp_path / "nvidia-smi"
+    script.write_text(f"#!{sys.executable}\n" + textwrap.dedent("""
+        import os, sys, time
+        runs_file = os.path.join(os.path.dirname(__file__), "runs")
+        runs = int(open(runs_file).read()) + 1 if os.path.exists(runs_file) else 1
+        open(runs_file, "w").write(str(runs))
+        assert "--format=csv,noheader,nounits" in sys.argv
+    """) + textwrap.dedent(body))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return script
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def streams():
+    started = []
+    yield started
+    for stream in started:
+        stream.stop()
+
+
+def test_all_fields_come_from_one_query(tmp_path, streams):
+    script = fake_nvidia_smi(tmp_path, """
+        while True:
+            print("1, 40, 10, 300, 100, 8192")
+            print("0, 65, 97, 1905, 2048, 8192", flush=True)
+            time.sleep(0.05)
+    """)
+    stream = NvidiaSmiStream(interval_ms=50, executable=str(script))
+    streams.append(stream)
+    assert stream.latest(wait=5.0) == {"index": 0.0, "temperature.gpu": 65.0, "utilization.gpu": 97.0,
+                                       "clocks.current.graphics": 1905.0, "memory.used": 2048.0,
+                                       "memory.total": 8192.0}
+    assert (tmp_path / "runs").read_text() == "1"
+
+
+def test_unsupported_fields_are_none(tmp_path, streams):
+    script = fake_nvidia_smi(tmp_path, """
+        print("0, 50, [N/A], [Not Supported], 10, 100", flush=True)
+        time.sleep(10)
+    """)
+    stream = NvidiaSmiStream(executable=str(script))
+    streams.append(stream)
+    sample = stream.latest(wait=5.0)
+    assert sample["temperature.gpu"] == 50.0
+    assert sample["utilization.gpu"] is None
+    assert sample["clocks.current.graphics"] is None
+
+
+def test_exited_process_is_restarted(tmp_path, streams):
+    script = fake_nvidia_smi(tmp_path, """
+        print(f"0, {runs}, 0, 0, 0, 1", flush=True)
+    """)
+    stream = NvidiaSmiStream(executable=str(script), restart_delay=0.01)
+    streams.append(stream)
+    stream.start()
+    assert wait_for(lambda: (stream.latest() or {}).get("temperature.gpu", 0) >= 3)
+    assert stream.restarts >= 2
+
+
+def test_missing_binary_backs_off(tmp_path, streams):
+    stream = NvidiaSmiStream(executable=str(tmp_path / "missing"), restart_delay=0.01, max_restart_delay=0.02)
+    streams.append(stream)
+    assert stream.latest(wait=0.2) is None
+    assert wait_for(lambda: stream.restarts >= 3)
+
+
+def test_stale_samples_are_unavailable(tmp_path, streams):
+    script = fake_nvidia_smi(tmp_path, """
+        print("0, 50, 1, 2, 3, 4", flush=True)
+        time.sleep(10)
+    """)
+    stream = NvidiaSmiStream(executable=str(script))
+    streams.append(stream)
+    assert stream.latest(wait=5.0) is not None
+    time.sleep(0.1)
+    assert stream.latest(max_age=0.05) is None
+
+
+def test_stop_terminates_the_process(tmp_path, streams):
+    script = fake_nvidia_smi(tmp_path, """
+        while True:
+            print("0, 50, 1, 2, 3, 4", flush=True)
+            time.sleep(0.05)
+    """)
+    stream = NvidiaSmiStream(executable=str(script))
+    assert stream.latest(wait=5.0) is not None
+    process = stream._process
+    stream.stop()
+    assert process.poll() is not None
+    assert stream._thread is None
+
+
+class ChangingStream:
+    """Stream stand-in whose every read returns a new sample"""
+
+    def __init__(self, *samples):
+        self.samples = list(samples)
+
+    def latest(self, max_age=None, wait=0.0):
+        return self.samples.pop(0)
+
+
+def test_memory_usage_comes_from_one_sample():
+    gpu = GpuMetrics.__new__(GpuMetrics)
+    gpu.nvidia_stream = ChangingStream({"memory.used": 2048.0, "memory.total": 8192.0},
+                                       {"memory.used": 100.0, "memory.total": 1000.0})
+    assert gpu._get_nvidia_memory_usage() == 25.0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled render plan.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import logging
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from thermalright_lcd_control.device_controller.display.compositor import Compositor
+from thermalright_lcd_control.device_controller.display.config import (
+    BackgroundType, DisplayConfig, MetricConfig, TextConfig)
+from thermalright_lcd_control.device_controller.display.config_unified import (
+    BarGraphConfig, CircularGraphConfig, ShapeConfig, ShapeType)
+from thermalright_lcd_control.device_controller.display.render_plan import (
+    BarGraphOp, CircularGraphOp, MetricTextOp, ShapeOp, TextOp, compile_render_plan)
+from thermalright_lcd_control.device_controller.display.text_renderer import TextRenderer
+
+LOGGER = logging.getLogger(__name__)
+
+
+def make_config(**widgets):
+    return DisplayConfig(background_path="", background_type=BackgroundType.COLOR, **widgets)
+
+
+def compile_plan(config):
+    return compile_render_plan(config, TextRenderer(config), LOGGER)
+
+
+def test_widgets_compile_to_ops_in_drawing_order():
+    config = make_config(
+        metrics_configs=[MetricConfig(name="cpu_temperature", position=(40, 40)),
+                         MetricConfig(name="gpu_usage", enabled=False)],
+        time_config=TextConfig(position=(100, 100)),
+        text_configs=[TextConfig(text="Hello", position=(10, 10)), TextConfig(text="")],
+        bar_configs=[BarGraphConfig(position=(0, 200), width=100, height=10, color=(255, 0, 0, 255))],
+        circular_configs=[CircularGraphConfig(position=(200, 60), radius=30, color=(0, 0, 255, 255),
+                                              metric_name="gpu_usage")],
+        shape_configs=[ShapeConfig(position=(0, 0), width=5, height=5, shape_type=ShapeType.CIRCLE,
+                                   color=(1, 2, 3, 255))],
+    )
+    plan = compile_plan(config)
+
+    assert [type(op) for op in plan.ops] == [MetricTextOp, TextOp, BarGraphOp, CircularGraphOp]
+    assert [type(op) for op in plan.static_ops] == [TextOp, ShapeOp]
+    assert plan.metric_names == ("cpu_temperature", "cpu_usage", "gpu_usage")
+    assert plan.ops[2].fill_color == (255, 0, 0)
+
+
+def test_state_follows_drawn_metrics_only():
+    config = make_config(metrics_configs=[MetricConfig(name="cpu_temperature")])
+    plan = compile_plan(config)
+
+    assert plan.state({"cpu_temperature": 40, "gpu_usage": 1}) == plan.state({"cpu_temperature": 40, "gpu_usage": 2})
+    assert plan.state({"cpu_temperature": 40}) != plan.state({"cpu_temperature": 41})
+
+
+def test_metric_formatting():
+    config = make_config(metrics_configs=[
+        MetricConfig(name="cpu_temperature", label="CPU", unit="°C", format_string="{label}{value:.0f}{unit}"),
+        MetricConfig(name="gpu_name", format_string="{value:.1f}"),
+    ])
+    temperature, name = compile_plan(config).ops
+
+    assert temperature.format(41.6) == "CPU: 42°C"
+    assert temperature.format("41.6") == "CPU: 42°C"
+    assert name.format("RTX 4090") == "RTX 4090"
+
+
+def test_gauge_with_empty_range_is_skipped():
+    config = make_config(bar_configs=[BarGraphConfig(position=(0, 0), width=10, height=10, color=(255, 0, 0, 255),
+                                                     min_value=50, max_value=50)])
+    assert compile_plan(config).ops == []
+
+
+def test_bar_graph_fills_in_proportion():
+    config = make_config(bar_configs=[BarGraphConfig(position=(0, 0), width=100, height=10, color=(255, 0, 0, 255),
+                                                     show_value=False, metric_name="cpu_usage")])
+    plan = compile_plan(config)
+    image = Image.new('RGB', (120, 20))
+    plan.draw(image, {"cpu_usage": 25.0})
+
+    row = np.asarray(image)[5]
+    assert (row[1:25] == (255, 0, 0)).all()
+    assert (row[27:99] == (64, 64, 64)).all()
+
+
+def test_gauge_levels_prerender_sprites():
+    config = make_config(gauge_levels=11, circular_configs=[
+        CircularGraphConfig(position=(30, 30), radius=20, color=(0, 0, 255, 255), show_percentage=False)])
+    plan = compile_plan(config)
+    image = Image.new('RGBA', (60, 60), (0, 0, 0, 255))
+    plan.draw(image, {"cpu_usage": 100.0})
+
+    assert plan.ops[0].sprites.levels == 11
+    assert tuple(np.asarray(image)[30, 45]) == (0, 0, 255, 255)
+
+
+def test_compositor_blend_matches_drawing():
+    config = make_config(
+        compositor="numpy", gauge_levels=101,
+        metrics_configs=[MetricConfig(name="cpu_temperature", position=(60, 20), unit="°C")],
+        bar_configs=[BarGraphConfig(position=(10, 40), width=100, height=12, color=(255, 0, 0, 255))],
+    )
+    plan = compile_plan(config)
+    metrics = {"cpu_temperature": 47, "cpu_usage": 40.0}
+
+    image = Image.new('RGBA', (120, 60), (20, 40, 60, 255))
+    plan.draw(image, metrics)
+    compositor = Compositor(120, 60)
+    compositor.load(np.full((60, 120, 3), (20, 40, 60), dtype=np.uint8))
+    plan.blend(compositor, metrics)
+
+    diff = np.abs(compositor.frame.astype(int) - np.asarray(image.convert('RGB')))
+    assert diff.max() <= 1
+
+
+@pytest.mark.parametrize("shape_type", [ShapeType.RECTANGLE, ShapeType.CIRCLE])
+def test_shape_blend_matches_drawing(shape_type):
+    config = make_config(shape_configs=[ShapeConfig(position=(-5, 10), width=40, height=30, shape_type=shape_type,
+                                                    color=(200, 100, 0, 255), border_color=(0, 255, 0, 255),
+                                                    border_width=2)])
+    op = compile_plan(config).static_ops[0]
+
+    image = Image.new('RGB', (60, 50), (20, 40, 60))
+    op.draw(image, ImageDraw.Draw(image), {})
+    compositor = Compositor(60, 50)
+    compositor.load(np.full((50, 60, 3), (20, 40, 60), dtype=np.uint8))
+    op.blend(compositor, {})
+
+    assert np.array_equal(compositor.frame, np.asarray(image))
+    left, top, right, bottom = op.rect({})
+    changed = np.argwhere((np.asarray(image) != (20, 40, 60)).any(axis=2))
+    assert left <= changed[:, 1].min() and changed[:, 1].max() < right
+    assert top <= changed[:, 0].min() and changed[:, 0].max() < bottom
+
+
+def test_blend_changes_matches_full_blend():
+    config = make_config(
+        compositor="numpy",
+        metrics_configs=[MetricConfig(name="cpu_temperature", position=(60, 20), unit="°C")],
+        bar_configs=[BarGraphConfig(position=(10, 40), width=100, height=12, color=(255, 0, 0, 255))],
+    )
+    plan = compile_plan(config)
+    base = np.full((60, 120, 3), (20, 40, 60), dtype=np.uint8)
+    compositor = Compositor(120, 60)
+    compositor.load(base)
+    plan.blend(compositor, {"cpu_temperature": 47, "cpu_usage": 40.0})
+
+    metrics = {"cpu_temperature": 103, "cpu_usage": 40.0}
+    dirty = plan.blend_changes(compositor, base, metrics)
+    expected = Compositor(120, 60)
+    expected.load(base)
+    plan.blend(expected, metrics)
+
+    assert len(dirty) == 1 and dirty[0][1] < 20 < dirty[0][3]
+    assert np.array_equal(compositor.frame, expected.frame)
+    assert plan.blend_changes(compositor, base, metrics) == []
+
+
+def test_gauges_show_pending_metrics_as_empty():
+    config = make_config(bar_configs=[BarGraphConfig(position=(10, 40), width=100, height=12, color=(255, 0, 0, 255))])
+    op = compile_plan(config).ops[0]
+    metrics = {"cpu_usage": "..."}
+
+    assert op.value(metrics) == (0.0, 0.0)
+    assert op.label(metrics, "0.0") == "..."
+    assert op.label({"cpu_usage": 12.5}, "12.5") == "12.5"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
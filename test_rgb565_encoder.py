@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Byte-for-byte equivalence test between the array based RGB565 encoder
+and the original per-pixel encoding loop.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image
+
+from thermalright_lcd_control.device_controller.display.encoder import PixelLayout, Rgb565Encoder
+
+
+def legacy_encode(img):
+    """Original DisplayDevice._encode_image loop (column-major, bottom-to-top, little-endian)"""
+    width, height = img.size
+    out = bytearray()
+    for x in range(width):
+        for y in range(height - 1, -1, -1):
+            r, g, b = img.getpixel((x, y))
+            val565 = ((r & 0xF8) << 8) | ((g & 0xFC) << 3) | (b >> 3)
+            hi = (val565 >> 8) & 0xFF
+            lo = val565 & 0xFF
+            out.extend((lo, hi))
+    return out
+
+
+def legacy_encode_rows_be(img):
+    """Original DisplayDevice87AD70DB encoding (row-major, big-endian)"""
+    width, height = img.size
+    out = bytearray()
+    for y in range(height):
+        for x in range(width):
+            r, g, b = img.getpixel((x, y))
+            val565 = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+            out.extend((val565 >> 8, val565 & 0xFF))
+    return out
+
+
+def random_image(width, height, seed=0):
+    rnd = random.Random(seed)
+    return Image.frombytes('RGB', (width, height), bytes(rnd.getrandbits(8) for _ in range(width * height * 3)))
+
+
+@pytest.mark.parametrize("width,height", [(320, 240), (480, 480), (7, 3)])
+def test_column_major_matches_legacy_loop(width, height):
+    img = random_image(width, height, seed=width * height)
+    encoder = Rgb565Encoder(width, height)
+    assert encoder.encode(img).tobytes() == bytes(legacy_encode(img))
+
+
+def test_row_major_big_endian_matches_legacy(width=320, height=320):
+    img = random_image(width, height, seed=1)
+    encoder = Rgb565Encoder(width, height, PixelLayout.ROWS, big_endian=True)
+    assert encoder.encode(img).tobytes() == bytes(legacy_encode_rows_be(img))
+
+
+def test_encode_into_preallocated_buffer():
+    img = random_image(16, 8, seed=2).convert('RGBA')
+    encoder = Rgb565Encoder(16, 8)
+    buffer = bytearray(encoder.payload_size)
+    out = np.frombuffer(buffer, dtype=np.uint8)
+    assert encoder.encode(img, out=out) is out
+    assert bytes(buffer) == bytes(legacy_encode(img.convert('RGB')))
+
+
+def test_encode_rgb_array():
+    img = random_image(16, 8, seed=3)
+    encoder = Rgb565Encoder(16, 8)
+    assert encoder.encode(np.array(img)).tobytes() == bytes(legacy_encode(img))
+
+
+def test_size_mismatch_is_rejected():
+    encoder = Rgb565Encoder(320, 240)
+    with pytest.raises(ValueError):
+        encoder.encode(random_image(240, 320))
+
+
+@pytest.mark.parametrize("layout", [PixelLayout.COLUMNS_BOTTOM_UP, PixelLayout.ROWS])
+def test_partial_encode_matches_full_encode(layout):
+    encoder = Rgb565Encoder(24, 16, layout)
+    previous = np.array(random_image(24, 16, seed=4))
+    current = previous.copy()
+    rects = [(0, 0, 5, 3), (10, 6, 24, 16)]
+    for left, top, right, bottom in rects:
+        current[top:bottom, left:right] = np.array(random_image(right - left, bottom - top, seed=left))
+
+    out = encoder.encode(previous)
+    assert encoder.encode(current, out=out, rects=rects) is out
+    assert out.tobytes() == encoder.encode(current).tobytes()
+
+
+@pytest.mark.parametrize("rotation", [90, 180, 270])
+@pytest.mark.parametrize("layout", [PixelLayout.COLUMNS_BOTTOM_UP, PixelLayout.ROWS])
+def test_rotation_matches_rotated_image(layout, rotation):
+    encoder = Rgb565Encoder(24, 16, layout)
+    encoder.rotation = rotation
+    canvas = random_image(*encoder.canvas_size, seed=5)
+    expected = Rgb565Encoder(24, 16, layout).encode(canvas.rotate(-rotation, expand=True))
+    assert encoder.encode(canvas).tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("rotation", [90, 180, 270])
+def test_partial_encode_with_rotation(rotation):
+    encoder = Rgb565Encoder(24, 16)
+    encoder.rotation = rotation
+    width, height = encoder.canvas_size
+    previous = np.array(random_image(width, height, seed=6))
+    current = previous.copy()
+    current[2:9, 3:7] = 255 - current[2:9, 3:7]
+
+    out = encoder.encode(previous)
+    encoder.encode(current, out=out, rects=[(3, 2, 7, 9)])
+    assert out.tobytes() == encoder.encode(current).tobytes()
+
+
+def test_canvas_size_follows_rotation():
+    encoder = Rgb565Encoder(320, 240)
+    encoder.rotation = 90
+    assert encoder.canvas_size == (240, 320)
+    with pytest.raises(ValueError):
+        encoder.encode(random_image(320, 240))
+    with pytest.raises(ValueError):
+        encoder.rotation = 45
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
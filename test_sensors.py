@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the sensor registry: discovery once, reads through open files.
+"""
+import glob
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The device_controller package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+from thermalright_lcd_control.device_controller.metrics import cpu_metrics
+from thermalright_lcd_control.device_controller.metrics.cpu_metrics import CpuMetrics
+from thermalright_lcd_control.device_controller.metrics.sensors import SensorRegistry
+
+
+class Discovery:
+    """Discovery function returning the given paths, counting its calls"""
+
+    def __init__(self, *paths):
+        self.paths = [str(p) for p in paths]
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return [p for p in self.paths if os.path.exists(p)]
+
+
+@pytest.fixture
+def registry(tmp_path):
+    (tmp_path / "hwmon").mkdir()
+    registry = SensorRegistry(hotplug_interval=0.0, hotplug_dirs=[str(tmp_path / "hwmon")])
+    yield registry
+    registry.close()
+
+
+def test_sensor_is_discovered_once_and_read_fresh(registry, tmp_path):
+    sensor = tmp_path / "temp1_input"
+    sensor.write_text("45000\n")
+    discover = Discovery(sensor)
+
+    assert registry.read_float("temp", discover, 1 / 1000.0) == 45.0
+    sensor.write_text("52500\n")
+    assert registry.read_float("temp", discover, 1 / 1000.0) == 52.5
+    assert discover.calls == 1
+
+
+def test_values_are_reduced_over_the_sensor_files(registry, tmp_path):
+    paths = [tmp_path / f"temp{i}_input" for i in (1, 2, 3)]
+    for path, value in zip(paths, ("40000", "61000", "55000")):
+        path.write_text(value)
+    assert registry.read_float("ccd", Discovery(*paths), 1 / 1000.0) == 61.0
+
+
+def test_failed_read_discovers_the_sensor_again(registry, tmp_path):
+    sensor = tmp_path / "gpu_busy_percent"
+    sensor.write_text("30")
+    discover = Discovery(sensor)
+    assert registry.read_float("usage", discover) == 30.0
+
+    sensor.write_text("")
+    assert registry.read_float("usage", discover) is None
+    sensor.write_text("75")
+    assert registry.read_float("usage", discover) == 75.0
+    assert discover.calls == 2
+
+
+def test_missing_sensor_is_retried_after_the_retry_interval(registry, tmp_path):
+    sensor = tmp_path / "freq1_input"
+    discover = Discovery(sensor)
+    assert registry.read_float("freq", discover) is None
+    sensor.write_text("1800000000")
+    assert registry.read_float("freq", discover) is None
+    assert discover.calls == 1
+
+    registry.retry_interval = 0.0
+    assert registry.read_float("freq", discover) == 1800000000.0
+
+
+def test_hotplug_discovers_sensors_again(registry, tmp_path):
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.write_text("1")
+    second.write_text("2")
+    discover = Discovery(first)
+    assert registry.read_float("sensor", discover) == 1.0
+
+    discover.paths = [str(second)]
+    assert registry.read_float("sensor", discover) == 1.0
+    (tmp_path / "hwmon" / "hwmon3").mkdir()
+    assert registry.read_float("sensor", discover) == 2.0
+
+
+def write_hwmon(root, sensors):
+    """sensors: {index: (label, millidegrees)}"""
+    root.mkdir()
+    for index, (label, value) in sensors.items():
+        (root / f"temp{index}_label").write_text(label + "\n")
+        (root / f"temp{index}_input").write_text(f"{value}\n")
+
+
+def test_amd_temperature_prefers_tctl_over_ccds(tmp_path):
+    root = tmp_path / "hwmon0"
+    write_hwmon(root, {1: ("Tctl", 48000), 3: ("Tccd1", 55000), 4: ("Tccd2", 51000)})
+    paths, _ = CpuMetrics()._pick_best_amd_temp(str(root))
+    assert paths == [str(root / "temp1_input")]
+
+
+def test_amd_temperature_falls_back_to_the_hottest_ccd(tmp_path):
+    root = tmp_path / "hwmon0"
+    write_hwmon(root, {3: ("Tccd1", 55000), 4: ("Tccd2", 61000)})
+    metrics = CpuMetrics()
+    paths, _ = metrics._pick_best_amd_temp(str(root))
+    assert metrics.sensors.read_float("temperature", lambda: paths, 1 / 1000.0) == 61.0
+
+
+def test_unreadable_hwmon_input_is_skipped(tmp_path, monkeypatch):
+    sys_glob = glob.glob
+    monkeypatch.setattr(cpu_metrics.glob, "glob",
+                        lambda pattern: sys_glob(pattern.replace("/sys/", f"{tmp_path}/sys/", 1)))
+    root = tmp_path / "sys" / "class" / "hwmon" / "hwmon0"
+    root.mkdir(parents=True)
+    (root / "name").write_text("nct6775\n")
+    (root / "temp1_input").mkdir()  # unreadable
+    (root / "temp2_input").write_text("45000\n")
+
+    metrics = CpuMetrics()
+    # A sensor can stop reading between listing and reading it
+    monkeypatch.setattr(metrics, "_temp_inputs", lambda root: sorted(sys_glob(f"{root}/temp*_input")))
+    assert metrics._discover_temperature() == [str(root / "temp2_input")]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
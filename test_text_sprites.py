@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the rasterized text sprite cache.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from thermalright_lcd_control.device_controller.display.text_sprites import TextSpriteCache
+
+FONT = ImageFont.load_default(22)
+
+
+def background(mode='RGBA'):
+    pixels = np.random.default_rng(3).integers(0, 256, (60, 120, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGB').convert(mode)
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+@pytest.mark.parametrize("position", [(60, 30), (5, 2), (118, 58)])
+def test_sprite_matches_direct_drawing(mode, position):
+    expected = background(mode)
+    ImageDraw.Draw(expected).text(position, "CPU 42°C", fill=(255, 200, 0, 255), font=FONT, anchor='mm')
+
+    result = background(mode)
+    TextSpriteCache().draw(result, position, "CPU 42°C", FONT, (255, 200, 0, 255))
+
+    diff = np.abs(np.asarray(result.convert('RGB')).astype(int) - np.asarray(expected.convert('RGB')))
+    assert diff.max() <= 1
+
+
+def test_hits_and_misses_are_counted():
+    cache = TextSpriteCache()
+    image = background()
+    for text in ["12:34", "12:34", "12:35", "12:34"]:
+        cache.draw(image, (60, 30), text, FONT, (255, 255, 255, 255))
+    cache.draw(image, (60, 30), "12:34", FONT, (255, 0, 0, 255))
+
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 3
+    assert cache.stats()["entries"] == 3
+
+
+def test_memory_budget_evicts_least_recently_used():
+    cache = TextSpriteCache()
+    one = cache.get("0", FONT, (255, 255, 255, 255)).nbytes
+    cache.budget = one * 2
+    cache.get("1", FONT, (255, 255, 255, 255))
+    cache.get("0", FONT, (255, 255, 255, 255))
+    cache.get("2", FONT, (255, 255, 255, 255))
+
+    assert cache.nbytes <= cache.budget
+    assert cache.evictions >= 1
+    assert cache.stats()["hits"] == 1
+    cache.get("0", FONT, (255, 255, 255, 255))
+    assert cache.stats()["hits"] == 2
+
+
+def test_layers_count_towards_the_budget():
+    cache = TextSpriteCache()
+    sprites = [cache.get(text, FONT, (255, 255, 255, 255)) for text in ("10", "01")]
+    # Room for both sprites, but not once one of them has its 9 B/px layer too
+    cache.budget = 4 * sprites[1].nbytes
+    layer = cache.layer(sprites[1])
+
+    assert layer is sprites[1].layer
+    assert cache.nbytes <= cache.budget
+    assert cache.stats()["entries"] == 1
+
+
+def test_layers_of_evicted_sprites_are_not_counted():
+    cache = TextSpriteCache()
+    held = cache.get("10", FONT, (255, 255, 255, 255))
+    cache.budget = held.nbytes
+    cache.get("01", FONT, (255, 255, 255, 255))
+    assert not held.cached
+
+    before = cache.nbytes
+    cache.layer(held)
+    assert held.layer is not None
+    assert cache.nbytes == before
+    assert cache.nbytes == sum(sprite.nbytes for sprite in cache._sprites.values())
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
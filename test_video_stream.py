@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming video background decoder.
+"""
+import os
+import sys
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+cv2 = pytest.importorskip("cv2")
+
+import numpy as np
+
+from thermalright_lcd_control.device_controller.display.video_stream import VideoStream
+
+
+@pytest.fixture
+def clip(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV cannot write MJPG videos here")
+    for i in range(5):
+        writer.write(np.full((48, 64, 3), i * 50, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_frames_are_resized_and_loop_back_to_start(clip):
+    stream = VideoStream(clip, 32, 24, lookahead=2)
+    try:
+        frames = [stream.next_frame(timeout=2.0) for _ in range(12)]
+    finally:
+        stream.close()
+        stream.thread.join(timeout=2.0)
+
+    assert [index for index, _ in frames] == [0, 1, 2, 3, 4, 0, 1, 2, 3, 4, 0, 1]
+    assert all(img.size == (32, 24) and img.mode == 'RGB' for _, img in frames)
+    assert not stream.thread.is_alive()
+
+
+def test_look_ahead_is_bounded(clip):
+    stream = VideoStream(clip, 32, 24, lookahead=3)
+    try:
+        stream.next_frame(timeout=2.0)
+        stream.thread.join(timeout=0.2)
+        assert len(stream._frames) <= 3
+    finally:
+        stream.close()
+
+
+def test_unreadable_video_is_rejected(tmp_path):
+    with pytest.raises(RuntimeError):
+        VideoStream(str(tmp_path / "missing.mp4"), 32, 24)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
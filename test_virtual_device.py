@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+End-to-end test of the encode -> packet -> decode path through the
+virtual loopback display device.
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+# The display package pulls in the HID backend, which needs the native hidapi library
+pytest.importorskip("hid", exc_type=ImportError)
+
+import numpy as np
+from PIL import Image
+
+from thermalright_lcd_control.device_controller.display.compositor import ComposedFrame
+from thermalright_lcd_control.device_controller.display.config import BackgroundType
+from thermalright_lcd_control.device_controller.display.frame_manager import METRIC_PENDING
+from thermalright_lcd_control.device_controller.display.generator import DisplayGenerator
+from thermalright_lcd_control.device_controller.display.virtual_device import VirtualDisplayDevice
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), 'resources', 'config')
+
+
+class Devices:
+    """
+    Makes VirtualDisplayDevices and closes them at the end of the test.
+
+    The full generator build is replaced by a generator without metrics or
+    background video, held back until `release` is set.
+    """
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.release.set()
+        self.built = []
+        self._devices = []
+
+    def make(self, protocol, device_class=VirtualDisplayDevice, **kwargs):
+        device = device_class(CONFIG_DIR, protocol, **kwargs)
+        self._devices.append(device)
+        return device
+
+    def build_generator(self, device, config=None):
+        self.release.wait(5)
+        generator = DisplayGenerator((config or device._load_config()).startup_config(),
+                                     collect_metrics=False)
+        self.built.append(generator)
+        return generator
+
+    def close(self):
+        self.release.set()
+        for device in self._devices:
+            device.close()
+
+
+@pytest.fixture
+def devices(monkeypatch):
+    devices = Devices()
+    monkeypatch.setattr(VirtualDisplayDevice, "_build_generator",
+                        lambda device, config=None: devices.build_generator(device, config))
+    yield devices
+    devices.close()
+
+
+def random_image(width, height, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGB')
+
+
+def quantized(img):
+    return np.asarray(img) & np.array([0xF8, 0xFC, 0xF8], dtype=np.uint8)
+
+
+@pytest.mark.parametrize("protocol", ["0416:5302", "0418:5304", "87ad:70db"])
+def test_frames_round_trip_through_the_wire_protocol(devices, protocol):
+    received = []
+    device = devices.make(protocol, on_frame=received.append)
+    for seed in range(2):
+        img = random_image(device.width, device.height, seed)
+        device._send_frame(device._encode_frame(img))
+        assert np.array_equal(np.asarray(device.last_frame), quantized(img))
+
+    assert device.frames_received == 2
+    assert len(received) == 2
+    assert device.protocol_errors == 0
+
+
+def test_unknown_protocol_is_rejected(devices):
+    with pytest.raises(ValueError):
+        devices.make("1234:5678")
+
+
+def test_rotated_frames_are_turned_by_the_encoder(devices):
+    device = devices.make("0416:5302")
+    img = random_image(device.height, device.width)
+    img.info["rotation"] = 90
+    device._send_frame(device._encode_frame(img))
+    assert np.array_equal(np.asarray(device.last_frame), quantized(img.rotate(-90, expand=True)))
+
+
+class LegacyEncoderDevice(VirtualDisplayDevice):
+    """A device whose _encode_image override predates the rotation argument"""
+
+    encoder_rotates = False
+
+    def __init__(self, *args, **kwargs):
+        self.encoded_sizes = []
+        super().__init__(*args, **kwargs)
+
+    def _encode_image(self, img, out=None):
+        self.encoded_sizes.append(img.size if isinstance(img, Image.Image) else img.shape[1::-1])
+        return super()._encode_image(img, out)
+
+
+def test_legacy_encoder_overrides_get_rotated_frames(devices):
+    device = devices.make("0416:5302", device_class=LegacyEncoderDevice)
+    img = random_image(device.height, device.width)
+    img.info["rotation"] = 90
+    device._send_frame(device._encode_frame(img))
+
+    assert device.encoded_sizes == [(device.width, device.height)]
+    assert np.array_equal(np.asarray(device.last_frame), quantized(img.rotate(-90, expand=True)))
+
+    composed = ComposedFrame(np.asarray(img), rotation=90)
+    device._send_frame(device._encode_frame(composed))
+    assert np.array_equal(np.asarray(device.last_frame), quantized(img.rotate(-90, expand=True)))
+
+
+class ForwardingEncoderDevice(VirtualDisplayDevice):
+    """A device whose _encode_image override forwards whatever arguments it gets"""
+
+    def _encode_image(self, img, *args, **kwargs):
+        return super()._encode_image(img, *args, **kwargs)
+
+
+def test_forwarding_encoder_overrides_rotate_in_the_encoder(devices):
+    device = devices.make("0416:5302", device_class=ForwardingEncoderDevice)
+    img = random_image(device.height, device.width)
+    img.info["rotation"] = 90
+    device._send_frame(device._encode_frame(img))
+    assert np.array_equal(np.asarray(device.last_frame), quantized(img.rotate(-90, expand=True)))
+
+
+def test_startup_frame_is_shown_while_the_generator_builds(devices):
+    devices.release.clear()
+    device = devices.make("0416:5302")
+    startup = device._generator
+    assert startup.config.background_type == BackgroundType.COLOR
+    assert set(startup.get_current_metrics().values()) == {METRIC_PENDING}
+    assert device._get_generator() is startup
+
+    devices.release.set()
+    device._build_thread.join(5)
+    assert device._get_generator() is devices.built[0]
+
+
+def test_close_cancels_a_pending_build(devices):
+    devices.release.clear()
+    device = devices.make("0416:5302")
+    build = device._build_thread
+    closer = threading.Thread(target=device.close)
+    closer.start()
+    devices.release.set()
+    closer.join(5)
+
+    assert not build.is_alive()
+    assert device._generator is None
+    # The build finished after it was cancelled, and was not kept
+    assert len(devices.built) == 1
+    assert device._next_generator is None
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))